@@ -34,13 +34,29 @@ const AnalyticsDashboard: React.FC<AnalyticsDashboardProps> = ({ agents }) => {
     fetchAnalytics()
   }, [])
 
+  // The overview arrives in full when the socket opens, then as changed fields only
+  useEffect(() => {
+    const socket = new WebSocket('ws://localhost:8000/api/events/ws?topics=overview')
+    socket.onmessage = (message) => {
+      const event = JSON.parse(message.data)
+      if (event.type === 'overview') {
+        setOverviewData(event.overview)
+      } else if (event.type === 'overview.delta') {
+        setOverviewData(current => (current ? { ...current, ...event.changes } : current))
+      } else if (event.type === 'resync') {
+        fetchOverview()
+      }
+    }
+    return () => socket.close()
+  }, [])
+
+  const fetchOverview = async () => {
+    const overviewResponse = await fetch('http://localhost:8000/api/analytics/overview')
+    setOverviewData(await overviewResponse.json())
+  }
+
   const fetchAnalytics = async () => {
     try {
-      // Fetch overview analytics
-      const overviewResponse = await fetch('http://localhost:8000/api/analytics/overview')
-      const overview = await overviewResponse.json()
-      setOverviewData(overview)
-
       // Fetch analytics for each agent
       const agentAnalyticsData: Record<string, AgentAnalytics> = {}
       for (const agent of agents) {
@@ -14,6 +14,8 @@ interface Ticket {
   updated_at: string
 }
 
+const PAGE_SIZE = 50
+
 interface TicketManagementProps {
   agents: Agent[]
 }
@@ -25,16 +27,47 @@ const TicketManagement: React.FC<TicketManagementProps> = ({ agents }) => {
   const [filterStatus, setFilterStatus] = useState<string>('all')
   const [filterAgent, setFilterAgent] = useState<string>('all')
   const [manualResponse, setManualResponse] = useState('')
+  const [nextCursor, setNextCursor] = useState<string | null>(null)
 
   useEffect(() => {
     fetchTickets()
-  }, [])
+  }, [filterStatus, filterAgent])
+
+  // Live ticket changes pushed by the server, with the same filters as the list
+  useEffect(() => {
+    const params = new URLSearchParams({ topics: 'tickets' })
+    if (filterAgent !== 'all') params.set('agent_id', filterAgent)
+    const socket = new WebSocket(`ws://localhost:8000/api/events/ws?${params}`)
+    socket.onmessage = (message) => {
+      const event = JSON.parse(message.data)
+      if (event.type === 'resync') {
+        // Events were dropped while we lagged behind; start over from the first page
+        fetchTickets()
+        return
+      }
+      const ticket: Ticket = event.ticket
+      const matches = event.type !== 'ticket.delete' && (filterStatus === 'all' || ticket.status === filterStatus)
+      setTickets(current => {
+        const rest = current.filter(t => t.id !== ticket.id)
+        if (!matches) return rest
+        if (rest.length < current.length) return current.map(t => (t.id === ticket.id ? ticket : t))
+        return [ticket, ...rest].sort((a, b) => b.created_at.localeCompare(a.created_at))
+      })
+    }
+    return () => socket.close()
+  }, [filterStatus, filterAgent])
 
-  const fetchTickets = async () => {
+  // Filtering and paging happen on the server; pass a cursor to append the next page
+  const fetchTickets = async (cursor?: string) => {
     try {
-      const response = await fetch('http://localhost:8000/api/tickets')
+      const params = new URLSearchParams({ limit: String(PAGE_SIZE), sort: '-created_at' })
+      if (filterStatus !== 'all') params.set('status', filterStatus)
+      if (filterAgent !== 'all') params.set('agent_id', filterAgent)
+      if (cursor) params.set('cursor', cursor)
+      const response = await fetch(`http://localhost:8000/api/tickets?${params}`)
       const data = await response.json()
-      setTickets(data)
+      setTickets(prev => cursor ? [...prev, ...data] : data)
+      setNextCursor(response.headers.get('X-Next-Cursor'))
     } catch (error) {
       console.error('Failed to fetch tickets:', error)
     } finally {
@@ -55,8 +88,8 @@ const TicketManagement: React.FC<TicketManagementProps> = ({ agents }) => {
         }),
       })
 
+      // The updated ticket arrives over the event socket
       if (updateResponse.ok) {
-        fetchTickets()
         setSelectedTicket(null)
         setManualResponse('')
       }
@@ -96,12 +129,6 @@ const TicketManagement: React.FC<TicketManagementProps> = ({ agents }) => {
     return agent?.name || 'Unknown Agent'
   }
 
-  const filteredTickets = tickets.filter(ticket => {
-    const statusMatch = filterStatus === 'all' || ticket.status === filterStatus
-    const agentMatch = filterAgent === 'all' || ticket.agent_id === filterAgent
-    return statusMatch && agentMatch
-  })
-
   if (loading) {
     return (
       <div className="flex items-center justify-center h-64">
@@ -152,11 +179,11 @@ const TicketManagement: React.FC<TicketManagementProps> = ({ agents }) => {
       <div className="bg-white shadow rounded-lg">
         <div className="px-6 py-4 border-b border-gray-200">
           <h3 className="text-lg font-medium text-gray-900">
-            Support Tickets ({filteredTickets.length})
+            Support Tickets ({tickets.length}{nextCursor ? '+' : ''})
           </h3>
         </div>
         <div className="p-6">
-          {filteredTickets.length === 0 ? (
+          {tickets.length === 0 ? (
             <div className="text-center py-8">
               <FileText className="mx-auto h-12 w-12 text-gray-400" />
               <h3 className="mt-2 text-sm font-medium text-gray-900">No tickets</h3>
@@ -168,7 +195,7 @@ const TicketManagement: React.FC<TicketManagementProps> = ({ agents }) => {
             </div>
           ) : (
             <div className="space-y-4">
-              {filteredTickets.map((ticket) => (
+              {tickets.map((ticket) => (
                 <div
                   key={ticket.id}
                   className={`border rounded-lg p-4 cursor-pointer transition-colors ${
@@ -256,6 +283,14 @@ const TicketManagement: React.FC<TicketManagementProps> = ({ agents }) => {
                   )}
                 </div>
               ))}
+              {nextCursor && (
+                <button
+                  onClick={() => fetchTickets(nextCursor)}
+                  className="w-full px-3 py-2 border border-gray-300 text-sm font-medium text-gray-700 rounded-md hover:bg-gray-50 focus:outline-none focus:ring-2 focus:ring-offset-2 focus:ring-primary-500"
+                >
+                  Load more
+                </button>
+              )}
             </div>
           )}
         </div>
@@ -0,0 +1,47 @@
+import os
+from typing import Optional
+
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+
+# Async drivers used for each database URL scheme
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "postgres": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+
+def async_database_url(url: str) -> str:
+    """Rewrite a plain DATABASE_URL to use an async driver"""
+    scheme, sep, rest = url.partition("://")
+    if "+" in scheme:
+        return url
+    return f"{ASYNC_DRIVERS.get(scheme, scheme)}{sep}{rest}"
+
+
+def sync_database_url(url: str) -> str:
+    """Rewrite a DATABASE_URL for synchronous tools such as Alembic"""
+    scheme, sep, rest = url.partition("://")
+    base = scheme.split("+")[0]
+    if base == "postgres":
+        base = "postgresql"
+    return f"{base}{sep}{rest}"
+
+
+def create_engine_from_env(url: Optional[str] = None) -> Optional[AsyncEngine]:
+    """Create the pooled async engine, or None when no DATABASE_URL is configured"""
+    url = url or os.getenv("DATABASE_URL")
+    if not url:
+        return None
+    url = async_database_url(url)
+    if url.startswith("sqlite"):
+        # SQLite connections are cheap and file-local; no pool sizing applies
+        return create_async_engine(url)
+    return create_async_engine(
+        url,
+        pool_size=int(os.getenv("DB_POOL_SIZE", "10")),
+        max_overflow=int(os.getenv("DB_MAX_OVERFLOW", "20")),
+        pool_timeout=float(os.getenv("DB_POOL_TIMEOUT", "30")),
+        pool_recycle=int(os.getenv("DB_POOL_RECYCLE", "1800")),
+        pool_pre_ping=True,
+    )
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, Enum
+from sqlalchemy import Column, Integer, String, Text, DateTime, Enum, Boolean, Float, JSON, Index
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.sql import func
 import enum
@@ -28,4 +28,64 @@ class SupportRequest(Base):
     priority = Column(Enum(PriorityEnum), default=PriorityEnum.medium)
     status = Column(Enum(StatusEnum), default=StatusEnum.pending)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
-    updated_at = Column(DateTime(timezone=True), onupdate=func.now()) 
\ No newline at end of file
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+
+class Agent(Base):
+    __tablename__ = "agents"
+    
+    id = Column(String(64), primary_key=True)
+    name = Column(String(255), nullable=False)
+    description = Column(Text, nullable=False)
+    tone = Column(String(255), nullable=False)
+    personality = Column(String(255), nullable=False)
+    knowledge_base = Column(JSON, nullable=False, default=list)
+    lyzr_agent_id = Column(String(255))
+    user_id = Column(String(255), nullable=False, index=True)
+    is_active = Column(Boolean, nullable=False, default=True)
+    status = Column(String(32), nullable=False, default="ready")
+    created_at = Column(DateTime, nullable=False)
+    updated_at = Column(DateTime, nullable=False)
+
+class Ticket(Base):
+    __tablename__ = "tickets"
+    
+    id = Column(String(64), primary_key=True)
+    agent_id = Column(String(64), nullable=False)
+    question = Column(Text, nullable=False)
+    user_session = Column(String(255), nullable=False, index=True)
+    status = Column(String(32), nullable=False, default="open")
+    confidence_score = Column(Float)
+    manual_response = Column(Text)
+    created_at = Column(DateTime, nullable=False)
+    updated_at = Column(DateTime, nullable=False)
+
+    # Filters used by GET /api/tickets, newest-first listing per filter
+    __table_args__ = (
+        Index("ix_tickets_agent_id_status_created_at", "agent_id", "status", "created_at"),
+        Index("ix_tickets_status_created_at", "status", "created_at"),
+    )
+
+class ChatSession(Base):
+    __tablename__ = "chat_sessions"
+    
+    id = Column(String(64), primary_key=True)
+    agent_id = Column(String(64), nullable=False)
+    user_session = Column(String(255), nullable=False)
+    message = Column(Text, nullable=False)
+    response = Column(Text, nullable=False)
+    confidence_score = Column(Float)
+    # Seconds taken to produce the reply
+    response_time = Column(Float)
+    created_at = Column(DateTime, nullable=False)
+
+    __table_args__ = (
+        Index("ix_chat_sessions_agent_id_created_at", "agent_id", "created_at"),
+        Index("ix_chat_sessions_user_session_created_at", "user_session", "created_at"),
+    )
+
+class IdCounter(Base):
+    """Highest id number allocated per store, so ids of records deleted before a restart are not reused"""
+    __tablename__ = "id_counters"
+
+    name = Column(String(64), primary_key=True)
+    value = Column(Integer, nullable=False)
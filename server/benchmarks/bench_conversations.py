@@ -0,0 +1,66 @@
+"""Memory and per-turn cost of the conversation context store.
+
+Fills the store with 1k, 10k and 100k sessions of ``TURNS`` turns each and
+compares the size it accounts for with what tracemalloc measures, so the
+``bytes_per_1k_sessions`` it reports can be trusted for capacity planning.
+A last run caps the store below the data and shows it staying at the cap.
+
+Run from the server directory:
+
+    python -m benchmarks.bench_conversations
+"""
+import random
+import time
+import tracemalloc
+
+from services.conversations import ConversationStore
+
+SESSIONS = [1_000, 10_000, 100_000]
+TURNS = 12
+WORDS = ["order", "refund", "shipping", "account", "password", "invoice", "delivery", "help", "the", "my"]
+
+
+def text(words):
+    return " ".join(random.choice(WORDS) for _ in range(words))
+
+
+def fill(store, sessions):
+    # Distinct string objects per turn, as request bodies would be
+    for turn in range(TURNS):
+        for session in range(sessions):
+            store.append("agent_0001", f"session_{session}", text(12), text(40))
+
+
+def main():
+    random.seed(0)
+    print(f"{'sessions':>9} {'accounted MB':>13} {'measured MB':>12} {'KB/1k sessions':>15} {'context (us)':>13}")
+    for sessions in SESSIONS:
+        store = ConversationStore(max_turns=10, max_tokens=1000, ttl=3600, max_bytes=1 << 40)
+        tracemalloc.start()
+        fill(store, sessions)
+        measured = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        started = time.perf_counter()
+        for session in range(sessions):
+            store.context("agent_0001", f"session_{session}")
+        context_us = (time.perf_counter() - started) / sessions * 1e6
+        stats = store.stats()
+        print(f"{sessions:>9} {stats['bytes'] / 1e6:>13.1f} {measured / 1e6:>12.1f} "
+              f"{stats['bytes_per_1k_sessions'] / 1e3:>15.0f} {context_us:>13.1f}")
+
+    cap = 16 << 20
+    store = ConversationStore(max_turns=10, max_tokens=1000, ttl=3600, max_bytes=cap)
+    turns = [(text(12), text(40)) for _ in range(1000)]
+    count = SESSIONS[-1] * TURNS
+    started = time.perf_counter()
+    for i in range(count):
+        message, response = turns[i % len(turns)]
+        store.append("agent_0001", f"session_{random.randrange(SESSIONS[-1])}", message, response)
+    append_us = (time.perf_counter() - started) / count * 1e6
+    stats = store.stats()
+    print(f"\ncapped at {cap / 1e6:.1f} MB: {stats['sessions']} sessions kept, "
+          f"{stats['bytes'] / 1e6:.1f} MB accounted, {stats['evicted']} evicted, {append_us:.1f} us per append")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""Memory and throughput of the streaming export at 10k, 100k and 1M chat sessions.
+
+For each size the chat-session store is filled, then the export is drained
+as NDJSON, CSV and gzipped NDJSON while tracemalloc records the peak of
+memory allocated during the export (the store itself is not counted). The
+legacy approach, building the whole list and serializing it in one
+response body, is measured alongside for comparison. Times include the
+tracemalloc overhead, so compare them with each other only.
+
+Run from the server directory:
+
+    python -m benchmarks.bench_export
+"""
+import asyncio
+import gc
+import json
+import random
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+from services.export import export_records, gzip_stream
+from services.store import IndexedStore
+
+SIZES = [10_000, 100_000, 1_000_000]
+AGENTS = 100
+FIELDS = ["id", "agent_id", "user_session", "message", "response", "confidence_score", "response_time", "created_at"]
+
+
+def fill(store, count):
+    started = datetime(2024, 1, 1) + timedelta(seconds=len(store))
+    for i in range(len(store), count):
+        store.insert({
+            "id": store.next_id(),
+            "agent_id": f"agent_{random.randrange(AGENTS):04d}",
+            "user_session": f"session_{random.randrange(count // 10)}",
+            "message": f"How do I change the billing address on order {i}?",
+            "response": "You can change it under Settings > Billing before the order ships.",
+            "confidence_score": round(random.random(), 2),
+            "response_time": round(random.random(), 4),
+            "created_at": (started + timedelta(seconds=i)).isoformat(),
+        })
+
+
+async def drain(chunks):
+    size = 0
+    async for chunk in chunks:
+        size += len(chunk)
+    return size
+
+
+def legacy(store):
+    return len(json.dumps([{field: record.get(field) for field in FIELDS} for record in store.values()]))
+
+
+def measure(function):
+    gc.collect()
+    tracemalloc.start()
+    started = time.perf_counter()
+    size = function()
+    elapsed = time.perf_counter() - started
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return size, elapsed, peak
+
+
+def main():
+    random.seed(0)
+    store = IndexedStore("chat_{:04d}", indexes=["agent_id", "user_session"])
+    cases = [
+        ("ndjson", lambda: asyncio.run(drain(export_records(store, FIELDS, "ndjson")))),
+        ("csv", lambda: asyncio.run(drain(export_records(store, FIELDS, "csv")))),
+        ("ndjson gzip", lambda: asyncio.run(drain(gzip_stream(export_records(store, FIELDS, "ndjson"))))),
+        ("legacy list", lambda: legacy(store)),
+    ]
+    print(f"{'rows':>9} {'export':<12} {'output (MB)':>12} {'time (s)':>9} {'peak alloc (MB)':>16}")
+    for count in SIZES:
+        fill(store, count)
+        for name, function in cases:
+            size, elapsed, peak = measure(function)
+            print(f"{count:>9} {name:<12} {size / 1e6:>12.1f} {elapsed:>9.2f} {peak / 1e6:>16.2f}", flush=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""Cost of journaling store writes and time to restart from the journal.
+
+Inserts ``RECORDS`` tickets into a store with and without a StoreJournal
+subscribed, to show what journaling adds to each write on the request
+path (the fsync happens on a background thread). It then snapshots them,
+updates or deletes ``TAIL`` of them, and loads everything into an empty
+store the way the server does on startup, both as after a crash (snapshot
+plus the log written since) and after a clean shutdown (the closing
+snapshot alone), checking that the result matches.
+
+Run from the server directory:
+
+    python -m benchmarks.bench_journal
+"""
+import asyncio
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from services.journal import StoreJournal
+from services.store import IndexedStore
+
+RECORDS = 1_000_000
+TAIL = 100_000
+STATUSES = ["open", "in_progress", "resolved"]
+
+
+def new_store():
+    return IndexedStore("ticket_{:04d}", indexes=["agent_id", "status", "user_session"])
+
+
+def fill(store, count):
+    start = datetime(2026, 1, 1)
+    started = time.perf_counter()
+    for i in range(count):
+        created_at = (start + timedelta(seconds=i)).isoformat()
+        store.insert({
+            "id": store.next_id(),
+            "agent_id": f"agent_{random.randrange(100):04d}",
+            "question": "How do I reset my password after the latest update?",
+            "user_session": f"session_{random.randrange(count // 10 + 1)}",
+            "status": random.choice(STATUSES),
+            "confidence_score": round(random.random(), 4),
+            "manual_response": None,
+            "created_at": created_at,
+            "updated_at": created_at,
+        })
+    return (time.perf_counter() - started) / count * 1e6
+
+
+def restart(directory, expected, label):
+    restored = new_store()
+    journal = StoreJournal(directory, {"tickets": restored})
+    journal.load()
+    assert restored.values() == expected.values() and restored.id_counter == expected.id_counter
+    print(f"restart {label}: {len(restored):,} records in {journal.load_ms / 1000:.2f} s, "
+          f"{journal.replayed_writes:,} writes replayed")
+
+
+async def main():
+    random.seed(0)
+    with tempfile.TemporaryDirectory() as directory:
+        plain_us = fill(new_store(), RECORDS)
+        store = new_store()
+        journal = StoreJournal(directory, {"tickets": store}, snapshot_every=10 * RECORDS)
+        await journal.start()
+        random.seed(0)
+        journaled_us = fill(store, RECORDS)
+        await journal.flush()
+        print(f"insert: {plain_us:.2f} us plain, {journaled_us:.2f} us journaled "
+              f"(+{journaled_us - plain_us:.2f} us per write), log {journal.bytes_written / 1e6:.0f} MB")
+
+        await journal.snapshot()
+        print(f"snapshot of {RECORDS:,} records: {journal.last_snapshot_ms / 1000:.2f} s")
+        for number in random.sample(range(1, RECORDS + 1), TAIL):
+            record_id = store.id_format.format(number)
+            if number % 2:
+                store.update(record_id, {"status": "resolved", "manual_response": "Use the reset link."})
+            else:
+                store.delete(record_id)
+        await journal.flush()
+        restart(directory, store, "after a crash (snapshot + log tail)")
+        await journal.close()
+        restart(directory, store, "after a clean shutdown (snapshot only)")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
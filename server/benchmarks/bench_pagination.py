@@ -0,0 +1,82 @@
+"""Payload size and latency of GET /api/tickets with 100k tickets.
+
+Compares the legacy full listing with a cursor page, a projected page and
+a deep page reached by cursor, all through the real endpoint.
+
+Run from the server directory:
+
+    python -m benchmarks.bench_pagination
+"""
+import random
+import time
+from datetime import datetime, timedelta
+
+from fastapi.testclient import TestClient
+
+from main import app
+from services.store import tickets
+
+SIZE = 100_000
+AGENTS = 1_000
+STATUSES = ["open", "in_progress", "resolved"]
+REPEAT = 20
+
+
+def fill():
+    started = datetime(2024, 1, 1)
+    for i in range(SIZE):
+        created_at = (started + timedelta(seconds=i)).isoformat()
+        tickets.insert({
+            "id": tickets.next_id(),
+            "agent_id": f"agent_{random.randrange(AGENTS):04d}",
+            "question": f"How do I reset the password for account {i}?",
+            "user_session": f"session_{random.randrange(SIZE // 10)}",
+            "status": random.choice(STATUSES),
+            "confidence_score": round(random.random(), 2),
+            "created_at": created_at,
+            "updated_at": created_at,
+        })
+
+
+def measure(client, params, repeat=REPEAT):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        response = client.get("/api/tickets", params=params)
+        timings.append((time.perf_counter() - started) * 1000)
+    response.raise_for_status()
+    return len(response.content), min(timings), sorted(timings)[len(timings) // 2]
+
+
+def deep_cursor(client, pages, limit):
+    cursor = None
+    for _ in range(pages):
+        params = {"limit": limit, "sort": "-created_at"}
+        if cursor:
+            params["cursor"] = cursor
+        cursor = client.get("/api/tickets", params=params).headers["x-next-cursor"]
+    return cursor
+
+
+def main():
+    random.seed(0)
+    fill()
+    client = TestClient(app)
+    cases = [
+        ("full list (legacy)", {}, 3),
+        ("full list status=open", {"status": "open"}, 3),
+        ("page limit=50", {"limit": 50, "sort": "-created_at"}, REPEAT),
+        ("page limit=50 fields=id,status", {"limit": 50, "sort": "-created_at", "fields": "id,status"}, REPEAT),
+        ("page limit=50 status=open", {"limit": 50, "sort": "-created_at", "status": "open"}, REPEAT),
+        ("page limit=50 after 1000 pages",
+         {"limit": 50, "sort": "-created_at", "cursor": deep_cursor(client, 1000, 50)}, REPEAT),
+    ]
+    print(f"{SIZE} tickets")
+    print(f"{'request':<34} {'payload (KB)':>13} {'min (ms)':>9} {'p50 (ms)':>9}")
+    for name, params, repeat in cases:
+        size, best, median = measure(client, params, repeat)
+        print(f"{name:<34} {size / 1024:>13.1f} {best:>9.2f} {median:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
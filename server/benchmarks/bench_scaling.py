@@ -0,0 +1,63 @@
+"""Throughput of the API as the number of worker processes grows.
+
+Runs benchmarks.loadtest once per worker count, every run with shared
+state in Redis (REDIS_URL, default redis://localhost:6379) so the numbers
+compare like with like, and reports requests per second, p95 latency and
+the speedup over one worker. Run from the server directory:
+
+    python -m benchmarks.bench_scaling --workers 1 2 4 8 --mix dashboard
+
+Scaling is bounded by the cores on the machine and by the single fake
+Lyzr process; the dashboard and tickets mixes stay local to the API.
+"""
+import argparse
+import json
+import os
+import sys
+from pathlib import Path
+from typing import Optional
+
+from benchmarks import loadtest
+
+
+def main(argv: Optional[list] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--output", type=Path, help="JSON results path (default: benchmarks/results/)")
+    args, loadtest_argv = parser.parse_known_args(argv)
+
+    runs = []
+    for workers in args.workers:
+        run_args = loadtest.build_parser().parse_args(
+            loadtest_argv + ["--workers", str(workers), "--shared-state", "redis"]
+        )
+        report = loadtest.run(run_args)
+        overall = report["results"]["overall"]
+        runs.append({"workers": workers, **overall})
+        print(f"workers={workers}: {overall['rps']:.1f} rps, p95 {overall['p95_ms']:.1f} ms, "
+              f"{overall['errors']} errors", flush=True)
+
+    baseline = runs[0]["rps"] / runs[0]["workers"]
+    print(f"\n{os.cpu_count()} CPUs, mix={run_args.mix} concurrency={run_args.concurrency}")
+    print(f"{'workers':>8} {'rps':>10} {'p95 ms':>9} {'speedup':>8} {'efficiency':>11}")
+    for run in runs:
+        run["speedup"] = round(run["rps"] / baseline, 2) if baseline else 0.0
+        run["efficiency"] = round(run["speedup"] / run["workers"], 2)
+        print(f"{run['workers']:>8} {run['rps']:>10.1f} {run['p95_ms']:>9.1f} "
+              f"{run['speedup']:>7.2f}x {run['efficiency']:>10.0%}")
+
+    report = {
+        "commit": loadtest.git_commit(),
+        "cpus": os.cpu_count(),
+        "config": {key: value for key, value in vars(run_args).items() if key not in ("output", "compare", "workers")},
+        "runs": runs,
+    }
+    output = args.output or loadtest.RESULTS_DIR / f"scaling-{run_args.mix}-{report['commit'] or 'unknown'}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2) + "\n")
+    print(f"\nresults written to {output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,81 @@
+"""Indexing cost and query latency of the full-text search index.
+
+Indexes ``DOCUMENTS`` generated tickets (a question naming an invoice or
+order number, half of them with a manual response) and times queries of
+increasing selectivity: a single invoice number, a word in a few percent
+of the tickets, a word in most of them, and multi-word combinations. Each
+query asks for the first page of 20 hits, as the search endpoint does.
+
+Run from the server directory:
+
+    python -m benchmarks.bench_search
+"""
+import random
+import time
+import timeit
+
+from services.search import SearchIndex, TextIndex
+from services.store import IndexedStore
+
+DOCUMENTS = 1_000_000
+TOPICS = ["invoice", "refund", "shipping", "password", "account", "delivery", "subscription", "discount"]
+FILLER = ["the", "my", "is", "not", "was", "please", "help", "with", "order", "charged", "twice", "missing",
+          "late", "wrong", "cannot", "login", "update", "cancel", "payment", "card", "address", "email"]
+# {invoice} is replaced with the invoice number of an indexed ticket
+QUERIES = [
+    "{invoice}",
+    "subscription",
+    "order",
+    "refund charged twice",
+    "wrong address delivery late",
+]
+
+
+def question():
+    words = random.choices(FILLER, k=random.randint(6, 14))
+    words.insert(random.randrange(len(words)), random.choice(TOPICS))
+    words.append(f"INV-{random.randrange(1_000_000)}")
+    return " ".join(words)
+
+
+def main():
+    random.seed(0)
+    store = IndexedStore("ticket_{:04d}", indexes=["agent_id", "status"])
+    records = [{
+        "id": store.next_id(),
+        "agent_id": f"agent_{random.randrange(100):04d}",
+        "question": question(),
+        "status": "open",
+        "manual_response": " ".join(random.choices(FILLER, k=12)) if random.random() < 0.5 else None,
+    } for _ in range(DOCUMENTS)]
+    plain = IndexedStore("ticket_{:04d}", indexes=["agent_id", "status"])
+    started = time.perf_counter()
+    plain.load(records)
+    plain_us = (time.perf_counter() - started) / DOCUMENTS * 1e6
+
+    index = TextIndex(store, ["question", "manual_response"])
+    search = SearchIndex({"tickets": index})
+    started = time.perf_counter()
+    store.load(records)
+    indexed_us = (time.perf_counter() - started) / DOCUMENTS * 1e6
+    stats = index.stats()
+    print(f"{DOCUMENTS:,} tickets: insert {plain_us:.1f} us without the index, {indexed_us:.1f} us with it; "
+          f"{stats['terms']:,} terms, {stats['postings']:,} postings ({stats['postings_bytes'] / 1e6:.0f} MB)")
+
+    # Updating an old ticket's response rewrites only the changed postings
+    started = time.perf_counter()
+    for number in random.sample(range(1, DOCUMENTS + 1), 1000):
+        store.update(store.id_format.format(number), {"manual_response": "Refund issued to the original card"})
+    print(f"update of an old ticket: {(time.perf_counter() - started) * 1000:.0f} us\n")
+
+    invoice = records[DOCUMENTS // 2]["question"].split()[-1]
+    print(f"{'query':<30} {'matches':>9} {'first page (ms)':>16}")
+    for query in QUERIES:
+        query = query.format(invoice=invoice)
+        total, _ = search.search(query, limit=20)
+        ms = min(timeit.repeat(lambda: search.search(query, limit=20), number=1, repeat=20)) * 1000
+        print(f"{query:<30} {total:>9,} {ms:>16.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""Cost of serving a list response: response models vs. stored dicts vs. cached pages.
+
+For 1k, 10k and 100k tickets, times building the body of an unpaginated
+list response four ways: validating each record into a Pydantic model and
+encoding it (what a ``response_model`` does), encoding the stored dicts
+with the standard library (the old JSONResponse), ``paginated_response``
+encoding them with orjson, and ``paginated_response`` serving the page
+from its ResponseCache, as it does until the next write to the store.
+
+Run from the server directory:
+
+    python -m benchmarks.bench_serialization
+"""
+import json
+import random
+import timeit
+from datetime import datetime, timedelta
+from typing import Optional
+
+from pydantic import BaseModel
+
+from services.pagination import paginated_response
+from services.serialization import ORJSON_AVAILABLE, ResponseCache
+from services.store import IndexedStore
+
+SIZES = [1_000, 10_000, 100_000]
+STATUSES = ["open", "in_progress", "resolved"]
+
+
+class Ticket(BaseModel):
+    id: str
+    agent_id: str
+    question: str
+    user_session: str
+    status: str
+    confidence_score: Optional[float]
+    manual_response: Optional[str] = None
+    created_at: str
+    updated_at: str
+
+
+def build(size):
+    store = IndexedStore("ticket_{:04d}", indexes=["agent_id", "status"])
+    start = datetime(2026, 1, 1)
+    for i in range(size):
+        created_at = (start + timedelta(seconds=i)).isoformat()
+        store.insert({
+            "id": store.next_id(),
+            "agent_id": f"agent_{random.randrange(100):04d}",
+            "question": "How do I reset my password after the latest update?",
+            "user_session": f"session_{random.randrange(size // 10 + 1)}",
+            "status": random.choice(STATUSES),
+            "confidence_score": round(random.random(), 4),
+            "created_at": created_at,
+            "updated_at": created_at,
+        })
+    return store
+
+
+def best_ms(fn, repeat):
+    return min(timeit.repeat(fn, number=1, repeat=repeat)) * 1000
+
+
+def main():
+    random.seed(0)
+    print(f"orjson installed: {ORJSON_AVAILABLE}\n")
+    print(f"{'items':>8} {'models (ms)':>12} {'json (ms)':>10} {'orjson (ms)':>12} {'cached (ms)':>12} "
+          f"{'orjson speedup':>15}")
+    for size in SIZES:
+        store = build(size)
+        cache = ResponseCache(store, max_bytes=1 << 30)
+        repeat = 3 if size >= 100_000 else 10
+
+        def models():
+            records = list(store.scan())
+            return json.dumps([Ticket(**record).model_dump() for record in records], separators=(",", ":")).encode()
+
+        def stdlib():
+            return json.dumps(list(store.scan()), ensure_ascii=False, separators=(",", ":")).encode()
+
+        model_ms = best_ms(models, repeat)
+        json_ms = best_ms(stdlib, repeat)
+        orjson_ms = best_ms(lambda: paginated_response(store, None, None, "created_at", None).body, repeat)
+        body = paginated_response(store, None, None, "created_at", None, cache=cache).body
+        cached_ms = best_ms(lambda: paginated_response(store, None, None, "created_at", None, cache=cache).body, repeat)
+        assert json.loads(body) == json.loads(stdlib())
+        print(f"{size:>8} {model_ms:>12.2f} {json_ms:>10.2f} {orjson_ms:>12.2f} {cached_ms:>12.3f} "
+              f"{model_ms / orjson_ms:>14.1f}x")
+
+
+if __name__ == "__main__":
+    main()
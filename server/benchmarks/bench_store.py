@@ -0,0 +1,68 @@
+"""Lookup and filter latency of IndexedStore vs. the old list scans.
+
+Each agent owns ~100 tickets at every size, so a flat indexed column means
+the cost depends on the result size only, not on the size of the store.
+
+Run from the server directory:
+
+    python -m benchmarks.bench_store
+"""
+import random
+import timeit
+
+from services.store import IndexedStore
+
+SIZES = [1_000, 10_000, 100_000]
+TICKETS_PER_AGENT = 100
+STATUSES = ["open", "in_progress", "resolved"]
+REPEAT = 200
+
+
+def build(size):
+    store = IndexedStore("ticket_{:04d}", indexes=["agent_id", "status", "user_session"])
+    rows = []
+    for _ in range(size):
+        ticket = {
+            "id": store.next_id(),
+            "agent_id": f"agent_{random.randrange(size // TICKETS_PER_AGENT):04d}",
+            "user_session": f"session_{random.randrange(size // 10 + 1)}",
+            "status": random.choice(STATUSES),
+        }
+        store.insert(ticket)
+        rows.append(ticket)
+    return store, rows
+
+
+def per_call_us(fn):
+    return min(timeit.repeat(fn, number=REPEAT, repeat=3)) / REPEAT * 1e6
+
+
+def main():
+    random.seed(0)
+    print(f"{'size':>8} {'op':<28} {'list scan (us)':>15} {'indexed (us)':>13}")
+    for size in SIZES:
+        store, rows = build(size)
+        target = rows[size // 2]["id"]
+        agent_id = "agent_0007"
+
+        def scan_get():
+            for row in rows:
+                if row["id"] == target:
+                    return row
+
+        def scan_filter():
+            return [r for r in rows if r["agent_id"] == agent_id and r["status"] == "open"]
+
+        results = [
+            ("get by id", scan_get, lambda: store.get(target)),
+            ("filter agent_id+status", scan_filter, lambda: store.find(agent_id=agent_id, status="open")),
+            ("count status=open",
+             lambda: len([r for r in rows if r["status"] == "open"]),
+             lambda: store.count(status="open")),
+        ]
+        for name, baseline, indexed in results:
+            print(f"{size:>8} {name:<28} {per_call_us(baseline):>15.2f} {per_call_us(indexed):>13.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""Fake Lyzr API with configurable latency and error rate.
+
+Used to exercise retries, circuit breakers and load tests without touching
+the real service. Run from the server directory:
+
+    python -m benchmarks.fake_lyzr --port 9100 --latency-ms 200 --error-rate 0.05
+
+then start the API with LYZR_API_URL=http://127.0.0.1:9100 and any
+LYZR_API_KEY. Settings can be changed at runtime with PUT /_config, e.g.
+to simulate an outage: {"error_rate": 1.0}.
+"""
+import argparse
+import asyncio
+import json
+import random
+from collections import Counter
+from typing import Any, Dict, Optional
+
+import uvicorn
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import StreamingResponse
+
+DEFAULT_CONFIG = {
+    "latency_ms": 100.0,
+    "jitter_ms": 20.0,
+    "error_rate": 0.0,
+    "error_status": 503,
+    "low_confidence_rate": 0.1,
+    "stream_chunk_delay_ms": 10.0,
+}
+
+
+def make_app(**overrides: Any) -> FastAPI:
+    """Build a fake Lyzr app; keyword arguments override DEFAULT_CONFIG"""
+    app = FastAPI(title="Fake Lyzr API")
+    config: Dict[str, Any] = {**DEFAULT_CONFIG, **overrides}
+    requests = Counter()
+    agent_counter = iter(range(1, 10 ** 9))
+
+    async def simulate(operation: str) -> None:
+        requests[operation] += 1
+        delay = max(0.0, config["latency_ms"] + random.uniform(-1, 1) * config["jitter_ms"])
+        await asyncio.sleep(delay / 1000)
+        if random.random() < config["error_rate"]:
+            requests[f"{operation}_errors"] += 1
+            raise HTTPException(status_code=config["error_status"], detail="Simulated upstream failure")
+
+    def confidence() -> float:
+        return 0.4 if random.random() < config["low_confidence_rate"] else 0.9
+
+    @app.get("/_config")
+    async def get_config():
+        return config
+
+    @app.put("/_config")
+    async def update_config(changes: Dict[str, Any]):
+        config.update({key: value for key, value in changes.items() if key in DEFAULT_CONFIG})
+        return config
+
+    @app.get("/_stats")
+    async def get_stats():
+        return dict(requests)
+
+    @app.post("/agents")
+    async def create_agent(agent: Dict[str, Any]):
+        await simulate("create_agent")
+        return {"id": f"fake_agent_{next(agent_counter)}", "status": "created", "name": agent.get("name")}
+
+    @app.put("/agents/{agent_id}")
+    async def update_agent(agent_id: str, agent: Dict[str, Any]):
+        await simulate("update_agent")
+        return {"id": agent_id, "status": "updated", "name": agent.get("name")}
+
+    @app.delete("/agents/{agent_id}")
+    async def delete_agent(agent_id: str):
+        await simulate("delete_agent")
+        return {"id": agent_id, "status": "deleted"}
+
+    @app.get("/agents/{agent_id}/analytics")
+    async def agent_analytics(agent_id: str):
+        await simulate("analytics")
+        return {
+            "agent_id": agent_id,
+            "total_conversations": requests["chat"],
+            "average_confidence": 0.85,
+            "tickets_created": 0,
+            "user_satisfaction": 4.5,
+            "response_time_avg": config["latency_ms"] / 1000,
+        }
+
+    @app.post("/chat")
+    async def chat(request: Request):
+        body = await request.json()
+        await simulate("chat")
+        text = f"Fake answer to: {body.get('message', '')}"
+        score = confidence()
+        if not body.get("stream"):
+            return {"response": text, "confidence_score": score, "agent_id": body.get("agent_id")}
+
+        async def events():
+            for word in text.split(" "):
+                await asyncio.sleep(config["stream_chunk_delay_ms"] / 1000)
+                yield f"data: {json.dumps({'delta': word + ' '})}\n\n"
+            yield f"data: {json.dumps({'response': text, 'confidence_score': score})}\n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    return app
+
+
+def main(argv: Optional[list] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    for key, default in DEFAULT_CONFIG.items():
+        parser.add_argument(f"--{key.replace('_', '-')}", type=type(default), default=default)
+    args = parser.parse_args(argv)
+    overrides = {key: getattr(args, key) for key in DEFAULT_CONFIG}
+    uvicorn.run(make_app(**overrides), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
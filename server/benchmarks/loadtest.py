@@ -0,0 +1,382 @@
+"""Load test of the API against the fake Lyzr server.
+
+Starts benchmarks.fake_lyzr and ``uvicorn main:app`` as subprocesses on
+free ports, seeds agents, then drives a weighted mix of chat, ticket and
+dashboard requests from a fixed number of concurrent clients. Prints
+p50/p95/p99 latency and requests per second per operation and writes
+the same numbers as JSON so runs can be compared between commits.
+
+Run from the server directory:
+
+    python -m benchmarks.loadtest --mix mixed --concurrency 50 --duration 30
+    python -m benchmarks.loadtest --compare benchmarks/results/loadtest-<commit>.json
+
+The fake upstream's behaviour is set with --latency-ms, --jitter-ms and
+--error-rate; --workers starts the API with several workers sharing state
+through Redis (REDIS_URL), see benchmarks.bench_scaling.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+import uuid
+from collections import defaultdict
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+SERVER_DIR = Path(__file__).resolve().parent.parent
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+
+QUESTIONS = [
+    "How do I reset my password?",
+    "Where can I download my invoice?",
+    "Can I change my subscription plan?",
+    "Why was my card declined?",
+    "How do I add a team member?",
+    "Is there an API rate limit?",
+    "How do I cancel my account?",
+    "What payment methods do you accept?",
+]
+
+# Operation weights for each traffic mix
+MIXES = {
+    "chat": {"chat": 85, "chat_stream": 15},
+    "tickets": {"list_tickets": 40, "list_tickets_filtered": 25, "create_ticket": 15, "update_ticket": 20},
+    "dashboard": {"list_agents": 25, "overview": 30, "agent_analytics": 20, "list_tickets": 25},
+    "mixed": {
+        "chat": 50, "chat_stream": 10, "list_tickets": 10, "list_tickets_filtered": 5,
+        "update_ticket": 5, "list_agents": 5, "overview": 10, "agent_analytics": 5,
+    },
+}
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, int(round(q / 100 * len(sorted_values) + 0.5)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=SERVER_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def wait_ready(url: str, process: subprocess.Popen, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            if process.poll() is not None:
+                raise RuntimeError(f"{process.args} exited with {process.returncode}")
+            try:
+                await client.get(url)
+                return
+            except httpx.TransportError:
+                await asyncio.sleep(0.1)
+    raise RuntimeError(f"{url} did not come up within {timeout}s")
+
+
+async def wait_workers(url: str, workers: int, timeout: float = 60.0) -> None:
+    """Wait until requests have been answered by every worker process"""
+    seen = set()
+    deadline = time.monotonic() + timeout
+    while len(seen) < workers:
+        if time.monotonic() > deadline:
+            raise RuntimeError(f"only {len(seen)} of {workers} workers answered within {timeout}s")
+        # A new connection each time so the kernel spreads them over the workers
+        async with httpx.AsyncClient() as client:
+            response = await client.get(f"{url}/api/storage/stats")
+            seen.add(response.json()["shared_state"]["worker_id"])
+
+
+class Scenario:
+    """Request builders for every operation, sharing seeded ids"""
+
+    def __init__(self, client: httpx.AsyncClient, agent_ids: List[str]):
+        self.client = client
+        self.agent_ids = agent_ids
+        self.ticket_ids: List[str] = []
+
+    def _chat_body(self) -> Dict[str, Any]:
+        question = random.choice(QUESTIONS)
+        # A third of the questions are unique, the rest repeat (as real traffic does)
+        if random.random() < 0.33:
+            question = f"{question} (order {random.randrange(10 ** 6)})"
+        return {
+            "agent_id": random.choice(self.agent_ids),
+            "message": question,
+            "user_session": f"session_{random.randrange(1000)}",
+        }
+
+    async def chat(self) -> httpx.Response:
+        return await self.client.post("/api/chat", json=self._chat_body())
+
+    async def chat_stream(self) -> httpx.Response:
+        async with self.client.stream("POST", "/api/chat/stream", json=self._chat_body()) as response:
+            await response.aread()
+        return response
+
+    async def list_tickets(self) -> httpx.Response:
+        response = await self.client.get("/api/tickets", params={"limit": 50, "sort": "-created_at"})
+        if response.status_code == 200:
+            self.ticket_ids = [ticket["id"] for ticket in response.json()] or self.ticket_ids
+        return response
+
+    async def list_tickets_filtered(self) -> httpx.Response:
+        return await self.client.get("/api/tickets", params={
+            "agent_id": random.choice(self.agent_ids), "status": "open", "limit": 50, "sort": "-created_at",
+        })
+
+    async def create_ticket(self) -> httpx.Response:
+        body = self._chat_body()
+        return await self.client.post("/api/tickets", json={
+            "agent_id": body["agent_id"], "question": body["message"],
+            "user_session": body["user_session"], "confidence_score": 0.3,
+        })
+
+    async def update_ticket(self) -> httpx.Response:
+        if not self.ticket_ids:
+            return await self.list_tickets()
+        return await self.client.put(f"/api/tickets/{random.choice(self.ticket_ids)}", params={
+            "status": random.choice(["open", "in_progress", "resolved"]),
+        })
+
+    async def list_agents(self) -> httpx.Response:
+        return await self.client.get("/api/agents", params={"user_id": "loadtest"})
+
+    async def overview(self) -> httpx.Response:
+        return await self.client.get("/api/analytics/overview")
+
+    async def agent_analytics(self) -> httpx.Response:
+        return await self.client.get(f"/api/agents/{random.choice(self.agent_ids)}/analytics")
+
+
+async def seed(client: httpx.AsyncClient, agents: int, tickets: int) -> List[str]:
+    response = await client.post("/api/agents/bulk", json={"agents": [{
+        "name": f"Load test agent {i}", "description": "Seeded by benchmarks.loadtest",
+        "tone": "friendly", "personality": "helpful", "knowledge_base": [], "user_id": "loadtest",
+    } for i in range(agents)]})
+    response.raise_for_status()
+    agent_ids = [agent["id"] for agent in response.json()["agents"]]
+    # Agents take chats once their provisioning jobs are done
+    for job in response.json()["jobs"]:
+        while job["status"] in ("queued", "running"):
+            await asyncio.sleep(0.05)
+            polled = await client.get(f"/api/jobs/{job['id']}")
+            # Another worker may not have seen the job yet
+            if polled.status_code != 404:
+                polled.raise_for_status()
+                job = polled.json()
+        if job["status"] != "succeeded":
+            raise RuntimeError(f"Provisioning {job['agent_id']} failed: {job['error']}")
+    scenario = Scenario(client, agent_ids)
+    for _ in range(tickets):
+        (await scenario.create_ticket()).raise_for_status()
+    return agent_ids
+
+
+async def drive(base_url: str, args: argparse.Namespace) -> Dict[str, Any]:
+    weights = MIXES[args.mix]
+    operations, operation_weights = list(weights), list(weights.values())
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        agent_ids = await seed(client, args.agents, args.tickets)
+        scenario = Scenario(client, agent_ids)
+        latencies: Dict[str, List[float]] = defaultdict(list)
+        errors: Dict[str, int] = defaultdict(int)
+        statuses: Dict[str, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+        recording = False
+
+        async def worker(stop_at: float) -> None:
+            while time.monotonic() < stop_at:
+                operation = random.choices(operations, operation_weights)[0]
+                started = time.perf_counter()
+                try:
+                    response = await getattr(scenario, operation)()
+                    status = str(response.status_code)
+                except httpx.HTTPError as e:
+                    status = type(e).__name__
+                elapsed = time.perf_counter() - started
+                if recording:
+                    latencies[operation].append(elapsed)
+                    statuses[operation][status] += 1
+                    if not status.startswith("2"):
+                        errors[operation] += 1
+
+        if args.warmup:
+            stop_at = time.monotonic() + args.warmup
+            await asyncio.gather(*(worker(stop_at) for _ in range(args.concurrency)))
+        recording = True
+        started = time.monotonic()
+        stop_at = started + args.duration
+        await asyncio.gather(*(worker(stop_at) for _ in range(args.concurrency)))
+        elapsed = time.monotonic() - started
+
+    def summarize(values: List[float], error_count: int) -> Dict[str, Any]:
+        values = sorted(values)
+        return {
+            "requests": len(values),
+            "errors": error_count,
+            "rps": round(len(values) / elapsed, 2),
+            "mean_ms": round(sum(values) / len(values) * 1000, 3) if values else 0.0,
+            "p50_ms": round(percentile(values, 50) * 1000, 3),
+            "p95_ms": round(percentile(values, 95) * 1000, 3),
+            "p99_ms": round(percentile(values, 99) * 1000, 3),
+            "max_ms": round(values[-1] * 1000, 3) if values else 0.0,
+        }
+
+    per_operation = {
+        operation: {**summarize(values, errors[operation]), "statuses": dict(statuses[operation])}
+        for operation, values in sorted(latencies.items())
+    }
+    overall = summarize([value for values in latencies.values() for value in values], sum(errors.values()))
+    return {"duration_s": round(elapsed, 3), "overall": overall, "operations": per_operation}
+
+
+def start_processes(args: argparse.Namespace):
+    python = sys.executable
+    lyzr_port, api_port = free_port(), free_port()
+    fake = subprocess.Popen([
+        python, "-m", "benchmarks.fake_lyzr", "--port", str(lyzr_port),
+        "--latency-ms", str(args.latency_ms), "--jitter-ms", str(args.jitter_ms),
+        "--error-rate", str(args.error_rate),
+    ], cwd=SERVER_DIR)
+    env = {
+        **os.environ,
+        "LYZR_API_URL": f"http://127.0.0.1:{lyzr_port}",
+        "LYZR_API_KEY": "loadtest",
+    }
+    if not args.database_url:
+        env.pop("DATABASE_URL", None)
+    else:
+        env["DATABASE_URL"] = args.database_url
+    env["SHARED_STATE"] = args.shared_state or ("redis" if args.workers > 1 else "memory")
+    # A fresh key prefix so runs never see each other's records
+    env["SHARED_STATE_PREFIX"] = f"loadtest:{uuid.uuid4().hex[:8]}"
+    # Measure capacity, not the rate limits a few simulated agents would exhaust
+    for scope in ("SESSION", "BATCH", "AGENT", "USER", "AGENT_CREATE", "AGENT_BULK"):
+        env.setdefault(f"RATE_LIMIT_{scope}_RATE", "0")
+    api = subprocess.Popen([
+        python, "main.py", "--port", str(api_port), "--workers", str(args.workers),
+        "--no-reload", "--log-level", "warning", "--no-access-log",
+    ], cwd=SERVER_DIR, env=env)
+    return fake, api, f"http://127.0.0.1:{lyzr_port}", f"http://127.0.0.1:{api_port}"
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    results = report["results"]
+    print(f"mix={report['config']['mix']} concurrency={report['config']['concurrency']} "
+          f"duration={results['duration_s']}s commit={report['commit']}")
+    print(f"{'operation':<24} {'requests':>9} {'errors':>7} {'rps':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    rows = list(results["operations"].items()) + [("overall", results["overall"])]
+    for name, row in rows:
+        print(f"{name:<24} {row['requests']:>9} {row['errors']:>7} {row['rps']:>9.1f} "
+              f"{row['p50_ms']:>9.2f} {row['p95_ms']:>9.2f} {row['p99_ms']:>9.2f}")
+
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any], max_regression: float) -> bool:
+    """Print p95/rps changes against a baseline; False if any p95 regressed too far"""
+    ok = True
+    print(f"\ncompared with {baseline.get('commit')} ({baseline.get('timestamp')})")
+    print(f"{'operation':<24} {'p95 ms':>20} {'change':>8} {'rps':>20}")
+    current = {**report["results"]["operations"], "overall": report["results"]["overall"]}
+    previous = {**baseline["results"]["operations"], "overall": baseline["results"]["overall"]}
+    for name, row in current.items():
+        if name not in previous:
+            continue
+        before = previous[name]
+        change = (row["p95_ms"] - before["p95_ms"]) / before["p95_ms"] if before["p95_ms"] else 0.0
+        flag = ""
+        if change > max_regression:
+            ok = False
+            flag = "  REGRESSION"
+        print(f"{name:<24} {before['p95_ms']:>9.2f}->{row['p95_ms']:<9.2f} {change:>+8.1%} "
+              f"{before['rps']:>9.1f}->{row['rps']:<9.1f}{flag}")
+    return ok
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--mix", choices=sorted(MIXES), default="mixed")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--duration", type=float, default=30.0)
+    parser.add_argument("--warmup", type=float, default=3.0)
+    parser.add_argument("--agents", type=int, default=10)
+    parser.add_argument("--tickets", type=int, default=200)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--shared-state", choices=["memory", "redis"],
+                        help="state backend (default: redis with several workers; needs REDIS_URL)")
+    parser.add_argument("--latency-ms", type=float, default=100.0)
+    parser.add_argument("--jitter-ms", type=float, default=20.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--database-url", help="DATABASE_URL for the API (persistence is off by default)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", type=Path, help="JSON results path (default: benchmarks/results/)")
+    parser.add_argument("--compare", type=Path, help="earlier JSON results to compare against")
+    parser.add_argument("--max-regression", type=float, default=0.2,
+                        help="fail when a p95 grows by more than this fraction vs. --compare")
+    return parser
+
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    """Start the servers, drive the load and return the report"""
+    random.seed(args.seed)
+    fake, api, lyzr_url, api_url = start_processes(args)
+    try:
+        async def measure():
+            await wait_ready(f"{lyzr_url}/_config", fake)
+            await wait_ready(f"{api_url}/", api)
+            await wait_workers(api_url, args.workers)
+            return await drive(api_url, args)
+        results = asyncio.run(measure())
+    finally:
+        for process in (api, fake):
+            process.terminate()
+            process.wait(timeout=30)
+
+    return {
+        "commit": git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "config": {key: (str(value) if isinstance(value, Path) else value) for key, value in vars(args).items()
+                   if key not in ("output", "compare")},
+        "results": results,
+    }
+
+
+def main(argv: Optional[list] = None) -> int:
+    args = build_parser().parse_args(argv)
+    report = run(args)
+    commit = report["commit"]
+    print_report(report)
+    output = args.output or RESULTS_DIR / f"loadtest-{args.mix}-{commit or 'unknown'}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2) + "\n")
+    print(f"\nresults written to {output}")
+
+    if args.compare:
+        if not compare(report, json.loads(args.compare.read_text()), args.max_regression):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
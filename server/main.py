@@ -1,23 +1,77 @@
-from fastapi import FastAPI, HTTPException, Depends, status
+from fastapi import FastAPI, HTTPException, Depends, Query, WebSocket, WebSocketDisconnect, status
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
-from pydantic import BaseModel, EmailStr
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
+from pydantic import BaseModel, EmailStr, Field
 from typing import List, Optional, Dict, Any
 import uvicorn
 from dotenv import load_dotenv
 import os
 import httpx
 import json
-from datetime import datetime
-from services.lyzr_api import lyzr_service
+import math
+import asyncio
+import itertools
+from collections import Counter
+import time
+from datetime import datetime, timedelta
+from contextlib import asynccontextmanager
 
-# Load environment variables
+# Load environment variables (before the services read their settings)
 load_dotenv()
 
+from services.lyzr_api import lyzr_service, LyzrUnavailableError
+from services.store import support_requests, agents, tickets, chat_sessions, provisioning_jobs
+from services.analytics import overview_stats
+from services.agent_configs import agent_configs, agent_definition, AgentConfig
+from services.faq_index import faq_index
+from services.search import search_index
+from services.conversations import conversations
+from services.events import event_hub, TOPICS
+from services.rollups import rollups, RESOLUTIONS
+from services.export import export_response
+from services.rate_limit import RateLimitedError, admission
+from services.provisioning import provisioning, PROVISIONING, READY, FAILED
+from services.persistence import persistence
+from services.journal import journal
+from services.write_behind import store_writes
+from services.shared_state import shared_state
+from services.metrics import metrics, MetricsMiddleware, loop_monitor, agent_response_duration
+from services.pagination import (
+    MAX_PAGE_SIZE, NEXT_CURSOR_HEADER, TOTAL_COUNT_HEADER, decode_cursor, encode_cursor, paginated_response,
+    parse_fields, project,
+)
+from services.serialization import FastJSONResponse, ResponseCache
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Open shared resources on startup and release them on shutdown"""
+    await loop_monitor.start()
+    await lyzr_service.start()
+    await persistence.start()
+    await journal.start()
+    await shared_state.start()
+    if shared_state.enabled:
+        lyzr_service.use_shared_cache(shared_state.client, shared_state.prefix)
+        provisioning.lease = shared_state.lease
+    await store_writes.start()
+    await event_hub.start()
+    await provisioning.start()
+    yield
+    await provisioning.close()
+    await event_hub.close()
+    await store_writes.close()
+    await shared_state.close()
+    await journal.close()
+    await persistence.close()
+    await lyzr_service.close()
+    await loop_monitor.close()
+
 app = FastAPI(
     title="Lyzr Support API",
     description="API for Lyzr Support Application with Agent Management",
-    version="2.0.0"
+    version="2.0.0",
+    lifespan=lifespan,
+    default_response_class=FastJSONResponse
 )
 
 # CORS middleware
@@ -27,7 +81,10 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER, TOTAL_COUNT_HEADER],
 )
+# Added last so it wraps everything, CORS included
+app.add_middleware(MetricsMiddleware)
 
 # Pydantic models
 class SupportRequest(BaseModel):
@@ -60,6 +117,24 @@ class AgentResponse(BaseModel):
     lyzr_agent_id: Optional[str]
     user_id: str
     is_active: bool
+    status: str = READY
+    created_at: str
+    updated_at: str
+
+# Most agents one POST /api/agents/bulk may create
+AGENT_BULK_MAX_ITEMS = int(os.getenv("AGENT_BULK_MAX_ITEMS", "1000"))
+
+class AgentBulkCreate(BaseModel):
+    agents: List[AgentCreate] = Field(..., min_length=1, max_length=AGENT_BULK_MAX_ITEMS)
+
+class JobResponse(BaseModel):
+    id: str
+    type: str
+    agent_id: str
+    user_id: Optional[str]
+    status: str
+    lyzr_agent_id: Optional[str]
+    error: Optional[str]
     created_at: str
     updated_at: str
 
@@ -73,6 +148,19 @@ class ChatResponse(BaseModel):
     confidence_score: float
     ticket_created: bool
 
+# Limits for POST /api/chat/batch; concurrency stays below the Lyzr chat
+# bulkhead so interactive chats keep getting slots while a batch runs
+CHAT_BATCH_MAX_ITEMS = int(os.getenv("CHAT_BATCH_MAX_ITEMS", "1000"))
+CHAT_BATCH_CONCURRENCY = int(os.getenv("CHAT_BATCH_CONCURRENCY", "8"))
+CHAT_BATCH_MAX_CONCURRENCY = int(os.getenv("CHAT_BATCH_MAX_CONCURRENCY", "32"))
+CHAT_BATCH_LOG_SIZE = 100
+# Seconds a batch message waits for rate-limit tokens before failing with 429
+CHAT_BATCH_MAX_WAIT = float(os.getenv("CHAT_BATCH_MAX_WAIT", "30"))
+
+class ChatBatch(BaseModel):
+    messages: List[ChatMessage] = Field(..., min_length=1, max_length=CHAT_BATCH_MAX_ITEMS)
+    concurrency: Optional[int] = Field(None, ge=1, le=CHAT_BATCH_MAX_CONCURRENCY)
+
 class TicketCreate(BaseModel):
     agent_id: str
     question: str
@@ -87,11 +175,29 @@ class AnalyticsResponse(BaseModel):
     user_satisfaction: float
     response_time_avg: float
 
-# In-memory storage (replace with database in production)
-support_requests = []
-agents = []
-tickets = []
-chat_sessions = []
+# Range of GET /api/analytics/timeseries when no start is given, and the most buckets one call may return
+TIMESERIES_DEFAULT_POINTS = {"minute": 60, "hour": 24, "day": 30}
+TIMESERIES_MAX_POINTS = 10_000
+
+# Page size of GET /api/search when no limit is given
+SEARCH_DEFAULT_LIMIT = 20
+
+# Fields accepted by the fields= projection on list endpoints
+AGENT_FIELDS = list(AgentResponse.model_fields)
+JOB_FIELDS = list(JobResponse.model_fields)
+TICKET_FIELDS = [
+    "id", "agent_id", "question", "user_session", "status",
+    "confidence_score", "manual_response", "created_at", "updated_at",
+]
+CHAT_SESSION_FIELDS = [
+    "id", "agent_id", "user_session", "message", "response",
+    "confidence_score", "response_time", "created_at",
+]
+
+# Encoded list pages, reused until the store is next written
+agent_pages = ResponseCache(agents)
+job_pages = ResponseCache(provisioning_jobs)
+ticket_pages = ResponseCache(tickets)
 
 @app.get("/")
 async def root():
@@ -102,219 +208,587 @@ async def health_check():
     return {"status": "healthy", "service": "lyzr-support-api", "version": "2.0.0"}
 
 # Agent Management Endpoints
-@app.post("/api/agents", response_model=AgentResponse)
-async def create_agent(agent_data: AgentCreate):
-    """Create a new agent"""
-    try:
-        # Create Lyzr agent
-        lyzr_agent = await lyzr_service.create_agent({
-            "name": agent_data.name,
-            "description": agent_data.description,
-            "tone": agent_data.tone,
-            "personality": agent_data.personality,
-            "knowledge_base": agent_data.knowledge_base,
-        })
-        
-        # Generate local agent ID
-        agent_id = f"agent_{len(agents) + 1:04d}"
-        
-        # Store agent data
-        agent = {
-            "id": agent_id,
-            "name": agent_data.name,
-            "description": agent_data.description,
-            "tone": agent_data.tone,
-            "personality": agent_data.personality,
-            "knowledge_base": agent_data.knowledge_base,
-            "lyzr_agent_id": lyzr_agent.get("id"),
-            "user_id": agent_data.user_id,
-            "is_active": True,
-            "created_at": datetime.now().isoformat(),
-            "updated_at": datetime.now().isoformat(),
-        }
-        agents.append(agent)
-        
-        return AgentResponse(**agent)
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+async def new_agent(agent_data: AgentCreate) -> Dict[str, Any]:
+    """Store an agent in the provisioning state and queue its creation in Lyzr; returns the job"""
+    agent = {
+        "id": await agents.allocate_id(),
+        **agent_definition(agent_data.model_dump()),
+        "lyzr_agent_id": None,
+        "user_id": agent_data.user_id,
+        "is_active": True,
+        "status": PROVISIONING,
+        "created_at": datetime.now().isoformat(),
+        "updated_at": datetime.now().isoformat(),
+    }
+    agents.insert(agent)
+    return await provisioning.submit(agent)
+
+@app.post("/api/agents", response_model=AgentResponse, status_code=status.HTTP_202_ACCEPTED)
+async def create_agent(agent_data: AgentCreate, response: Response):
+    """Create a new agent and provision it in Lyzr in the background.
+
+    The agent is returned at once with status ``provisioning``. The
+    ``Location`` header points at the provisioning job, and an
+    ``agent.update`` event reports when the agent turns ``ready`` with its
+    ``lyzr_agent_id`` (or ``failed``).
+    """
+    admission.admit([("agent_create", agent_data.user_id)])
+    job = await new_agent(agent_data)
+    response.headers["Location"] = f"/api/jobs/{job['id']}"
+    return AgentResponse(**agents.get(job["agent_id"]))
+
+@app.post("/api/agents/bulk", status_code=status.HTTP_202_ACCEPTED)
+async def create_agents_bulk(batch: AgentBulkCreate):
+    """Create many agents at once; each is provisioned by its own job.
+
+    Returns ``{"agents": [...], "jobs": [...]}`` in request order. The
+    request is charged one token per agent against each agent's user in
+    the bulk-import scope, which allows a full bulk at once; if any user's
+    bucket is short the whole batch is rejected with 429 and a Retry-After.
+    The upstream creates are paced by the provisioning queue.
+    """
+    per_user = Counter(agent.user_id for agent in batch.agents)
+    admission.admit([("agent_bulk", user_id, count) for user_id, count in per_user.items()])
+    jobs = [await new_agent(agent_data) for agent_data in batch.agents]
+    return {
+        "agents": [AgentResponse(**agents.get(job["agent_id"])) for job in jobs],
+        "jobs": [JobResponse(**job) for job in jobs],
+    }
 
 @app.get("/api/agents", response_model=List[AgentResponse])
-async def get_agents(user_id: Optional[str] = None):
-    """Get all agents, optionally filtered by user_id"""
-    if user_id:
-        user_agents = [agent for agent in agents if agent["user_id"] == user_id]
-        return [AgentResponse(**agent) for agent in user_agents]
-    return [AgentResponse(**agent) for agent in agents]
+async def get_agents(
+    user_id: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    sort: str = "created_at",
+    fields: Optional[str] = None,
+):
+    """Get agents, optionally filtered by user_id, paginated and projected"""
+    selected = parse_fields(fields, AGENT_FIELDS) or AGENT_FIELDS
+    return paginated_response(agents, limit, cursor, sort, selected, cache=agent_pages, user_id=user_id)
 
 @app.get("/api/agents/{agent_id}", response_model=AgentResponse)
 async def get_agent(agent_id: str):
     """Get a specific agent"""
-    for agent in agents:
-        if agent["id"] == agent_id:
-            return AgentResponse(**agent)
-    raise HTTPException(status_code=404, detail="Agent not found")
-
-@app.put("/api/agents/{agent_id}", response_model=AgentResponse)
-async def update_agent(agent_id: str, agent_data: AgentCreate):
-    """Update an agent"""
-    for i, agent in enumerate(agents):
-        if agent["id"] == agent_id:
-            # Update Lyzr agent
-            lyzr_agent = await lyzr_service.update_agent(
-                agent["lyzr_agent_id"] or agent_id,
-                {
-                    "name": agent_data.name,
-                    "description": agent_data.description,
-                    "tone": agent_data.tone,
-                    "personality": agent_data.personality,
-                    "knowledge_base": agent_data.knowledge_base,
-                }
-            )
-            
-            # Update local agent
-            agents[i].update({
-                "name": agent_data.name,
-                "description": agent_data.description,
-                "tone": agent_data.tone,
-                "personality": agent_data.personality,
-                "knowledge_base": agent_data.knowledge_base,
-                "lyzr_agent_id": lyzr_agent.get("id"),
-                "updated_at": datetime.now().isoformat(),
-            })
-            return AgentResponse(**agents[i])
-    raise HTTPException(status_code=404, detail="Agent not found")
+    agent = agents.get(agent_id)
+    if not agent:
+        raise HTTPException(status_code=404, detail="Agent not found")
+    return FastJSONResponse(project(agent, AGENT_FIELDS))
+
+@app.put("/api/agents/{agent_id}", response_model=AgentResponse, status_code=status.HTTP_202_ACCEPTED)
+async def update_agent(agent_id: str, agent_data: AgentCreate, response: Response):
+    """Update an agent and send the new definition to Lyzr in the background.
+
+    The ``Location`` header points at the provisioning job. An agent whose
+    creation failed is provisioned again.
+    """
+    agent = agents.get(agent_id)
+    if not agent:
+        raise HTTPException(status_code=404, detail="Agent not found")
+
+    changes = {**agent_definition(agent_data.model_dump()), "updated_at": datetime.now().isoformat()}
+    if agent.get("status") == FAILED:
+        changes["status"] = PROVISIONING
+    job = await provisioning.submit(agents.update(agent_id, changes))
+    response.headers["Location"] = f"/api/jobs/{job['id']}"
+    return AgentResponse(**agents.get(agent_id))
+
+@app.post("/api/agents/{agent_id}/provision", response_model=JobResponse, status_code=status.HTTP_202_ACCEPTED)
+async def provision_agent(agent_id: str):
+    """Send an agent's definition to Lyzr again, e.g. after its creation failed"""
+    agent = agents.get(agent_id)
+    if not agent:
+        raise HTTPException(status_code=404, detail="Agent not found")
+    if agent.get("status") == FAILED:
+        agent = agents.update(agent_id, {"status": PROVISIONING, "updated_at": datetime.now().isoformat()})
+    return JobResponse(**await provisioning.submit(agent))
+
+@app.get("/api/jobs", response_model=List[JobResponse])
+async def get_jobs(
+    agent_id: Optional[str] = None,
+    status: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    sort: str = "created_at",
+    fields: Optional[str] = None,
+):
+    """Get agent provisioning jobs, optionally filtered by agent_id and status"""
+    selected = parse_fields(fields, JOB_FIELDS) or JOB_FIELDS
+    return paginated_response(provisioning_jobs, limit, cursor, sort, selected, cache=job_pages,
+                              agent_id=agent_id, status=status)
+
+@app.get("/api/jobs/{job_id}", response_model=JobResponse)
+async def get_job(job_id: str):
+    """Get the status of an agent provisioning job"""
+    job = provisioning_jobs.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return FastJSONResponse(project(job, JOB_FIELDS))
 
 @app.delete("/api/agents/{agent_id}")
 async def delete_agent(agent_id: str):
     """Delete an agent"""
-    for i, agent in enumerate(agents):
-        if agent["id"] == agent_id:
-            # Delete from Lyzr
-            if agent["lyzr_agent_id"]:
-                await lyzr_service.delete_agent(agent["lyzr_agent_id"])
-            
-            # Remove from local storage
-            agents.pop(i)
-            return {"message": "Agent deleted successfully"}
-    raise HTTPException(status_code=404, detail="Agent not found")
+    config = agent_configs.get(agent_id)
+    if not config:
+        raise HTTPException(status_code=404, detail="Agent not found")
+
+    # Delete from Lyzr
+    if config.upstream_id != agent_id:
+        await lyzr_service.delete_agent(config.upstream_id)
+    else:
+        await lyzr_service.invalidate_agent(agent_id)
+    
+    # Remove from local storage
+    agents.delete(agent_id)
+    return {"message": "Agent deleted successfully"}
 
 # Chat Endpoints
-@app.post("/api/chat", response_model=ChatResponse)
-async def chat_with_agent(chat_data: ChatMessage):
-    """Send a message to an agent"""
-    try:
-        # Find the agent
-        agent = None
-        for a in agents:
-            if a["id"] == chat_data.agent_id:
-                agent = a
-                break
-        
-        if not agent:
-            raise HTTPException(status_code=404, detail="Agent not found")
-        
-        if not agent["is_active"]:
-            raise HTTPException(status_code=400, detail="Agent is not active")
-        
-        # Chat with Lyzr agent
-        lyzr_response = await lyzr_service.chat_with_agent(
-            agent["lyzr_agent_id"] or chat_data.agent_id,
-            chat_data.message
-        )
-        
-        # Log chat session
-        chat_session = {
-            "id": f"chat_{len(chat_sessions) + 1:04d}",
+# Sent instead of an answer when Lyzr is unavailable; the zero confidence opens a ticket
+FALLBACK_RESPONSE = {
+    "response": "Our assistant is unavailable right now. We've created a support ticket "
+                "and our team will get back to you soon.",
+    "confidence_score": 0.0,
+}
+
+def is_fallback(chat_session: Dict[str, Any]) -> bool:
+    return chat_session["response"] == FALLBACK_RESPONSE["response"]
+
+# Turns served by other workers; this worker's own are recorded in chat_records
+conversations.follow(chat_sessions, skip=is_fallback)
+
+async def chat_records(chat_data: ChatMessage, lyzr_response: Dict[str, Any]) -> List[tuple]:
+    """Build the chat-session log entry, plus a ticket if confidence is low.
+
+    The turn is added to the session's conversation context right away,
+    unless it is the fallback reply. Returns (store, record) pairs ready
+    for the write-behind queue.
+    """
+    chat_session = {
+        "id": await chat_sessions.allocate_id(),
+        "agent_id": chat_data.agent_id,
+        "user_session": chat_data.user_session,
+        "message": chat_data.message,
+        "response": lyzr_response["response"],
+        "confidence_score": lyzr_response.get("confidence_score", 0.0),
+        "response_time": lyzr_response.get("response_time"),
+        "created_at": datetime.now().isoformat(),
+    }
+    if not is_fallback(chat_session):
+        conversations.record(chat_session)
+    records = [(chat_sessions, chat_session)]
+    
+    # Create ticket if confidence is low
+    if lyzr_response.get("confidence_score", 1.0) < 0.7:
+        ticket = {
+            "id": await tickets.allocate_id(),
             "agent_id": chat_data.agent_id,
+            "question": chat_data.message,
             "user_session": chat_data.user_session,
-            "message": chat_data.message,
-            "response": lyzr_response["response"],
+            "status": "open",
             "confidence_score": lyzr_response.get("confidence_score", 0.0),
             "created_at": datetime.now().isoformat(),
+            "updated_at": datetime.now().isoformat(),
         }
-        chat_sessions.append(chat_session)
-        
-        # Create ticket if confidence is low
-        ticket_created = False
-        if lyzr_response.get("confidence_score", 1.0) < 0.7:
-            ticket = {
-                "id": f"ticket_{len(tickets) + 1:04d}",
-                "agent_id": chat_data.agent_id,
-                "question": chat_data.message,
-                "user_session": chat_data.user_session,
-                "status": "open",
-                "confidence_score": lyzr_response.get("confidence_score", 0.0),
-                "created_at": datetime.now().isoformat(),
-                "updated_at": datetime.now().isoformat(),
-            }
-            tickets.append(ticket)
-            ticket_created = True
+        records.append((tickets, ticket))
+    return records
+
+async def record_chat(chat_data: ChatMessage, lyzr_response: Dict[str, Any]) -> bool:
+    """Log a chat session and open a ticket if confidence is low.
+
+    The records are queued for the write-behind worker, so the caller can
+    respond without waiting for the stores (and whatever mirrors them).
+    Returns whether a ticket was created.
+    """
+    records = await chat_records(chat_data, lyzr_response)
+    await store_writes.put_many(records)
+    return len(records) > 1
+
+def get_active_agent(agent_id: str) -> AgentConfig:
+    """Find an agent that can take chats"""
+    config = agent_configs.get(agent_id)
+    if not config:
+        raise HTTPException(status_code=404, detail="Agent not found")
+    
+    if not config.is_active:
+        raise HTTPException(status_code=400, detail="Agent is not active")
+    if config.status == PROVISIONING:
+        raise HTTPException(status_code=409, detail="Agent is still being provisioned")
+    if config.status == FAILED:
+        raise HTTPException(status_code=409, detail="Agent provisioning failed")
+    return config
+
+def chat_limits(chat_data: ChatMessage, config: AgentConfig, session_scope: str) -> List[tuple]:
+    return [
+        (session_scope, chat_data.user_session),
+        ("agent", config.agent_id),
+        ("user", config.user_id),
+    ]
+
+def admit_chat(chat_data: ChatMessage) -> AgentConfig:
+    """Find the agent and charge the session, agent and owner rate limits, or raise 429"""
+    config = get_active_agent(chat_data.agent_id)
+    admission.admit(chat_limits(chat_data, config, "session"))
+    return config
+
+async def admit_batch_chat(chat_data: ChatMessage) -> AgentConfig:
+    """``admit_chat`` for a batch message: charged to the per-session batch limit
+    instead of the interactive one, and paced by waiting up to CHAT_BATCH_MAX_WAIT
+    seconds for tokens before raising 429"""
+    config = get_active_agent(chat_data.agent_id)
+    await admission.acquire(chat_limits(chat_data, config, "batch"), CHAT_BATCH_MAX_WAIT)
+    return config
+
+def record_response_time(agent_id: str, seconds: float) -> None:
+    agent_response_duration.observe(seconds, agent_id=agent_id)
+    shared_state.record_response_time(agent_id, seconds)
+
+def drop_agent_metrics(op: str, old: Optional[Dict[str, Any]], new: Optional[Dict[str, Any]]) -> None:
+    """Remove a deleted agent's response-time series, including agents deleted by other workers"""
+    if op == "delete":
+        agent_response_duration.remove(agent_id=old["id"])
+
+agents.subscribe(drop_agent_metrics)
+
+async def ask_agent(chat_data: ChatMessage, batch: bool = False) -> Dict[str, Any]:
+    """Get an agent's reply, falling back to a ticket if Lyzr is unavailable.
+
+    Questions close to an indexed FAQ answer are answered locally; others
+    go to Lyzr with the session's recent turns as context. The time
+    taken is recorded per agent, reported as response_time_avg and returned
+    as ``response_time`` for the chat-session log. Batch messages are
+    admitted with ``admit_batch_chat``.
+    """
+    config = await admit_batch_chat(chat_data) if batch else admit_chat(chat_data)
+    started = time.perf_counter()
+    try:
+        answer = faq_index.match(chat_data.agent_id, chat_data.message)
+        if answer is None:
+            context = conversations.context(chat_data.agent_id, chat_data.user_session)
+            answer = await lyzr_service.chat_with_agent(config.upstream_id, chat_data.message, context)
+    except LyzrUnavailableError:
+        answer = dict(FALLBACK_RESPONSE)
+    finally:
+        elapsed = time.perf_counter() - started
+        record_response_time(chat_data.agent_id, elapsed)
+    answer["response_time"] = elapsed
+    return answer
+
+def sse_event(event: str, data: Dict[str, Any]) -> str:
+    """Format one server-sent event"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@app.post("/api/chat", response_model=ChatResponse)
+async def chat_with_agent(chat_data: ChatMessage):
+    """Send a message to an agent"""
+    try:
+        lyzr_response = await ask_agent(chat_data)
+        ticket_created = await record_chat(chat_data, lyzr_response)
         
         return ChatResponse(
             response=lyzr_response["response"],
             confidence_score=lyzr_response.get("confidence_score", 0.0),
             ticket_created=ticket_created
         )
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/api/chat/stream")
+async def stream_chat_with_agent(chat_data: ChatMessage):
+    """Send a message to an agent and stream the reply as server-sent events.
+
+    Emits ``chunk`` events with ``{"delta": ...}`` as text arrives, then a
+    ``done`` event carrying the ChatResponse once the session is logged.
+    If Lyzr is unavailable the ``done`` event carries the fallback reply and
+    ticket; other upstream failures produce an ``error`` event.
+    """
+    config = admit_chat(chat_data)
+    started = time.perf_counter()
+
+    async def done_event(lyzr_response: Dict[str, Any]) -> str:
+        elapsed = time.perf_counter() - started
+        record_response_time(chat_data.agent_id, elapsed)
+        ticket_created = await record_chat(chat_data, {**lyzr_response, "response_time": elapsed})
+        result = ChatResponse(
+            response=lyzr_response["response"],
+            confidence_score=lyzr_response.get("confidence_score", 0.0),
+            ticket_created=ticket_created
+        )
+        return sse_event("done", result.model_dump())
+
+    async def event_stream():
+        answer = faq_index.match(chat_data.agent_id, chat_data.message)
+        if answer is not None:
+            yield sse_event("chunk", {"delta": answer["response"]})
+            yield await done_event(answer)
+            return
+        context = conversations.context(chat_data.agent_id, chat_data.user_session)
+        try:
+            async for event in lyzr_service.stream_chat_with_agent(config.upstream_id, chat_data.message, context):
+                if event.get("done"):
+                    yield await done_event(event)
+                else:
+                    yield sse_event("chunk", {"delta": event["delta"]})
+        except LyzrUnavailableError:
+            # The final response replaces any partial text already streamed
+            yield await done_event(FALLBACK_RESPONSE)
+        except HTTPException as e:
+            yield sse_event("error", {"status_code": e.status_code, "detail": e.detail})
+        except Exception as e:
+            yield sse_event("error", {"status_code": 500, "detail": str(e)})
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.post("/api/chat/batch")
+async def chat_batch(batch: ChatBatch):
+    """Send many messages to agents and stream the replies as NDJSON.
+
+    Messages are sent to Lyzr with bounded concurrency and one line is
+    written per message, in request order: ``{"index", "response",
+    "confidence_score", "ticket_created"}`` or ``{"index", "error"}`` when
+    that message failed. Session logs and tickets are queued in bulk.
+
+    Messages count against the per-session batch limit rather than the
+    interactive one, and wait for rate-limit tokens instead of failing at
+    once; a message that would wait longer than CHAT_BATCH_MAX_WAIT fails
+    with a 429 error carrying ``retry_after`` seconds.
+    """
+    concurrency = batch.concurrency or CHAT_BATCH_CONCURRENCY
+
+    async def results():
+        # Sliding window: at most `concurrency` calls in flight, drained in order
+        messages = iter(batch.messages)
+        window = [(chat_data, asyncio.create_task(ask_agent(chat_data, batch=True)))
+                  for chat_data in itertools.islice(messages, concurrency)]
+        index = 0
+        try:
+            while window:
+                chat_data, task = window.pop(0)
+                try:
+                    yield index, chat_data, await task, None
+                except RateLimitedError as e:
+                    yield index, chat_data, None, {
+                        "status_code": e.status_code, "detail": e.detail, "retry_after": math.ceil(e.retry_after),
+                    }
+                except HTTPException as e:
+                    yield index, chat_data, None, {"status_code": e.status_code, "detail": e.detail}
+                except Exception as e:
+                    yield index, chat_data, None, {"status_code": 500, "detail": str(e)}
+                index += 1
+                next_message = next(messages, None)
+                if next_message is not None:
+                    window.append((next_message, asyncio.create_task(ask_agent(next_message, batch=True))))
+        finally:
+            # Client went away: stop the calls that are still running
+            for _, task in window:
+                task.cancel()
+
+    async def lines():
+        pending = []
+        try:
+            async for index, chat_data, lyzr_response, error in results():
+                if error is not None:
+                    yield json.dumps({"index": index, "error": error}) + "\n"
+                    continue
+                records = await chat_records(chat_data, lyzr_response)
+                pending.extend(records)
+                if len(pending) >= CHAT_BATCH_LOG_SIZE:
+                    await store_writes.put_many(pending)
+                    pending = []
+                result = ChatResponse(
+                    response=lyzr_response["response"],
+                    confidence_score=lyzr_response.get("confidence_score", 0.0),
+                    ticket_created=len(records) > 1
+                )
+                yield json.dumps({"index": index, **result.model_dump()}) + "\n"
+        finally:
+            if pending:
+                await store_writes.put_many(pending)
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """Latency histograms, in-flight gauges and event-loop lag in the Prometheus text format"""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/api/cache/stats")
+async def get_cache_stats():
+    """Hit/miss counters for the Lyzr chat response cache"""
+    return lyzr_service.cache_stats()
+
+@app.get("/api/lyzr/stats")
+async def get_lyzr_stats():
+    """Cache and request-coalescing counters for Lyzr calls"""
+    return {
+        "cache": lyzr_service.cache_stats(),
+        "agent_configs": agent_configs.stats(),
+        "faq": faq_index.stats(),
+        "conversations": conversations.stats(),
+        "provisioning": provisioning.stats(),
+        "coalescing": lyzr_service.coalescing_stats(),
+        "pool": lyzr_service.pool_stats(),
+        "resilience": lyzr_service.resilience_stats(),
+    }
+
+@app.get("/api/rate_limits/stats")
+async def get_rate_limit_stats():
+    """Limits, tracked keys and allowed/rejected counts per rate-limit scope"""
+    return admission.stats()
+
+@app.get("/api/storage/stats")
+async def get_storage_stats():
+    """Write-behind queue, SQL persistence, journal, shared-state replication, rollup, search-index and response-cache sizes"""
+    return {
+        "database": persistence.stats(),
+        "journal": journal.stats(),
+        "write_behind": store_writes.stats(),
+        "shared_state": shared_state.stats(),
+        "rollups": rollups.stats(),
+        "search": search_index.stats(),
+        "response_cache": {
+            "agents": agent_pages.stats(),
+            "jobs": job_pages.stats(),
+            "tickets": ticket_pages.stats(),
+        },
+    }
+
 # Analytics Endpoints
 @app.get("/api/agents/{agent_id}/analytics", response_model=AnalyticsResponse)
 async def get_agent_analytics(agent_id: str):
     """Get analytics for a specific agent"""
     try:
         # Find the agent
-        agent = None
-        for a in agents:
-            if a["id"] == agent_id:
-                agent = a
-                break
-        
-        if not agent:
+        config = agent_configs.get(agent_id)
+        if not config:
             raise HTTPException(status_code=404, detail="Agent not found")
         
         # Get analytics from Lyzr
-        analytics = await lyzr_service.get_agent_analytics(
-            agent["lyzr_agent_id"] or agent_id
-        )
+        analytics = await lyzr_service.get_agent_analytics(config.upstream_id)
+        # Response time is measured here rather than trusted from upstream
+        if shared_state.enabled:
+            response_time_avg = await shared_state.response_time_avg(agent_id)
+        else:
+            response_time_avg = agent_response_duration.mean(agent_id=agent_id)
+        analytics["response_time_avg"] = round(response_time_avg or 0.0, 4)
         
         return AnalyticsResponse(**analytics)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+def local_time(value: datetime) -> datetime:
+    """Naive local time, the form timestamps are stored in"""
+    return value.astimezone().replace(tzinfo=None) if value.tzinfo else value
+
+@app.get("/api/analytics/timeseries")
+async def get_analytics_timeseries(
+    resolution: str = Query("hour", pattern="^(minute|hour|day)$"),
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    agent_id: Optional[str] = None,
+):
+    """Chats, confidence, tickets and response times per minute, hour or day.
+
+    Served from rollups kept up to date on every write, so the cost depends
+    on the number of buckets in the range, not on the history size. Returns
+    one point per bucket from ``start`` (default: the last 60 minutes, 24
+    hours or 30 days) to ``end`` (default: now), for one agent or all.
+    A ``start`` older than the resolution's retention is rejected with 400.
+    """
+    width = timedelta(seconds=RESOLUTIONS[resolution])
+    end = local_time(end) if end else datetime.now()
+    start = local_time(start) if start else end - width * TIMESERIES_DEFAULT_POINTS[resolution]
+    if start >= end:
+        raise HTTPException(status_code=400, detail="start must be before end")
+    oldest = rollups.oldest(resolution)
+    if oldest is not None and start < oldest:
+        raise HTTPException(
+            status_code=400,
+            detail=f"{resolution.capitalize()} buckets are kept for {rollups.retention[resolution] // 3600} hours; "
+                   f"use a later start or a coarser resolution",
+        )
+    if (end - start) / width > TIMESERIES_MAX_POINTS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Range covers more than {TIMESERIES_MAX_POINTS} {resolution} buckets; use a coarser resolution",
+        )
+    return rollups.series(resolution, start, end, agent_id)
+
 @app.get("/api/analytics/overview")
 async def get_overview_analytics():
     """Get overview analytics for all agents"""
     try:
-        total_agents = len(agents)
-        total_chats = len(chat_sessions)
-        total_tickets = len(tickets)
-        open_tickets = len([t for t in tickets if t["status"] == "open"])
-        
-        # Calculate average confidence
-        if chat_sessions:
-            avg_confidence = sum(cs.get("confidence_score", 0) for cs in chat_sessions) / len(chat_sessions)
-        else:
-            avg_confidence = 0.0
-        
-        return {
-            "total_agents": total_agents,
-            "total_chats": total_chats,
-            "total_tickets": total_tickets,
-            "open_tickets": open_tickets,
-            "average_confidence": round(avg_confidence, 2),
-            "active_agents": len([a for a in agents if a["is_active"]])
-        }
+        return FastJSONResponse(overview_stats.overview())
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/api/analytics/overview/consistency")
+async def check_overview_consistency():
+    """Compare the incremental overview counters against a full recompute"""
+    return overview_stats.check_consistency()
+
+# Live dashboard events
+@app.websocket("/api/events/ws")
+async def dashboard_events(
+    websocket: WebSocket,
+    topics: Optional[str] = None,
+    agent_id: Optional[List[str]] = Query(None),
+    user_id: Optional[str] = None,
+):
+    """Push ticket and agent changes and overview counter deltas to a dashboard.
+
+    ``topics`` is a comma-separated subset of ``tickets,agents,overview``
+    (default all). Ticket events (``ticket.insert``, ``ticket.update``,
+    ``ticket.delete``) and agent events (``agent.insert``, ...; an
+    ``agent.update`` reports each provisioning step) can be narrowed to
+    some ``agent_id`` values or to the agents of a ``user_id``. The
+    overview topic starts with the full counters (``overview``) followed
+    by ``overview.delta`` messages with the changed fields only. A
+    ``resync`` message means events were dropped and the client should
+    re-fetch.
+    """
+    selected = [topic for topic in (topics or ",".join(TOPICS)).split(",") if topic]
+    unknown = [topic for topic in selected if topic not in TOPICS]
+    if unknown or not selected:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION, reason=f"Unknown topics: {','.join(unknown)}")
+        return
+    await websocket.accept()
+    subscription = event_hub.subscribe(selected, agent_id, user_id)
+
+    async def send_events():
+        while True:
+            await websocket.send_text(await subscription.queue.get())
+
+    sender = asyncio.create_task(send_events())
+    try:
+        # Clients send nothing; receiving only tells us when they go away
+        while (await websocket.receive())["type"] != "websocket.disconnect":
+            pass
+    except WebSocketDisconnect:
+        pass
+    finally:
+        event_hub.unsubscribe(subscription)
+        sender.cancel()
+
+@app.get("/api/events/stats")
+async def get_event_stats():
+    """Open dashboard subscriptions and events pushed or dropped"""
+    return event_hub.stats()
+
 # Ticket Management Endpoints
 @app.post("/api/tickets")
 async def create_ticket(ticket_data: TicketCreate):
     """Create a new ticket"""
     try:
         ticket = {
-            "id": f"ticket_{len(tickets) + 1:04d}",
+            "id": await tickets.allocate_id(),
             "agent_id": ticket_data.agent_id,
             "question": ticket_data.question,
             "user_session": ticket_data.user_session,
@@ -323,43 +797,109 @@ async def create_ticket(ticket_data: TicketCreate):
             "created_at": datetime.now().isoformat(),
             "updated_at": datetime.now().isoformat(),
         }
-        tickets.append(ticket)
+        tickets.insert(ticket)
         return ticket
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/api/tickets")
-async def get_tickets(agent_id: Optional[str] = None, status: Optional[str] = None):
-    """Get all tickets, optionally filtered"""
-    filtered_tickets = tickets
-    
-    if agent_id:
-        filtered_tickets = [t for t in filtered_tickets if t["agent_id"] == agent_id]
-    
-    if status:
-        filtered_tickets = [t for t in filtered_tickets if t["status"] == status]
-    
-    return filtered_tickets
+async def get_tickets(
+    agent_id: Optional[str] = None,
+    status: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    sort: str = "created_at",
+    fields: Optional[str] = None,
+):
+    """Get tickets, optionally filtered, paginated and projected"""
+    selected = parse_fields(fields, TICKET_FIELDS)
+    return paginated_response(tickets, limit, cursor, sort, selected, cache=ticket_pages,
+                              agent_id=agent_id, status=status)
 
 @app.put("/api/tickets/{ticket_id}")
 async def update_ticket(ticket_id: str, status: str, manual_response: Optional[str] = None):
     """Update a ticket"""
-    for i, ticket in enumerate(tickets):
-        if ticket["id"] == ticket_id:
-            tickets[i].update({
-                "status": status,
-                "manual_response": manual_response,
-                "updated_at": datetime.now().isoformat(),
-            })
-            return tickets[i]
-    raise HTTPException(status_code=404, detail="Ticket not found")
+    ticket = tickets.update(ticket_id, {
+        "status": status,
+        "manual_response": manual_response,
+        "updated_at": datetime.now().isoformat(),
+    })
+    if not ticket:
+        raise HTTPException(status_code=404, detail="Ticket not found")
+    return ticket
+
+# Full-text search
+@app.get("/api/search")
+async def search(
+    q: str = Query(..., min_length=1),
+    type: Optional[List[str]] = Query(None),
+    limit: int = Query(SEARCH_DEFAULT_LIMIT, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+):
+    """Tickets and support requests containing every word of ``q``, best match first.
+
+    Tickets are matched on their question and manual response, support
+    requests on their subject and message; ``type`` narrows the search to
+    ``tickets`` or ``support_requests``. The total number of matches is sent
+    in the X-Total-Count header and the cursor for the next page, if any,
+    in X-Next-Cursor.
+    """
+    unknown = sorted(set(type or ()) - set(search_index.indexes))
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown types: {', '.join(unknown)}")
+    offset = decode_cursor(cursor) if cursor else 0
+    total, hits = search_index.search(q, type, limit, offset)
+    headers = {TOTAL_COUNT_HEADER: str(total)}
+    if offset + limit < total:
+        headers[NEXT_CURSOR_HEADER] = encode_cursor(offset + limit)
+    return FastJSONResponse(hits, headers=headers)
+
+# Bulk export
+@app.get("/api/export/tickets")
+async def export_tickets(
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    agent_id: Optional[str] = None,
+    status: Optional[str] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    compress: bool = False,
+):
+    """Stream every matching ticket as NDJSON or CSV, optionally gzipped.
+
+    ``start`` and ``end`` bound ``created_at`` (end exclusive). Rows are
+    read and written a chunk at a time, so memory use does not grow with
+    the export size.
+    """
+    return export_response(
+        tickets, "tickets", TICKET_FIELDS, format, compress,
+        start=local_time(start).isoformat() if start else None,
+        end=local_time(end).isoformat() if end else None,
+        agent_id=agent_id, status=status,
+    )
+
+@app.get("/api/export/chat_sessions")
+async def export_chat_sessions(
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    agent_id: Optional[str] = None,
+    user_session: Optional[str] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    compress: bool = False,
+):
+    """Stream chat transcripts (one row per message and reply) as NDJSON or CSV, optionally gzipped"""
+    return export_response(
+        chat_sessions, "chat_sessions", CHAT_SESSION_FIELDS, format, compress,
+        start=local_time(start).isoformat() if start else None,
+        end=local_time(end).isoformat() if end else None,
+        agent_id=agent_id, user_session=user_session,
+    )
 
 # Legacy Support Endpoints (for backward compatibility)
 @app.post("/api/support", response_model=SupportResponse)
 async def create_support_request(request: SupportRequest):
     """Create a new support request"""
     try:
-        request_id = f"SR-{len(support_requests) + 1:04d}"
+        request_id = await support_requests.allocate_id()
         support_request = {
             "id": request_id,
             "name": request.name,
@@ -369,7 +909,7 @@ async def create_support_request(request: SupportRequest):
             "priority": request.priority,
             "status": "pending"
         }
-        support_requests.append(support_request)
+        support_requests.insert(support_request)
         
         return SupportResponse(
             id=request_id,
@@ -382,20 +922,49 @@ async def create_support_request(request: SupportRequest):
 @app.get("/api/support", response_model=List[dict])
 async def get_support_requests():
     """Get all support requests"""
-    return support_requests
+    return support_requests.values()
 
 @app.get("/api/support/{request_id}")
 async def get_support_request(request_id: str):
     """Get a specific support request"""
-    for request in support_requests:
-        if request["id"] == request_id:
-            return request
-    raise HTTPException(status_code=404, detail="Support request not found")
+    request = support_requests.get(request_id)
+    if not request:
+        raise HTTPException(status_code=404, detail="Support request not found")
+    return request
 
 if __name__ == "__main__":
-    uvicorn.run(
-        "main:app",
-        host="0.0.0.0",
-        port=8000,
-        reload=True
-    ) 
\ No newline at end of file
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Run the Lyzr Support API")
+    parser.add_argument("--host", default=os.getenv("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "8000")))
+    parser.add_argument("--workers", type=int, default=int(os.getenv("WEB_CONCURRENCY", "1")),
+                        help="worker processes; more than one keeps shared state in Redis (REDIS_URL)")
+    parser.add_argument("--no-reload", action="store_true", help="disable auto-reload in single-worker mode")
+    parser.add_argument("--log-level", default="info")
+    parser.add_argument("--no-access-log", action="store_true")
+    args = parser.parse_args()
+
+    if args.workers > 1:
+        # Workers are separate processes; without a shared store each would
+        # see only the agents and tickets it created itself
+        os.environ.setdefault("SHARED_STATE", "redis")
+        if os.environ["SHARED_STATE"] != "redis":
+            parser.error("--workers > 1 requires SHARED_STATE=redis")
+        uvicorn.run(
+            "main:app",
+            host=args.host,
+            port=args.port,
+            workers=args.workers,
+            log_level=args.log_level,
+            access_log=not args.no_access_log,
+        )
+    else:
+        uvicorn.run(
+            "main:app",
+            host=args.host,
+            port=args.port,
+            reload=not args.no_reload,
+            log_level=args.log_level,
+            access_log=not args.no_access_log,
+        ) 
\ No newline at end of file
@@ -0,0 +1,84 @@
+"""Create support request, agent, ticket and chat session tables
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "support_requests",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("name", sa.String(255), nullable=False),
+        sa.Column("email", sa.String(255), nullable=False),
+        sa.Column("subject", sa.String(500), nullable=False),
+        sa.Column("message", sa.Text(), nullable=False),
+        sa.Column("priority", sa.Enum("low", "medium", "high", "urgent", name="priorityenum")),
+        sa.Column("status", sa.Enum("pending", "in_progress", "resolved", "closed", name="statusenum")),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.Column("updated_at", sa.DateTime(timezone=True)),
+    )
+    op.create_index("ix_support_requests_id", "support_requests", ["id"])
+
+    op.create_table(
+        "agents",
+        sa.Column("id", sa.String(64), primary_key=True),
+        sa.Column("name", sa.String(255), nullable=False),
+        sa.Column("description", sa.Text(), nullable=False),
+        sa.Column("tone", sa.String(255), nullable=False),
+        sa.Column("personality", sa.String(255), nullable=False),
+        sa.Column("knowledge_base", sa.JSON(), nullable=False),
+        sa.Column("lyzr_agent_id", sa.String(255)),
+        sa.Column("user_id", sa.String(255), nullable=False),
+        sa.Column("is_active", sa.Boolean(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(), nullable=False),
+    )
+    op.create_index("ix_agents_user_id", "agents", ["user_id"])
+
+    op.create_table(
+        "tickets",
+        sa.Column("id", sa.String(64), primary_key=True),
+        sa.Column("agent_id", sa.String(64), nullable=False),
+        sa.Column("question", sa.Text(), nullable=False),
+        sa.Column("user_session", sa.String(255), nullable=False),
+        sa.Column("status", sa.String(32), nullable=False),
+        sa.Column("confidence_score", sa.Float()),
+        sa.Column("manual_response", sa.Text()),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(), nullable=False),
+    )
+    op.create_index("ix_tickets_user_session", "tickets", ["user_session"])
+    op.create_index("ix_tickets_agent_id_status_created_at", "tickets", ["agent_id", "status", "created_at"])
+    op.create_index("ix_tickets_status_created_at", "tickets", ["status", "created_at"])
+
+    op.create_table(
+        "chat_sessions",
+        sa.Column("id", sa.String(64), primary_key=True),
+        sa.Column("agent_id", sa.String(64), nullable=False),
+        sa.Column("user_session", sa.String(255), nullable=False),
+        sa.Column("message", sa.Text(), nullable=False),
+        sa.Column("response", sa.Text(), nullable=False),
+        sa.Column("confidence_score", sa.Float()),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+    )
+    op.create_index("ix_chat_sessions_agent_id_created_at", "chat_sessions", ["agent_id", "created_at"])
+    op.create_index("ix_chat_sessions_user_session_created_at", "chat_sessions", ["user_session", "created_at"])
+
+
+def downgrade() -> None:
+    op.drop_table("chat_sessions")
+    op.drop_table("tickets")
+    op.drop_table("agents")
+    op.drop_table("support_requests")
+    sa.Enum(name="statusenum").drop(op.get_bind(), checkfirst=True)
+    sa.Enum(name="priorityenum").drop(op.get_bind(), checkfirst=True)
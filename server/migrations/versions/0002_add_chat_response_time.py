@@ -0,0 +1,22 @@
+"""Add response time to chat sessions
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("chat_sessions", sa.Column("response_time", sa.Float()))
+
+
+def downgrade() -> None:
+    op.drop_column("chat_sessions", "response_time")
@@ -0,0 +1,22 @@
+"""Add provisioning status to agents
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("agents", sa.Column("status", sa.String(32), nullable=False, server_default="ready"))
+
+
+def downgrade() -> None:
+    op.drop_column("agents", "status")
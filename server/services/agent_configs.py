@@ -0,0 +1,91 @@
+from typing import Any, Dict, Mapping, Optional
+
+from services.store import IndexedStore, agents
+
+# Agent fields that make up the definition sent to Lyzr on create and update
+DEFINITION_FIELDS = ("name", "description", "tone", "personality", "knowledge_base")
+
+
+def agent_definition(source: Mapping[str, Any]) -> Dict[str, Any]:
+    """The Lyzr definition payload of an agent record or AgentCreate dump"""
+    return {field: source[field] for field in DEFINITION_FIELDS}
+
+
+class AgentConfig:
+    """Immutable snapshot of an agent with what the chat path needs resolved.
+
+    ``upstream_id`` is the Lyzr agent id, or the local id for agents that
+    were created without one, so serving a chat needs no lookups beyond
+    fetching the config. The Lyzr definition is not kept here: provisioning
+    reads it from the agent record when the job runs, so it sends the
+    latest one.
+    """
+
+    __slots__ = ("agent_id", "upstream_id", "user_id", "is_active", "status")
+
+    def __init__(self, agent_id: str, upstream_id: str, user_id: Optional[str], is_active: bool, status: str):
+        set_field = super().__setattr__
+        set_field("agent_id", agent_id)
+        set_field("upstream_id", upstream_id)
+        set_field("user_id", user_id)
+        set_field("is_active", is_active)
+        set_field("status", status)
+
+    @classmethod
+    def from_record(cls, record: Dict[str, Any]) -> "AgentConfig":
+        return cls(
+            agent_id=record["id"],
+            upstream_id=record.get("lyzr_agent_id") or record["id"],
+            user_id=record.get("user_id"),
+            is_active=bool(record.get("is_active")),
+            # Agents created before provisioning jobs have no status
+            status=record.get("status") or "ready",
+        )
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        raise AttributeError("AgentConfig is immutable")
+
+    def __delattr__(self, name: str) -> None:
+        raise AttributeError("AgentConfig is immutable")
+
+    def __repr__(self) -> str:
+        return (f"AgentConfig(agent_id={self.agent_id!r}, upstream_id={self.upstream_id!r}, "
+                f"is_active={self.is_active!r}, status={self.status!r})")
+
+
+class AgentConfigCache:
+    """AgentConfig per agent id, kept in step with the agent store.
+
+    Configs are rebuilt only when an agent is inserted, updated or deleted
+    (locally or replayed from another worker), never on the read path.
+    """
+
+    def __init__(self, store: IndexedStore):
+        self._configs: Dict[str, AgentConfig] = {}
+        self.builds = 0
+        for record in store.values():
+            self._build(record)
+        store.subscribe(self._on_agent)
+
+    def __len__(self) -> int:
+        return len(self._configs)
+
+    def get(self, agent_id: str) -> Optional[AgentConfig]:
+        return self._configs.get(agent_id)
+
+    def _build(self, record: Dict[str, Any]) -> None:
+        self._configs[record["id"]] = AgentConfig.from_record(record)
+        self.builds += 1
+
+    def _on_agent(self, op: str, old: Optional[Dict[str, Any]], new: Optional[Dict[str, Any]]) -> None:
+        if op == "delete":
+            self._configs.pop(old["id"], None)
+        else:
+            self._build(new)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"size": len(self._configs), "builds": self.builds}
+
+
+# Global instance shared by all endpoints
+agent_configs = AgentConfigCache(agents)
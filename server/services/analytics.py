@@ -0,0 +1,117 @@
+from typing import Dict, Any, Optional
+
+from services.store import IndexedStore, agents, tickets, chat_sessions
+
+
+def _confidence(record: Optional[Dict[str, Any]]) -> float:
+    return (record or {}).get("confidence_score") or 0.0
+
+
+class OverviewStats:
+    """Running counters behind /api/analytics/overview.
+
+    The counters subscribe to the agent, ticket and chat-session stores and
+    are adjusted on every write, so reading the overview is O(1) no matter
+    how many records exist.
+    """
+
+    def __init__(self, agents: IndexedStore, tickets: IndexedStore, chat_sessions: IndexedStore):
+        self.agents = agents
+        self.tickets = tickets
+        self.chat_sessions = chat_sessions
+        self.reset()
+        agents.subscribe(self._on_agent)
+        tickets.subscribe(self._on_ticket)
+        chat_sessions.subscribe(self._on_chat_session)
+
+    def reset(self) -> None:
+        """Rebuild the counters from the stores with a full scan"""
+        counts = self._scan()
+        self.total_agents = counts["total_agents"]
+        self.active_agents = counts["active_agents"]
+        self.total_chats = counts["total_chats"]
+        self.confidence_sum = counts["confidence_sum"]
+        self.total_tickets = counts["total_tickets"]
+        self.open_tickets = counts["open_tickets"]
+
+    def _on_agent(self, op: str, old: Optional[Dict[str, Any]], new: Optional[Dict[str, Any]]) -> None:
+        if op == "insert":
+            self.total_agents += 1
+        elif op == "delete":
+            self.total_agents -= 1
+        self.active_agents += bool(new and new.get("is_active")) - bool(old and old.get("is_active"))
+
+    def _on_ticket(self, op: str, old: Optional[Dict[str, Any]], new: Optional[Dict[str, Any]]) -> None:
+        if op == "insert":
+            self.total_tickets += 1
+        elif op == "delete":
+            self.total_tickets -= 1
+        self.open_tickets += bool(new and new.get("status") == "open") - bool(old and old.get("status") == "open")
+
+    def _on_chat_session(self, op: str, old: Optional[Dict[str, Any]], new: Optional[Dict[str, Any]]) -> None:
+        if op == "insert":
+            self.total_chats += 1
+        elif op == "delete":
+            self.total_chats -= 1
+        self.confidence_sum += _confidence(new) - _confidence(old)
+
+    def overview(self) -> Dict[str, Any]:
+        """Overview payload built from the counters"""
+        return self._format(
+            total_agents=self.total_agents,
+            active_agents=self.active_agents,
+            total_chats=self.total_chats,
+            confidence_sum=self.confidence_sum,
+            total_tickets=self.total_tickets,
+            open_tickets=self.open_tickets,
+        )
+
+    def recompute(self) -> Dict[str, Any]:
+        """Overview payload built from a full scan of the stores"""
+        return self._format(**self._scan())
+
+    def check_consistency(self) -> Dict[str, Any]:
+        """Compare the running counters against a full recompute"""
+        counters = self.overview()
+        recomputed = self.recompute()
+        mismatches = {
+            key: {"counter": counters[key], "recomputed": recomputed[key]}
+            for key in counters
+            if counters[key] != recomputed[key]
+        }
+        return {
+            "consistent": not mismatches,
+            "mismatches": mismatches,
+            "counters": counters,
+            "recomputed": recomputed,
+        }
+
+    def _scan(self) -> Dict[str, Any]:
+        agent_list = self.agents.values()
+        chat_list = self.chat_sessions.values()
+        ticket_list = self.tickets.values()
+        return {
+            "total_agents": len(agent_list),
+            "active_agents": len([a for a in agent_list if a.get("is_active")]),
+            "total_chats": len(chat_list),
+            "confidence_sum": sum(_confidence(cs) for cs in chat_list),
+            "total_tickets": len(ticket_list),
+            "open_tickets": len([t for t in ticket_list if t.get("status") == "open"]),
+        }
+
+    @staticmethod
+    def _format(total_agents: int, active_agents: int, total_chats: int, confidence_sum: float,
+                total_tickets: int, open_tickets: int) -> Dict[str, Any]:
+        avg_confidence = confidence_sum / total_chats if total_chats else 0.0
+        return {
+            "total_agents": total_agents,
+            "total_chats": total_chats,
+            "total_tickets": total_tickets,
+            "open_tickets": open_tickets,
+            "average_confidence": round(avg_confidence, 2),
+            "active_agents": active_agents,
+        }
+
+
+# Global instance
+overview_stats = OverviewStats(agents, tickets, chat_sessions)
@@ -0,0 +1,153 @@
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Set
+
+
+class TTLCache:
+    """Size-bounded LRU cache whose entries expire after ``ttl`` seconds.
+
+    Entries can carry a tag (e.g. an agent id) so that every entry for that
+    tag can be dropped at once when the underlying data changes.
+    """
+
+    def __init__(self, maxsize: int, ttl: float, clock: Callable[[], float] = time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._clock = clock
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._tags: Dict[Hashable, Set[Hashable]] = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Return the cached value, or None on a miss or expired entry"""
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        value, expires_at, _ = entry
+        if expires_at <= self._clock():
+            self._remove(key)
+            self.expirations += 1
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any, tag: Optional[Hashable] = None) -> None:
+        """Store a value, evicting the least recently used entry when full"""
+        if self.maxsize <= 0:
+            return
+        if key in self._data:
+            self._remove(key)
+        self._data[key] = (value, self._clock() + self.ttl, tag)
+        if tag is not None:
+            self._tags.setdefault(tag, set()).add(key)
+        while len(self._data) > self.maxsize:
+            oldest = next(iter(self._data))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def invalidate_tag(self, tag: Hashable) -> int:
+        """Drop every entry stored under a tag and return how many were dropped"""
+        keys = self._tags.pop(tag, set())
+        for key in keys:
+            self._data.pop(key, None)
+        self.invalidations += len(keys)
+        return len(keys)
+
+    def clear(self) -> None:
+        self._data.clear()
+        self._tags.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+        }
+
+    def _remove(self, key: Hashable) -> None:
+        _, _, tag = self._data.pop(key)
+        if tag is not None:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+
+class RedisCache:
+    """TTL cache shared by every worker, kept in Redis.
+
+    Same role as TTLCache, but async. Keys are hashed into
+    ``{prefix}:{sha1}``; each tag is a Redis set of the keys stored under it
+    so ``invalidate_tag`` drops them for all workers at once. Redis
+    enforces the TTL and, via maxmemory, the size bound.
+    """
+
+    def __init__(self, client, prefix: str, ttl: float):
+        self.client = client
+        self.prefix = prefix
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def _key(self, key: Hashable) -> str:
+        digest = hashlib.sha1(json.dumps(key, default=str).encode()).hexdigest()
+        return f"{self.prefix}:{digest}"
+
+    def _tag_key(self, tag: Hashable) -> str:
+        return f"{self.prefix}:tag:{tag}"
+
+    async def get(self, key: Hashable) -> Optional[Any]:
+        raw = await self.client.get(self._key(key))
+        if raw is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return json.loads(raw)
+
+    async def set(self, key: Hashable, value: Any, tag: Optional[Hashable] = None) -> None:
+        ttl_ms = int(self.ttl * 1000)
+        async with self.client.pipeline(transaction=False) as pipe:
+            pipe.set(self._key(key), json.dumps(value), px=ttl_ms)
+            if tag is not None:
+                pipe.sadd(self._tag_key(tag), self._key(key))
+                pipe.pexpire(self._tag_key(tag), ttl_ms)
+            await pipe.execute()
+
+    async def invalidate_tag(self, tag: Hashable) -> int:
+        tag_key = self._tag_key(tag)
+        keys = await self.client.smembers(tag_key)
+        await self.client.delete(tag_key, *keys)
+        self.invalidations += len(keys)
+        return len(keys)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "backend": "redis",
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "invalidations": self.invalidations,
+        }
@@ -0,0 +1,201 @@
+import os
+import sys
+import time
+from collections import OrderedDict, deque
+from datetime import datetime, timedelta
+from typing import Any, Callable, Deque, Dict, Optional, Tuple
+
+from services.metrics import metrics
+from services.store import IndexedStore
+
+# Rough English average; only used to keep the context within a token budget
+CHARS_PER_TOKEN = 4
+# Accounted size of one turn and one session beyond the text they hold: the
+# turn tuple and its deque slot; the deque, the Conversation, its key and LRU
+# entry (checked against tracemalloc by benchmarks/bench_conversations.py)
+TURN_OVERHEAD = sys.getsizeof(("", "", 0)) + 8
+SESSION_OVERHEAD = sys.getsizeof(deque()) + 300
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+class Conversation:
+    """Ring buffer of one session's recent (message, response, tokens) turns"""
+
+    __slots__ = ("turns", "tokens", "nbytes", "last_used")
+
+    def __init__(self, max_turns: int, now: float):
+        self.turns: Deque[Tuple[str, str, int]] = deque(maxlen=max_turns)
+        self.tokens = 0
+        self.nbytes = SESSION_OVERHEAD
+        self.last_used = now
+
+    def append(self, message: str, response: str, max_tokens: int) -> int:
+        """Add a turn, dropping the oldest ones beyond the ring or token budget; returns the byte change"""
+        before = self.nbytes
+        if len(self.turns) == self.turns.maxlen:
+            self._drop_oldest()
+        turn = (message, response, estimate_tokens(message) + estimate_tokens(response))
+        self.turns.append(turn)
+        self.tokens += turn[2]
+        self.nbytes += _turn_bytes(turn)
+        # Always keep the latest turn, even if it alone is over budget
+        while self.tokens > max_tokens and len(self.turns) > 1:
+            self._drop_oldest()
+        return self.nbytes - before
+
+    def _drop_oldest(self) -> None:
+        turn = self.turns.popleft()
+        self.tokens -= turn[2]
+        self.nbytes -= _turn_bytes(turn)
+
+    def context(self) -> Dict[str, Any]:
+        history = []
+        for message, response, _ in self.turns:
+            history.append({"role": "user", "content": message})
+            history.append({"role": "assistant", "content": response})
+        return {"history": history}
+
+
+def _turn_bytes(turn: Tuple[str, str, int]) -> int:
+    return sys.getsizeof(turn[0]) + sys.getsizeof(turn[1]) + TURN_OVERHEAD
+
+
+class ConversationStore:
+    """Recent turns per (agent, user session), passed to Lyzr as chat context.
+
+    Each session keeps at most ``max_turns`` turns and ``max_tokens``
+    estimated tokens, oldest dropped first. Sessions are kept in
+    least-recently-used order: those idle for ``ttl`` seconds are evicted
+    from the old end as the store is used, and the least recently used are
+    evicted whenever the accounted size exceeds ``max_bytes``. Memory is
+    therefore bounded by ``max_bytes`` however many sessions are active, and
+    ``stats`` reports the size per thousand sessions.
+
+    Each worker records the turns it handles (``record``) and, through
+    ``follow``, the chat sessions other workers share through Redis, so a
+    session's context is complete whichever worker serves its next message.
+    """
+
+    def __init__(self, max_turns: int = 10, max_tokens: int = 1000, ttl: float = 1800,
+                 max_bytes: int = 64 << 20, clock: Callable[[], float] = time.monotonic):
+        self.max_turns = max_turns
+        self.max_tokens = max_tokens
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._clock = clock
+        self._sessions: "OrderedDict[Tuple[str, str], Conversation]" = OrderedDict()
+        self._skip: Optional[Callable[[Dict[str, Any]], bool]] = None
+        self.nbytes = 0
+        self.expired = 0
+        self.evicted = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_turns > 0
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def context(self, agent_id: str, user_session: str) -> Optional[Dict[str, Any]]:
+        """The session's recent turns as ``{"history": [...]}``, or None if it has none"""
+        if not self.enabled:
+            return None
+        now = self._clock()
+        self._expire(now)
+        key = (agent_id, user_session)
+        conversation = self._sessions.get(key)
+        if conversation is None or not conversation.turns:
+            return None
+        conversation.last_used = now
+        self._sessions.move_to_end(key)
+        return conversation.context()
+
+    def append(self, agent_id: str, user_session: str, message: str, response: str) -> None:
+        """Record a turn of the session"""
+        if not self.enabled:
+            return
+        now = self._clock()
+        self._expire(now)
+        key = (agent_id, user_session)
+        conversation = self._sessions.get(key)
+        if conversation is None:
+            conversation = self._sessions[key] = Conversation(self.max_turns, now)
+            self.nbytes += conversation.nbytes
+        else:
+            self._sessions.move_to_end(key)
+        conversation.last_used = now
+        self.nbytes += conversation.append(message, response, self.max_tokens)
+        while self.nbytes > self.max_bytes and len(self._sessions) > 1:
+            self._pop_oldest()
+            self.evicted += 1
+
+    def record(self, chat_session: Dict[str, Any]) -> None:
+        """Record a chat-session log entry as a turn of its session"""
+        self.append(chat_session["agent_id"], chat_session["user_session"],
+                    chat_session["message"], chat_session["response"])
+
+    def follow(self, store: IndexedStore, skip: Optional[Callable[[Dict[str, Any]], bool]] = None) -> None:
+        """Record the chat sessions other workers insert into ``store``, except those ``skip`` accepts.
+
+        This worker's own turns are not taken from ``store``: it records
+        them with ``record`` as they are answered, ahead of the queued write.
+        """
+        self._skip = skip
+        store.subscribe(self._on_chat_session, include_remote=True, include_local=False)
+
+    def _on_chat_session(self, op: str, old: Optional[Dict[str, Any]], new: Optional[Dict[str, Any]]) -> None:
+        if op != "insert" or not self.enabled or (self._skip is not None and self._skip(new)):
+            return
+        # Sessions loaded from shared state at startup are mostly long idle: skip expired turns
+        created_at = new.get("created_at")
+        if created_at and datetime.fromisoformat(created_at) < datetime.now() - timedelta(seconds=self.ttl):
+            return
+        self.record(new)
+
+    def clear(self, agent_id: str, user_session: str) -> None:
+        conversation = self._sessions.pop((agent_id, user_session), None)
+        if conversation is not None:
+            self.nbytes -= conversation.nbytes
+
+    def _expire(self, now: float) -> None:
+        cutoff = now - self.ttl
+        while self._sessions:
+            oldest = next(iter(self._sessions.values()))
+            if oldest.last_used >= cutoff:
+                break
+            self._pop_oldest()
+            self.expired += 1
+
+    def _pop_oldest(self) -> None:
+        _, conversation = self._sessions.popitem(last=False)
+        self.nbytes -= conversation.nbytes
+
+    def stats(self) -> Dict[str, Any]:
+        self._expire(self._clock())
+        sessions = len(self._sessions)
+        return {
+            "enabled": self.enabled,
+            "sessions": sessions,
+            "turns": sum(len(conversation.turns) for conversation in self._sessions.values()),
+            "bytes": self.nbytes,
+            "max_bytes": self.max_bytes,
+            "bytes_per_1k_sessions": round(self.nbytes * 1000 / sessions) if sessions else 0,
+            "expired": self.expired,
+            "evicted": self.evicted,
+        }
+
+
+# Global instance shared by all endpoints
+conversations = ConversationStore(
+    max_turns=int(os.getenv("CONVERSATION_MAX_TURNS", "10")),
+    max_tokens=int(os.getenv("CONVERSATION_MAX_TOKENS", "1000")),
+    ttl=float(os.getenv("CONVERSATION_TTL", "1800")),
+    max_bytes=int(float(os.getenv("CONVERSATION_MAX_MB", "64")) * (1 << 20)),
+)
+metrics.gauge("conversation_sessions", "Sessions with conversation context held in memory",
+              function=lambda: len(conversations))
+metrics.gauge("conversation_bytes", "Accounted size of the conversation context store",
+              function=lambda: conversations.nbytes)
@@ -0,0 +1,208 @@
+import asyncio
+import json
+import logging
+import os
+from typing import Any, Dict, Iterable, Optional, Set
+
+from services.agent_configs import AgentConfigCache, agent_configs
+from services.analytics import OverviewStats, overview_stats
+from services.metrics import metrics
+from services.store import IndexedStore, agents, tickets
+
+logger = logging.getLogger(__name__)
+
+TOPICS = ("tickets", "agents", "overview")
+# Topics of per-record events, filtered by agent and user
+RECORD_TOPICS = frozenset(("tickets", "agents"))
+# Replaces the backlog of a subscriber that fell behind
+RESYNC = json.dumps({"type": "resync"})
+
+
+class Subscription:
+    """One dashboard connection: its filters and a bounded queue of encoded events.
+
+    A subscriber that falls ``maxsize`` events behind has its backlog
+    replaced by a single ``resync`` event telling it to re-fetch, so a slow
+    client can never hold an unbounded amount of memory.
+    """
+
+    def __init__(self, topics: Iterable[str], agent_ids: Optional[Iterable[str]] = None,
+                 user_id: Optional[str] = None, maxsize: int = 1000):
+        self.topics = frozenset(topics)
+        self.agent_ids = frozenset(agent_ids or ())
+        self.user_id = user_id
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+        self.dropped = 0
+
+    @property
+    def filtered(self) -> bool:
+        return bool(self.agent_ids or self.user_id)
+
+    def push(self, message: str) -> None:
+        if self.queue.full():
+            self.dropped += self.queue.qsize()
+            events_dropped.inc(self.queue.qsize())
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(RESYNC)
+            return
+        self.queue.put_nowait(message)
+
+
+class EventHub:
+    """Pushes ticket and agent changes and overview counter deltas to subscribed dashboards.
+
+    Ticket and agent events come from listeners on their stores, so creates
+    and updates from chats, ``create_ticket``, ``update_ticket`` and agent
+    provisioning are all seen, as are writes replayed from other workers.
+    Each event is encoded once and queued for the subscribers of its topic
+    whose agent or user filter matches;
+    subscribers are indexed by agent and user id, so dispatch cost grows
+    with the number of interested connections rather than all of them.
+
+    Overview counters change on every chat, so they are not pushed per
+    write: every ``overview_interval`` seconds the hub compares the
+    overview with the last one sent and pushes only the fields that
+    changed.
+    """
+
+    def __init__(self, tickets: IndexedStore, agents: IndexedStore, overview: OverviewStats,
+                 configs: AgentConfigCache, overview_interval: float = 1.0, queue_size: int = 1000):
+        self.overview = overview
+        self.configs = configs
+        self.overview_interval = overview_interval
+        self.queue_size = queue_size
+        self._all: Set[Subscription] = set()
+        # Record-topic subscribers without an agent or user filter
+        self._unfiltered: Set[Subscription] = set()
+        self._by_agent: Dict[str, Set[Subscription]] = {}
+        self._by_user: Dict[str, Set[Subscription]] = {}
+        self._overview_subscribers: Set[Subscription] = set()
+        self._last_overview: Optional[Dict[str, Any]] = None
+        self._task: Optional[asyncio.Task] = None
+        self.published = 0
+        tickets.subscribe(self._on_ticket)
+        agents.subscribe(self._on_agent)
+
+    def __len__(self) -> int:
+        return len(self._all)
+
+    async def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run_overview())
+
+    def subscribe(self, topics: Iterable[str] = TOPICS, agent_ids: Optional[Iterable[str]] = None,
+                  user_id: Optional[str] = None) -> Subscription:
+        subscription = Subscription(topics, agent_ids, user_id, self.queue_size)
+        self._all.add(subscription)
+        if subscription.topics & RECORD_TOPICS:
+            if not subscription.filtered:
+                self._unfiltered.add(subscription)
+            for agent_id in subscription.agent_ids:
+                self._by_agent.setdefault(agent_id, set()).add(subscription)
+            if subscription.user_id:
+                self._by_user.setdefault(subscription.user_id, set()).add(subscription)
+        if "overview" in subscription.topics:
+            self._overview_subscribers.add(subscription)
+            # Start from the full counters; later messages carry only changes
+            overview = self.overview.overview()
+            if self._last_overview is None:
+                self._last_overview = overview
+            subscription.push(json.dumps({"type": "overview", "overview": overview}))
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        self._all.discard(subscription)
+        self._unfiltered.discard(subscription)
+        self._overview_subscribers.discard(subscription)
+        for agent_id in subscription.agent_ids:
+            _discard(self._by_agent, agent_id, subscription)
+        if subscription.user_id:
+            _discard(self._by_user, subscription.user_id, subscription)
+
+    def _on_ticket(self, op: str, old: Optional[Dict[str, Any]], new: Optional[Dict[str, Any]]) -> None:
+        if not self._all:
+            return
+        ticket = new or old
+        agent_id = ticket.get("agent_id")
+        config = self.configs.get(agent_id)
+        self._publish("tickets", "ticket", op, ticket, agent_id, config.user_id if config is not None else None)
+
+    def _on_agent(self, op: str, old: Optional[Dict[str, Any]], new: Optional[Dict[str, Any]]) -> None:
+        if not self._all:
+            return
+        agent = new or old
+        self._publish("agents", "agent", op, agent, agent["id"], agent.get("user_id"))
+
+    def _publish(self, topic: str, kind: str, op: str, record: Dict[str, Any],
+                 agent_id: Optional[str], user_id: Optional[str]) -> None:
+        targets = set(self._unfiltered)
+        targets.update(self._by_agent.get(agent_id, ()))
+        if user_id:
+            targets.update(self._by_user.get(user_id, ()))
+        targets = [subscription for subscription in targets if topic in subscription.topics]
+        if not targets:
+            return
+        message = json.dumps({"type": f"{kind}.{op}", kind: record})
+        for subscription in targets:
+            subscription.push(message)
+        self.published += 1
+
+    async def _run_overview(self) -> None:
+        while True:
+            await asyncio.sleep(self.overview_interval)
+            try:
+                self.push_overview()
+            except Exception:
+                logger.exception("Failed to push overview changes")
+
+    def push_overview(self) -> None:
+        """Send the overview fields that changed since the last push"""
+        if not self._overview_subscribers:
+            self._last_overview = None
+            return
+        current = self.overview.overview()
+        previous, self._last_overview = self._last_overview, current
+        changes = {key: value for key, value in current.items() if previous.get(key) != value}
+        if not changes:
+            return
+        message = json.dumps({"type": "overview.delta", "changes": changes})
+        for subscription in self._overview_subscribers:
+            subscription.push(message)
+
+    async def close(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "subscribers": len(self._all),
+            "overview_subscribers": len(self._overview_subscribers),
+            "record_events": self.published,
+            "dropped": sum(subscription.dropped for subscription in self._all),
+        }
+
+
+def _discard(index: Dict[str, Set[Subscription]], key: str, subscription: Subscription) -> None:
+    subscriptions = index.get(key)
+    if subscriptions is not None:
+        subscriptions.discard(subscription)
+        if not subscriptions:
+            del index[key]
+
+
+events_dropped = metrics.counter("events_dropped_total", "Dashboard events dropped for subscribers that fell behind")
+
+# Global instance shared by all endpoints
+event_hub = EventHub(
+    tickets, agents, overview_stats, agent_configs,
+    overview_interval=float(os.getenv("EVENTS_OVERVIEW_INTERVAL", "1")),
+    queue_size=int(os.getenv("EVENTS_QUEUE_SIZE", "1000")),
+)
+metrics.gauge("event_subscribers", "Open dashboard event subscriptions", function=lambda: len(event_hub))
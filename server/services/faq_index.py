@@ -0,0 +1,292 @@
+import math
+import os
+import re
+import zlib
+from array import array
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+from services.metrics import metrics
+from services.store import IndexedStore, agents, tickets
+
+# Width of the hashed feature space: collisions among the few dozen features of a
+# short text stay rare
+DIMENSIONS = 1 << 12
+# Character trigrams tolerate typos and word-form changes but count less than words
+CHAR_WEIGHT = 0.3
+
+_TOKEN = re.compile(r"[a-z0-9]+(?:'[a-z]+)?")
+# A knowledge-base item written as a question and its answer, markers optional
+_QA = re.compile(r"\s*(?:q(?:uestion)?\s*[:.]\s*)?(?P<question>[^?]+\?)\s*(?:a(?:nswer)?\s*[:.]\s*)?(?P<answer>.+)",
+                 re.IGNORECASE | re.DOTALL)
+
+
+def _features(text: str) -> Dict[str, int]:
+    """Counts of words, word bigrams and (``#``-prefixed) character trigrams"""
+    tokens = _TOKEN.findall(text.lower())
+    features: Dict[str, int] = {}
+    for position, token in enumerate(tokens):
+        features[token] = features.get(token, 0) + 1
+        if position:
+            bigram = f"{tokens[position - 1]} {token}"
+            features[bigram] = features.get(bigram, 0) + 1
+        padded = f"<{token}>"
+        for start in range(len(padded) - 2):
+            trigram = "#" + padded[start:start + 3]
+            features[trigram] = features.get(trigram, 0) + 1
+    return features
+
+
+def vectorize(text: str) -> Tuple[np.ndarray, np.ndarray]:
+    """Hashed n-gram vector of a text as (indices, values), L2-normalised.
+
+    Words, word bigrams and character trigrams are hashed with CRC32 (stable
+    across processes), signed by one hash bit to cancel collisions out, and
+    weighted by 1 + log(tf).
+    """
+    weights: Dict[int, float] = {}
+    for feature, count in _features(text).items():
+        digest = zlib.crc32(feature.encode())
+        index = digest % DIMENSIONS
+        sign = 1.0 if digest & 0x80000000 else -1.0
+        weight = (1.0 + math.log(count)) * (CHAR_WEIGHT if feature[0] == "#" else 1.0)
+        weights[index] = weights.get(index, 0.0) + sign * weight
+    if not weights:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+    indices = np.fromiter(weights.keys(), dtype=np.int64, count=len(weights))
+    values = np.fromiter(weights.values(), dtype=np.float32, count=len(weights))
+    norm = float(np.linalg.norm(values))
+    if norm == 0.0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+    return indices, values / norm
+
+
+def _ticket_entry(ticket: Optional[Dict[str, Any]]) -> Optional[Tuple[str, str, str]]:
+    """(agent id, question, answer) of a resolved ticket with a manual response"""
+    if ticket is None or ticket.get("status") != "resolved" or not ticket.get("manual_response"):
+        return None
+    return ticket.get("agent_id"), ticket.get("question") or "", ticket["manual_response"]
+
+
+def knowledge_entry(text: str) -> Optional[Tuple[str, str]]:
+    """(question, answer) of a knowledge-base item written as Q/A text, else None.
+
+    Knowledge-base items are mostly file URLs and names; only items such as
+    ``Q: How do I reset my password? A: Use the reset link.`` (the markers
+    are optional, a question mark is not) can be answered locally.
+    """
+    match = _QA.match(text)
+    if match is None:
+        return None
+    question, answer = match.group("question").strip(), match.group("answer").strip()
+    # A URL query string or a file name is not a question
+    if " " not in question or not any(char.isalpha() for char in answer):
+        return None
+    return question, answer
+
+
+class AgentFAQ:
+    """Sparse answer vectors of one agent, scored together with numpy.
+
+    Each entry's hashed n-gram vector is kept as its non-zero (feature,
+    value) pairs in flat arrays shared by the agent's entries (12 bytes a
+    pair, 1-2 KB an entry), and a query is scored against every entry in
+    one ``bincount`` over those arrays. Entries are keyed by their source
+    (``kb:<entry>`` or ``ticket:<id>``). Adding one appends its pairs;
+    removing one only marks its slot dead, and the arrays are compacted
+    once dead pairs outnumber live ones. Beyond ``max_entries`` the least
+    recently indexed entry is evicted.
+    """
+
+    def __init__(self, max_entries: int = 1000):
+        self.max_entries = max_entries
+        # Slot of each entry, least recently indexed first
+        self._slots: "OrderedDict[str, int]" = OrderedDict()
+        # Per slot: answer (None once removed) and number of pairs
+        self._answers: List[Optional[str]] = []
+        self._sizes: List[int] = []
+        # One element per (feature, value) pair
+        self._features = array("i")
+        self._owners = array("i")
+        self._values = array("f")
+        self._dead = 0
+        self.evicted = 0
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    @property
+    def nbytes(self) -> int:
+        return len(self._values) * 12
+
+    def put(self, key: str, text: str, answer: str) -> None:
+        self.remove(key)
+        indices, values = vectorize(text)
+        if not len(indices):
+            return
+        slot = len(self._answers)
+        self._slots[key] = slot
+        self._answers.append(answer)
+        self._sizes.append(len(indices))
+        self._features.frombytes(indices.astype(np.int32).tobytes())
+        self._owners.frombytes(np.full(len(indices), slot, dtype=np.int32).tobytes())
+        self._values.frombytes(values.astype(np.float32).tobytes())
+        while len(self._slots) > self.max_entries:
+            self.remove(next(iter(self._slots)))
+            self.evicted += 1
+
+    def remove(self, key: str) -> None:
+        slot = self._slots.pop(key, None)
+        if slot is None:
+            return
+        self._answers[slot] = None
+        self._dead += self._sizes[slot]
+        if self._dead * 2 > len(self._values):
+            self._compact()
+
+    def _compact(self) -> None:
+        """Drop the pairs of removed entries and renumber the live slots"""
+        alive = np.array([answer is not None for answer in self._answers], dtype=bool)
+        renumber = np.cumsum(alive) - 1
+        owners = np.frombuffer(self._owners, dtype=np.int32)
+        keep = alive[owners]
+        features = np.frombuffer(self._features, dtype=np.int32)[keep]
+        values = np.frombuffer(self._values, dtype=np.float32)[keep]
+        owners = renumber[owners[keep]].astype(np.int32)
+        self._features, self._owners, self._values = array("i"), array("i"), array("f")
+        self._features.frombytes(features.tobytes())
+        self._owners.frombytes(owners.tobytes())
+        self._values.frombytes(values.tobytes())
+        self._answers = [answer for answer in self._answers if answer is not None]
+        self._sizes = [size for size, live in zip(self._sizes, alive) if live]
+        for key, slot in self._slots.items():
+            self._slots[key] = int(renumber[slot])
+        self._dead = 0
+
+    def best(self, indices: np.ndarray, values: np.ndarray) -> Tuple[Optional[str], float]:
+        """Answer with the highest cosine similarity to a query vector"""
+        if not self._slots or not len(indices):
+            return None, 0.0
+        query = np.zeros(DIMENSIONS, dtype=np.float32)
+        query[indices] = values
+        features = np.frombuffer(self._features, dtype=np.int32)
+        owners = np.frombuffer(self._owners, dtype=np.int32)
+        weights = query[features] * np.frombuffer(self._values, dtype=np.float32)
+        scores = np.bincount(owners, weights=weights, minlength=len(self._answers))
+        if self._dead:
+            scores[[slot for slot, answer in enumerate(self._answers) if answer is None]] = -np.inf
+        slot = int(np.argmax(scores))
+        return self._answers[slot], float(scores[slot])
+
+
+class FAQIndex:
+    """Per-agent retrieval index answering repeat questions without Lyzr.
+
+    Each agent's index holds its knowledge-base items written as Q/A text
+    (matched on the question, answered with the answer; file names and
+    URLs are skipped) and its resolved tickets (matched on the question,
+    answered with the ``manual_response``), at most ``max_entries`` of
+    them per agent. The index subscribes
+    to the agent and ticket stores and re-indexes only the entries whose
+    inputs changed. A question whose best match has a cosine similarity of
+    at least ``min_similarity`` is answered locally with that similarity as
+    the confidence score.
+    """
+
+    def __init__(self, agents: IndexedStore, tickets: IndexedStore, min_similarity: float = 0.8,
+                 max_entries: int = 1000):
+        self.min_similarity = min_similarity
+        self.max_entries = max_entries
+        self._agents: Dict[str, AgentFAQ] = {}
+        # Knowledge-base entries last indexed per agent, to re-index only what changed
+        self._knowledge: Dict[str, Set[str]] = {}
+        self.hits = 0
+        self.misses = 0
+        for record in agents.values():
+            self._on_agent("insert", None, record)
+        for record in tickets.values():
+            self._on_ticket("insert", None, record)
+        agents.subscribe(self._on_agent)
+        tickets.subscribe(self._on_ticket)
+
+    @property
+    def enabled(self) -> bool:
+        return self.min_similarity <= 1.0
+
+    def _faq(self, agent_id: str) -> AgentFAQ:
+        faq = self._agents.get(agent_id)
+        if faq is None:
+            faq = self._agents[agent_id] = AgentFAQ(self.max_entries)
+        return faq
+
+    def _on_agent(self, op: str, old: Optional[Dict[str, Any]], new: Optional[Dict[str, Any]]) -> None:
+        if op == "delete":
+            self._agents.pop(old["id"], None)
+            self._knowledge.pop(old["id"], None)
+            return
+        agent_id = new["id"]
+        knowledge = {entry for entry in new.get("knowledge_base") or [] if entry and knowledge_entry(entry)}
+        previous = self._knowledge.get(agent_id, set())
+        if knowledge == previous:
+            return
+        faq = self._faq(agent_id)
+        for entry in previous - knowledge:
+            faq.remove(f"kb:{entry}")
+        for entry in knowledge - previous:
+            faq.put(f"kb:{entry}", *knowledge_entry(entry))
+        self._knowledge[agent_id] = knowledge
+
+    def _on_ticket(self, op: str, old: Optional[Dict[str, Any]], new: Optional[Dict[str, Any]]) -> None:
+        before, after = _ticket_entry(old), _ticket_entry(new)
+        if before == after:
+            return
+        key = f"ticket:{(new or old)['id']}"
+        if before is not None:
+            faq = self._agents.get(before[0])
+            if faq is not None:
+                faq.remove(key)
+        if after is not None:
+            agent_id, question, answer = after
+            self._faq(agent_id).put(key, question, answer)
+
+    def match(self, agent_id: str, message: str) -> Optional[Dict[str, Any]]:
+        """A local reply when the message is close enough to an indexed answer"""
+        if not self.enabled:
+            return None
+        faq = self._agents.get(agent_id)
+        if faq is None or not len(faq):
+            return None
+        answer, similarity = faq.best(*vectorize(message))
+        if answer is None or similarity < self.min_similarity:
+            self.misses += 1
+            faq_lookups.inc(outcome="miss")
+            return None
+        self.hits += 1
+        faq_lookups.inc(outcome="hit")
+        return {"response": answer, "confidence_score": round(min(similarity, 1.0), 4), "source": "faq"}
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "min_similarity": self.min_similarity,
+            "agents": len(self._agents),
+            "entries": sum(len(faq) for faq in self._agents.values()),
+            "index_bytes": sum(faq.nbytes for faq in self._agents.values()),
+            "evicted": sum(faq.evicted for faq in self._agents.values()),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+faq_lookups = metrics.counter("faq_lookups_total", "Chat messages checked against the local FAQ index", ["outcome"])
+
+# Global instance; set FAQ_MIN_SIMILARITY above 1 to always ask Lyzr
+faq_index = FAQIndex(
+    agents, tickets,
+    min_similarity=float(os.getenv("FAQ_MIN_SIMILARITY", "0.8")),
+    max_entries=int(os.getenv("FAQ_MAX_ENTRIES", "1000")),
+)
@@ -0,0 +1,316 @@
+import asyncio
+import logging
+import os
+import re
+import time
+from typing import Any, BinaryIO, Dict, List, Optional, Tuple
+
+from services.serialization import ORJSON_AVAILABLE, dumps
+from services.store import IndexedStore, id_number, support_requests, agents, tickets, chat_sessions
+
+if ORJSON_AVAILABLE:
+    from orjson import loads
+else:
+    from json import loads
+
+logger = logging.getLogger(__name__)
+
+SEGMENT_FILE = "journal-{:08d}.log"
+SNAPSHOT_FILE = "snapshot-{:08d}.jsonl"
+_FILE_PATTERN = re.compile(r"^(journal|snapshot)-(\d{8})\.(log|jsonl)$")
+# Records encoded per step of a snapshot before yielding to other requests
+SNAPSHOT_CHUNK_SIZE = 5000
+
+
+class StoreJournal:
+    """Append-only log of store writes plus periodic snapshots, for restarts without a database.
+
+    Every insert and update is logged as the full record and every delete
+    as the id, so replaying a log is idempotent. Lines are buffered and a
+    background task appends and fsyncs them every ``flush_interval``
+    seconds (off the event loop), so a write costs one encode and a list
+    append; at most the last interval is lost on a crash.
+
+    The log is split into numbered segments. After ``snapshot_every``
+    writes, and on shutdown, a new segment is started and every record is
+    written to a snapshot of the same number, a chunk at a time between
+    requests. Writes made while the snapshot runs land in the new segment
+    and are replayed over it, so the snapshot needs no pause; once it is
+    complete, older segments and snapshots are deleted. On startup the
+    latest complete snapshot is loaded and the segments from its number on
+    are replayed; a line torn by a crash is skipped.
+    """
+
+    def __init__(self, directory: Optional[str], stores: Dict[str, IndexedStore],
+                 flush_interval: float = 0.05, snapshot_every: int = 500_000, fsync: bool = True):
+        self.directory = directory
+        self.stores = stores
+        self.flush_interval = flush_interval
+        self.snapshot_every = snapshot_every
+        self.fsync = fsync
+        self._pending: List[bytes] = []
+        self._file: Optional[BinaryIO] = None
+        # Set when a failed append could not be cut off the end of the segment
+        self._torn = False
+        self._generation = 0
+        self._wake: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._loaded = False
+        self._stopping = False
+        self.writes_since_snapshot = 0
+        self.bytes_written = 0
+        self.flushes = 0
+        self.errors = 0
+        self.snapshots = 0
+        self.last_flush_ms = 0.0
+        self.last_snapshot_ms = 0.0
+        self.loaded_records = 0
+        self.replayed_writes = 0
+        self.load_ms = 0.0
+
+    @property
+    def enabled(self) -> bool:
+        return self.directory is not None
+
+    async def start(self) -> None:
+        """Load the latest snapshot and replay the log, then start journaling writes"""
+        if not self.enabled:
+            return
+        if not self._loaded:
+            os.makedirs(self.directory, exist_ok=True)
+            self._generation = await asyncio.to_thread(self.load)
+            # Log replayed after a crash is folded into the next snapshot
+            self.writes_since_snapshot = self.replayed_writes
+            # Subscribe only after loading so the loaded records are not journaled again
+            for name, store in self.stores.items():
+                store.subscribe(self._listener(name), include_remote=False)
+            self._loaded = True
+        self._stopping = False
+        self._open_segment(self._generation + 1)
+        self._wake = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    def load(self) -> int:
+        """Fill the stores from disk; returns the highest segment or snapshot number found"""
+        started = time.perf_counter()
+        files = self._files()
+        snapshots = [number for kind, number in files if kind == "snapshot"]
+        base = max(snapshots, default=0)
+        state: Dict[str, Dict[str, Dict[str, Any]]] = {name: {} for name in self.stores}
+        counters = {name: 0 for name in self.stores}
+        if base:
+            self._read_snapshot(base, state, counters)
+        for kind, number in files:
+            if kind == "journal" and number >= base:
+                self._replay_segment(number, state, counters)
+        for name, store in self.stores.items():
+            # Snapshots keep the store's order and new records are appended to it, so the
+            # records are already (almost) in sequence order and each insert is an append
+            self.loaded_records += store.load(state[name].values())
+            store.advance_counter(counters[name])
+        self.load_ms = (time.perf_counter() - started) * 1000
+        logger.info("Loaded %d records from the journal in %.0f ms (snapshot %d, %d writes replayed)",
+                    self.loaded_records, self.load_ms, base, self.replayed_writes)
+        return max((number for _, number in files), default=0)
+
+    def _files(self) -> List[Tuple[str, int]]:
+        files = []
+        for filename in os.listdir(self.directory):
+            match = _FILE_PATTERN.match(filename)
+            if match:
+                files.append((match.group(1), int(match.group(2))))
+        return sorted(files, key=lambda item: item[1])
+
+    def _path(self, template: str, number: int) -> str:
+        return os.path.join(self.directory, template.format(number))
+
+    def _read_snapshot(self, number: int, state: Dict[str, Dict[str, Dict[str, Any]]],
+                       counters: Dict[str, int]) -> None:
+        with open(self._path(SNAPSHOT_FILE, number), "rb") as snapshot:
+            header = loads(snapshot.readline())
+            for name, counter in header["counters"].items():
+                if name in counters:
+                    counters[name] = counter
+            for line in snapshot:
+                name, record = loads(line)
+                if name in state:
+                    state[name][record["id"]] = record
+
+    def _replay_segment(self, number: int, state: Dict[str, Dict[str, Dict[str, Any]]],
+                        counters: Dict[str, int]) -> None:
+        with open(self._path(SEGMENT_FILE, number), "rb") as segment:
+            for line in segment:
+                try:
+                    name, op, value = loads(line)
+                except ValueError:
+                    # A write cut short by a crash or a failed append
+                    logger.warning("Ignoring a torn line in %s", segment.name)
+                    continue
+                records = state.get(name)
+                if records is None:
+                    continue
+                record_id = value["id"] if op == "put" else value
+                if op == "put":
+                    records[record_id] = value
+                else:
+                    records.pop(record_id, None)
+                counters[name] = max(counters[name], id_number(record_id) or 0)
+                self.replayed_writes += 1
+
+    def _listener(self, name: str):
+        def on_write(op: str, old: Optional[Dict[str, Any]], new: Optional[Dict[str, Any]]) -> None:
+            if new is not None:
+                self._pending.append(dumps([name, "put", new]) + b"\n")
+            else:
+                self._pending.append(dumps([name, "delete", old["id"]]) + b"\n")
+            self.writes_since_snapshot += 1
+        return on_write
+
+    def _open_segment(self, number: int) -> None:
+        if self._file is not None:
+            self._file.close()
+        self._generation = number
+        # Unbuffered, so a failed append leaves no bytes behind in a buffer
+        self._file = open(self._path(SEGMENT_FILE, number), "ab", buffering=0)
+        self._torn = False
+
+    async def _run(self) -> None:
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            await self.flush()
+            if self.writes_since_snapshot >= self.snapshot_every:
+                await self.snapshot()
+
+    async def flush(self) -> None:
+        """Append and fsync the buffered writes"""
+        if not self._pending or self._file is None:
+            return
+        if self._torn:
+            # Part of a failed append is stuck at the end of the segment: continue in a new
+            # one (replay skips the torn line and re-applies the requeued writes in order)
+            self._open_segment(self._generation + 1)
+        pending, self._pending = self._pending, []
+        data = b"".join(pending)
+        started = time.perf_counter()
+        try:
+            await asyncio.to_thread(self._append, self._file, data)
+        except Exception:
+            # Keep the writes so the next flush retries them in order
+            self.errors += 1
+            self._pending = pending + self._pending
+            logger.exception("Failed to append %d bytes to the journal", len(data))
+            return
+        self.last_flush_ms = (time.perf_counter() - started) * 1000
+        self.bytes_written += len(data)
+        self.flushes += 1
+
+    def _append(self, file: BinaryIO, data: bytes) -> None:
+        position = file.tell()
+        try:
+            view = memoryview(data)
+            while view:
+                view = view[file.write(view):]
+            self._sync(file)
+        except BaseException:
+            # Cut off whatever part of the data made it, so the retry starts on a clean line
+            try:
+                os.ftruncate(file.fileno(), position)
+            except OSError:
+                self._torn = True
+            raise
+
+    def _sync(self, file: BinaryIO) -> None:
+        file.flush()
+        if self.fsync:
+            os.fsync(file.fileno())
+
+    async def snapshot(self) -> None:
+        """Start a new segment and write every record to a snapshot of the same number"""
+        await self.flush()
+        started = time.perf_counter()
+        number = self._generation + 1
+        self._open_segment(number)
+        self.writes_since_snapshot = 0
+        path = self._path(SNAPSHOT_FILE, number)
+        header = {"counters": {name: store.id_counter for name, store in self.stores.items()}}
+        try:
+            with open(path + ".tmp", "wb") as snapshot:
+                snapshot.write(dumps(header) + b"\n")
+                for name, store in self.stores.items():
+                    records = store.values()
+                    for start in range(0, len(records), SNAPSHOT_CHUNK_SIZE):
+                        chunk = b"".join([dumps([name, record]) + b"\n"
+                                          for record in records[start:start + SNAPSHOT_CHUNK_SIZE]])
+                        await asyncio.to_thread(snapshot.write, chunk)
+                await asyncio.to_thread(self._sync, snapshot)
+            os.replace(path + ".tmp", path)
+        except Exception:
+            self.errors += 1
+            logger.exception("Failed to write journal snapshot %d", number)
+            return
+        # The snapshot and the segments from its number on now hold everything
+        for kind, older in self._files():
+            if older < number:
+                os.remove(self._path(SNAPSHOT_FILE if kind == "snapshot" else SEGMENT_FILE, older))
+        self.snapshots += 1
+        self.last_snapshot_ms = (time.perf_counter() - started) * 1000
+
+    async def close(self) -> None:
+        """Flush the log and leave a snapshot so the next start has little to replay"""
+        if self._task is None:
+            return
+        self._stopping = True
+        self._wake.set()
+        await self._task
+        self._task = None
+        await self.flush()
+        if self.writes_since_snapshot:
+            await self.snapshot()
+        self._file.close()
+        if not os.path.getsize(self._file.name):
+            os.remove(self._file.name)
+        self._file = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "segment": self._generation,
+            "pending": len(self._pending),
+            "writes_since_snapshot": self.writes_since_snapshot,
+            "bytes_written": self.bytes_written,
+            "flushes": self.flushes,
+            "snapshots": self.snapshots,
+            "errors": self.errors,
+            "last_flush_ms": round(self.last_flush_ms, 3),
+            "last_snapshot_ms": round(self.last_snapshot_ms, 3),
+            "loaded_records": self.loaded_records,
+            "replayed_writes": self.replayed_writes,
+            "load_ms": round(self.load_ms, 3),
+        }
+
+
+def _journal_dir() -> Optional[str]:
+    directory = os.getenv("JOURNAL_DIR") or None
+    if directory and (os.getenv("DATABASE_URL") or os.getenv("SHARED_STATE", "memory") == "redis"):
+        logger.warning("JOURNAL_DIR is ignored: the stores are already kept in the database or in Redis")
+        return None
+    return directory
+
+
+# Global instance (disabled unless JOURNAL_DIR is set and neither SQL persistence nor Redis is used)
+journal = StoreJournal(
+    _journal_dir(),
+    {
+        "support_requests": support_requests,
+        "agents": agents,
+        "tickets": tickets,
+        "chat_sessions": chat_sessions,
+    },
+    flush_interval=float(os.getenv("JOURNAL_FLUSH_INTERVAL", "0.05")),
+    snapshot_every=int(os.getenv("JOURNAL_SNAPSHOT_EVERY", "500000")),
+    fsync=os.getenv("JOURNAL_FSYNC", "true").lower() == "true",
+)
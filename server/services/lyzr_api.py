@@ -1,21 +1,203 @@
 import httpx
 import os
-from typing import Dict, Any, List, Optional
+import re
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import Dict, Any, Optional, AsyncIterator
 from fastapi import HTTPException
 import json
+import hashlib
+import logging
+from services.cache import TTLCache, RedisCache
+from services.singleflight import SingleFlight
+from services.resilience import (
+    RetryPolicy, CircuitBreaker, Bulkhead, CircuitOpenError, BulkheadFullError, is_upstream_failure
+)
+from services.metrics import metrics, lyzr_request_duration, lyzr_rejections
+
+logger = logging.getLogger(__name__)
+
+
+class LyzrUnavailableError(HTTPException):
+    """Lyzr is down, overloaded or timing out (as opposed to rejecting the request)"""
+
+
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+
+def call_outcome(exc: BaseException) -> str:
+    """Low-cardinality label describing how a failed Lyzr call ended"""
+    if isinstance(exc, httpx.HTTPStatusError):
+        return f"http_{exc.response.status_code}"
+    if isinstance(exc, httpx.TimeoutException):
+        return "timeout"
+    if isinstance(exc, httpx.TransportError):
+        return "transport_error"
+    return "error"
+
+
+def normalize_message(message: str) -> str:
+    """Canonical form of a chat message used for cache keys"""
+    return " ".join(message.lower().split()).rstrip("?!. ")
+
+
+def chat_cache_key(agent_id: str, message: str, context: Optional[Dict] = None) -> tuple:
+    """Cache and single-flight key for a chat: the agent, the normalized
+    message and a digest of the conversation context, if any"""
+    if not context:
+        return (agent_id, normalize_message(message))
+    digest = hashlib.sha1(json.dumps(context, sort_keys=True, default=str).encode()).hexdigest()
+    return (agent_id, normalize_message(message), digest)
+
+
+def _count(items: Optional[Any], predicate: str) -> Optional[int]:
+    """How many ``items`` answer True to their ``predicate`` method; None if that cannot be told"""
+    if items is None:
+        return None
+    try:
+        return sum(1 for item in list(items) if getattr(item, predicate)())
+    except (AttributeError, TypeError):
+        return None
+
 
 class LyzrAPIService:
     def __init__(self):
         self.api_key = os.getenv("LYZR_API_KEY")
         self.base_url = os.getenv("LYZR_API_URL", "https://api.lyzr.ai")
-        self.client = httpx.AsyncClient(
-            timeout=30.0,
+        # Cache of chat responses keyed on chat_cache_key; size 0 disables it
+        cache_size = int(os.getenv("LYZR_CHAT_CACHE_SIZE", "1024"))
+        self.chat_cache = TTLCache(
+            maxsize=cache_size,
+            ttl=float(os.getenv("LYZR_CHAT_CACHE_TTL", "300")),
+        ) if cache_size > 0 else None
+        # Redis-backed replacement for chat_cache when workers share state
+        self.shared_cache: Optional[RedisCache] = None
+        # Identical concurrent calls share one upstream request
+        self.chat_flight = SingleFlight()
+        self.analytics_flight = SingleFlight()
+        # Delay between chunks emitted by the mock streaming responses
+        self.mock_chunk_delay = float(os.getenv("LYZR_MOCK_CHUNK_DELAY", "0"))
+        # Connection pool and HTTP/2 settings
+        self.limits = httpx.Limits(
+            max_connections=int(os.getenv("LYZR_MAX_CONNECTIONS", "100")),
+            max_keepalive_connections=int(os.getenv("LYZR_MAX_KEEPALIVE_CONNECTIONS", "20")),
+            keepalive_expiry=float(os.getenv("LYZR_KEEPALIVE_EXPIRY", "30")),
+        )
+        self.http2 = os.getenv("LYZR_HTTP2", "false").lower() == "true"
+        if self.http2 and not HTTP2_AVAILABLE:
+            logger.warning("LYZR_HTTP2 is set but the h2 package is not installed; using HTTP/1.1")
+            self.http2 = False
+        # Per-operation timeouts; connect and pool-wait timeouts are shared
+        connect_timeout = float(os.getenv("LYZR_CONNECT_TIMEOUT", "5"))
+        pool_timeout = float(os.getenv("LYZR_POOL_TIMEOUT", "5"))
+        self.timeouts = {
+            operation: httpx.Timeout(float(os.getenv(env, default)), connect=connect_timeout, pool=pool_timeout)
+            for operation, env, default in [
+                ("chat", "LYZR_CHAT_TIMEOUT", "30"),
+                ("agents", "LYZR_AGENTS_TIMEOUT", "60"),
+                ("analytics", "LYZR_ANALYTICS_TIMEOUT", "10"),
+            ]
+        }
+        self.client = self._build_client()
+        # Retries, circuit breakers and bulkheads (concurrency caps) per operation
+        self.retry_policy = RetryPolicy(
+            attempts=int(os.getenv("LYZR_RETRY_ATTEMPTS", "3")),
+            base_delay=float(os.getenv("LYZR_RETRY_BASE_DELAY", "0.1")),
+            max_delay=float(os.getenv("LYZR_RETRY_MAX_DELAY", "2")),
+        )
+        self.breakers = {
+            operation: CircuitBreaker(
+                failure_threshold=int(os.getenv("LYZR_BREAKER_FAILURES", "5")),
+                reset_timeout=float(os.getenv("LYZR_BREAKER_RESET_TIMEOUT", "30")),
+            )
+            for operation in self.timeouts
+        }
+        bulkhead_wait = float(os.getenv("LYZR_BULKHEAD_MAX_WAIT", "2"))
+        self.bulkheads = {
+            "chat": Bulkhead(int(os.getenv("LYZR_CHAT_CONCURRENCY", "64")), bulkhead_wait),
+            "agents": Bulkhead(int(os.getenv("LYZR_AGENTS_CONCURRENCY", "8")), bulkhead_wait),
+            "analytics": Bulkhead(int(os.getenv("LYZR_ANALYTICS_CONCURRENCY", "8")), bulkhead_wait),
+        }
+
+    def _build_client(self) -> httpx.AsyncClient:
+        return httpx.AsyncClient(
+            timeout=self.timeouts["chat"],
+            limits=self.limits,
+            http2=self.http2,
             headers={
                 "Authorization": f"Bearer {self.api_key}",
                 "Content-Type": "application/json"
             } if self.api_key else {}
         )
 
+    async def start(self):
+        """Open the HTTP client (again) at application startup"""
+        if self.client.is_closed:
+            self.client = self._build_client()
+
+    async def _request(self, operation: str, method: str, url: str, idempotent: bool, **kwargs) -> httpx.Response:
+        """Send a request through the operation's bulkhead, circuit breaker and retry policy"""
+        breaker = self.breakers[operation]
+        async with self._bulkhead(operation):
+            attempt = 0
+            while True:
+                if not breaker.allow():
+                    lyzr_rejections.inc(operation=operation, reason="circuit_open")
+                    raise CircuitOpenError(f"circuit open for {operation}")
+                started = time.perf_counter()
+                try:
+                    response = await self.client.request(
+                        method, url, timeout=self.timeouts[operation], **kwargs
+                    )
+                    response.raise_for_status()
+                except Exception as e:
+                    lyzr_request_duration.observe(
+                        time.perf_counter() - started, operation=operation, outcome=call_outcome(e)
+                    )
+                    breaker.record(e)
+                    if not self.retry_policy.should_retry(e, attempt, idempotent):
+                        raise
+                    await asyncio.sleep(self.retry_policy.backoff(attempt))
+                    attempt += 1
+                    continue
+                lyzr_request_duration.observe(time.perf_counter() - started, operation=operation, outcome="success")
+                breaker.record()
+                return response
+
+    @asynccontextmanager
+    async def _bulkhead(self, operation: str):
+        """Enter the operation's bulkhead, counting rejections"""
+        try:
+            async with self.bulkheads[operation]:
+                yield
+        except BulkheadFullError:
+            lyzr_rejections.inc(operation=operation, reason="bulkhead_full")
+            raise
+
+    @staticmethod
+    def _upstream_error(exc: Exception, action: str) -> HTTPException:
+        """Translate a failed upstream call into the HTTPException raised to callers"""
+        if isinstance(exc, HTTPException):
+            return exc
+        if isinstance(exc, (CircuitOpenError, BulkheadFullError)):
+            return LyzrUnavailableError(status_code=503, detail=f"Lyzr API unavailable: {exc}")
+        if isinstance(exc, httpx.HTTPStatusError):
+            error_class = LyzrUnavailableError if is_upstream_failure(exc) else HTTPException
+            return error_class(
+                status_code=exc.response.status_code,
+                detail=f"Lyzr API error: {exc.response.text}"
+            )
+        if isinstance(exc, httpx.TimeoutException):
+            return LyzrUnavailableError(status_code=504, detail=f"Failed to {action}: Lyzr API timed out")
+        if isinstance(exc, httpx.TransportError):
+            return LyzrUnavailableError(status_code=503, detail=f"Failed to {action}: {str(exc)}")
+        return HTTPException(status_code=500, detail=f"Failed to {action}: {str(exc)}")
+
     async def create_agent(self, agent_data: Dict[str, Any]) -> Dict[str, Any]:
         """Create a new Lyzr agent"""
         if not self.api_key:
@@ -28,8 +210,8 @@ class LyzrAPIService:
             }
 
         try:
-            response = await self.client.post(
-                f"{self.base_url}/agents",
+            response = await self._request(
+                "agents", "POST", f"{self.base_url}/agents", idempotent=False,
                 json={
                     "name": agent_data["name"],
                     "description": agent_data["description"],
@@ -43,29 +225,33 @@ class LyzrAPIService:
                     }
                 }
             )
-            response.raise_for_status()
             return response.json()
-        except httpx.HTTPStatusError as e:
-            raise HTTPException(
-                status_code=e.response.status_code,
-                detail=f"Lyzr API error: {e.response.text}"
-            )
         except Exception as e:
-            raise HTTPException(
-                status_code=500,
-                detail=f"Failed to create Lyzr agent: {str(e)}"
-            )
+            raise self._upstream_error(e, "create Lyzr agent")
 
     async def chat_with_agent(self, agent_id: str, message: str, context: Optional[Dict] = None) -> Dict[str, Any]:
-        """Send a message to a Lyzr agent"""
+        """Send a message to a Lyzr agent.
+
+        Answers are cached and identical concurrent messages share one
+        upstream call, keyed on ``chat_cache_key``: a message with
+        conversation context only reuses answers given with the same history.
+        """
+        cache_key = chat_cache_key(agent_id, message, context)
+        cached = await self._cache_get(cache_key)
+        if cached is not None:
+            return dict(cached)
+
+        async def call():
+            result = await self._chat_with_agent(agent_id, message, context)
+            await self._cache_set(cache_key, dict(result), tag=agent_id)
+            return result
+
+        return dict(await self.chat_flight.do(cache_key, call))
+
+    async def _chat_with_agent(self, agent_id: str, message: str, context: Optional[Dict] = None) -> Dict[str, Any]:
         if not self.api_key:
             # Mock response for development
-            return {
-                "response": f"Thank you for your message: '{message}'. This is a mock response from the Lyzr agent.",
-                "confidence_score": 0.85,
-                "ticket_created": False,
-                "agent_id": agent_id
-            }
+            return self._mock_chat_response(agent_id, message)
 
         try:
             payload = {
@@ -74,25 +260,116 @@ class LyzrAPIService:
                 "context": context or {}
             }
             
-            response = await self.client.post(
-                f"{self.base_url}/chat",
-                json=payload
+            response = await self._request(
+                "chat", "POST", f"{self.base_url}/chat", idempotent=False, json=payload
             )
-            response.raise_for_status()
             return response.json()
-        except httpx.HTTPStatusError as e:
-            raise HTTPException(
-                status_code=e.response.status_code,
-                detail=f"Lyzr API error: {e.response.text}"
-            )
         except Exception as e:
-            raise HTTPException(
-                status_code=500,
-                detail=f"Failed to chat with Lyzr agent: {str(e)}"
-            )
+            raise self._upstream_error(e, "chat with Lyzr agent")
+
+    async def stream_chat_with_agent(self, agent_id: str, message: str, context: Optional[Dict] = None) -> AsyncIterator[Dict[str, Any]]:
+        """Stream a Lyzr agent's reply as it is generated.
+
+        Yields ``{"delta": text}`` chunks as they arrive, then one final
+        ``{"done": True, "response": ..., "confidence_score": ...}`` event.
+        """
+        cache_key = chat_cache_key(agent_id, message, context)
+        cached = await self._cache_get(cache_key)
+        if cached is not None:
+            yield {"delta": cached["response"]}
+            yield {"done": True, **cached}
+            return
+
+        if not self.api_key:
+            # Mock response for development, emitted word by word
+            result = self._mock_chat_response(agent_id, message)
+            for chunk in re.findall(r"\S+\s*", result["response"]):
+                if self.mock_chunk_delay:
+                    await asyncio.sleep(self.mock_chunk_delay)
+                yield {"delta": chunk}
+        else:
+            result = {}
+            parts = []
+            breaker = self.breakers["chat"]
+            try:
+                payload = {
+                    "agent_id": agent_id,
+                    "message": message,
+                    "context": context or {},
+                    "stream": True
+                }
+
+                # Streams are not retried: chunks may already have reached the client
+                async with self._bulkhead("chat"):
+                    if not breaker.allow():
+                        lyzr_rejections.inc(operation="chat", reason="circuit_open")
+                        raise CircuitOpenError("circuit open for chat")
+                    started = time.perf_counter()
+                    try:
+                        async with self.client.stream(
+                            "POST", f"{self.base_url}/chat", json=payload, timeout=self.timeouts["chat"]
+                        ) as response:
+                            if response.is_error:
+                                await response.aread()
+                            response.raise_for_status()
+                            if "text/event-stream" not in response.headers.get("content-type", ""):
+                                # Upstream answered in one piece
+                                result = json.loads(await response.aread())
+                                yield {"delta": result["response"]}
+                            else:
+                                async for line in response.aiter_lines():
+                                    if not line.startswith("data:"):
+                                        continue
+                                    data = line[5:].strip()
+                                    if not data or data == "[DONE]":
+                                        continue
+                                    event = json.loads(data)
+                                    if event.get("delta"):
+                                        parts.append(event["delta"])
+                                        yield {"delta": event["delta"]}
+                                    if "confidence_score" in event:
+                                        result = event
+                    except Exception as e:
+                        lyzr_request_duration.observe(
+                            time.perf_counter() - started, operation="chat_stream", outcome=call_outcome(e)
+                        )
+                        breaker.record(e)
+                        raise
+                    lyzr_request_duration.observe(
+                        time.perf_counter() - started, operation="chat_stream", outcome="success"
+                    )
+                    breaker.record()
+            except Exception as e:
+                raise self._upstream_error(e, "chat with Lyzr agent")
+            result = {**result, "response": result.get("response") or "".join(parts)}
+
+        result.pop("delta", None)
+        result.pop("done", None)
+        await self._cache_set(cache_key, dict(result), tag=agent_id)
+        yield {"done": True, **result}
+
+    @staticmethod
+    def _mock_chat_response(agent_id: str, message: str) -> Dict[str, Any]:
+        return {
+            "response": f"Thank you for your message: '{message}'. This is a mock response from the Lyzr agent.",
+            "confidence_score": 0.85,
+            "ticket_created": False,
+            "agent_id": agent_id
+        }
 
     async def update_agent(self, agent_id: str, agent_data: Dict[str, Any]) -> Dict[str, Any]:
-        """Update an existing Lyzr agent"""
+        """Update an existing Lyzr agent.
+
+        Cached chat responses are dropped before the call and again once it
+        succeeds, so answers cached by chats that ran during the update are
+        not served after it.
+        """
+        await self.invalidate_agent(agent_id)
+        result = await self._update_agent(agent_id, agent_data)
+        await self.invalidate_agent(agent_id)
+        return result
+
+    async def _update_agent(self, agent_id: str, agent_data: Dict[str, Any]) -> Dict[str, Any]:
         if not self.api_key:
             # Mock response for development
             return {
@@ -103,8 +380,8 @@ class LyzrAPIService:
             }
 
         try:
-            response = await self.client.put(
-                f"{self.base_url}/agents/{agent_id}",
+            response = await self._request(
+                "agents", "PUT", f"{self.base_url}/agents/{agent_id}", idempotent=True,
                 json={
                     "name": agent_data["name"],
                     "description": agent_data["description"],
@@ -113,21 +390,18 @@ class LyzrAPIService:
                     "knowledge_base": agent_data["knowledge_base"]
                 }
             )
-            response.raise_for_status()
             return response.json()
-        except httpx.HTTPStatusError as e:
-            raise HTTPException(
-                status_code=e.response.status_code,
-                detail=f"Lyzr API error: {e.response.text}"
-            )
         except Exception as e:
-            raise HTTPException(
-                status_code=500,
-                detail=f"Failed to update Lyzr agent: {str(e)}"
-            )
+            raise self._upstream_error(e, "update Lyzr agent")
 
     async def delete_agent(self, agent_id: str) -> Dict[str, Any]:
-        """Delete a Lyzr agent"""
+        """Delete a Lyzr agent (cached chat responses are dropped before and after, as for an update)"""
+        await self.invalidate_agent(agent_id)
+        result = await self._delete_agent(agent_id)
+        await self.invalidate_agent(agent_id)
+        return result
+
+    async def _delete_agent(self, agent_id: str) -> Dict[str, Any]:
         if not self.api_key:
             # Mock response for development
             return {
@@ -136,22 +410,20 @@ class LyzrAPIService:
             }
 
         try:
-            response = await self.client.delete(f"{self.base_url}/agents/{agent_id}")
-            response.raise_for_status()
-            return {"id": agent_id, "status": "deleted"}
-        except httpx.HTTPStatusError as e:
-            raise HTTPException(
-                status_code=e.response.status_code,
-                detail=f"Lyzr API error: {e.response.text}"
+            await self._request(
+                "agents", "DELETE", f"{self.base_url}/agents/{agent_id}", idempotent=True
             )
+            return {"id": agent_id, "status": "deleted"}
         except Exception as e:
-            raise HTTPException(
-                status_code=500,
-                detail=f"Failed to delete Lyzr agent: {str(e)}"
-            )
+            raise self._upstream_error(e, "delete Lyzr agent")
 
     async def get_agent_analytics(self, agent_id: str) -> Dict[str, Any]:
         """Get analytics for a Lyzr agent"""
+        return dict(await self.analytics_flight.do(
+            agent_id, lambda: self._get_agent_analytics(agent_id)
+        ))
+
+    async def _get_agent_analytics(self, agent_id: str) -> Dict[str, Any]:
         if not self.api_key:
             # Mock analytics for development
             return {
@@ -164,23 +436,93 @@ class LyzrAPIService:
             }
 
         try:
-            response = await self.client.get(f"{self.base_url}/agents/{agent_id}/analytics")
-            response.raise_for_status()
-            return response.json()
-        except httpx.HTTPStatusError as e:
-            raise HTTPException(
-                status_code=e.response.status_code,
-                detail=f"Lyzr API error: {e.response.text}"
+            response = await self._request(
+                "analytics", "GET", f"{self.base_url}/agents/{agent_id}/analytics", idempotent=True
             )
+            return response.json()
         except Exception as e:
-            raise HTTPException(
-                status_code=500,
-                detail=f"Failed to get agent analytics: {str(e)}"
-            )
+            raise self._upstream_error(e, "get agent analytics")
+
+    def use_shared_cache(self, client, prefix: str) -> None:
+        """Keep chat responses in Redis so every worker shares one cache"""
+        if self.chat_cache is not None:
+            self.shared_cache = RedisCache(client, f"{prefix}:chat", ttl=self.chat_cache.ttl)
+
+    async def _cache_get(self, key) -> Optional[Dict[str, Any]]:
+        if self.shared_cache is not None:
+            return await self.shared_cache.get(key)
+        if self.chat_cache is not None:
+            return self.chat_cache.get(key)
+        return None
+
+    async def _cache_set(self, key, value: Dict[str, Any], tag: str) -> None:
+        if self.shared_cache is not None:
+            await self.shared_cache.set(key, value, tag=tag)
+        elif self.chat_cache is not None:
+            self.chat_cache.set(key, value, tag=tag)
+
+    async def invalidate_agent(self, agent_id: str) -> int:
+        """Drop cached chat responses for an agent"""
+        if self.shared_cache is not None:
+            return await self.shared_cache.invalidate_tag(agent_id)
+        if self.chat_cache is None:
+            return 0
+        return self.chat_cache.invalidate_tag(agent_id)
+
+    def cache_stats(self) -> Dict[str, Any]:
+        """Hit/miss counters of the chat response cache"""
+        if self.shared_cache is not None:
+            return {"enabled": True, **self.shared_cache.stats()}
+        if self.chat_cache is None:
+            return {"enabled": False}
+        return {"enabled": True, **self.chat_cache.stats()}
+
+    def coalescing_stats(self) -> Dict[str, Any]:
+        """How many calls were served by an identical in-flight request"""
+        return {
+            "chat": self.chat_flight.stats(),
+            "analytics": self.analytics_flight.stats(),
+        }
+
+    def pool_stats(self) -> Dict[str, Any]:
+        """Connection pool usage: active, idle and waiting requests.
+
+        httpx does not expose these, so they are read from httpcore's pool
+        internals; counts it no longer provides are reported as None.
+        """
+        pool = getattr(getattr(self.client, "_transport", None), "_pool", None)
+        connections = getattr(pool, "connections", None)
+        idle = _count(connections, "is_idle")
+        waiting = _count(getattr(pool, "_requests", None), "is_queued")
+        return {
+            "http2": self.http2,
+            "max_connections": self.limits.max_connections,
+            "max_keepalive_connections": self.limits.max_keepalive_connections,
+            "keepalive_expiry": self.limits.keepalive_expiry,
+            "connections": len(connections) if connections is not None else None,
+            "active": len(connections) - idle if idle is not None else None,
+            "idle": idle,
+            "waiting": waiting,
+            "closed": self.client.is_closed,
+        }
+
+    def resilience_stats(self) -> Dict[str, Any]:
+        """Circuit breaker state and bulkhead usage per operation"""
+        return {
+            operation: {
+                "circuit": self.breakers[operation].stats(),
+                "bulkhead": self.bulkheads[operation].stats(),
+            }
+            for operation in self.breakers
+        }
 
     async def close(self):
         """Close the HTTP client"""
         await self.client.aclose()
 
 # Global instance
-lyzr_service = LyzrAPIService() 
\ No newline at end of file
+lyzr_service = LyzrAPIService()
+metrics.gauge(
+    "lyzr_requests_in_flight", "Lyzr calls currently holding a bulkhead slot",
+    function=lambda: sum(bulkhead.active for bulkhead in lyzr_service.bulkheads.values()),
+)
@@ -0,0 +1,281 @@
+import asyncio
+import time
+from bisect import bisect_left
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+# Seconds; covers sub-millisecond store reads up to slow upstream calls
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+LabelValues = Tuple[str, ...]
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Metric:
+    """Base class: a named metric with a fixed set of label names"""
+
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+
+    def _key(self, labels: Dict[str, Any]) -> LabelValues:
+        return tuple(str(labels[name]) for name in self.label_names)
+
+    def samples(self) -> List[Tuple[str, str, float]]:
+        """(suffix, formatted labels, value) triples for the exposition output"""
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(f"{self.name}{suffix}{labels} {_format_value(value)}" for suffix, labels, value in self.samples())
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        super().__init__(name, help, labels)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: Any) -> None:
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: Any) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def samples(self):
+        return [("", _format_labels(self.label_names, key), value) for key, value in self._values.items()]
+
+
+class Gauge(Metric):
+    """Gauge set directly, or read from ``function`` at scrape time"""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (),
+                 function: Optional[Callable[[], float]] = None):
+        super().__init__(name, help, labels)
+        self.function = function
+        self._values: Dict[LabelValues, float] = {}
+
+    def set(self, value: float, **labels: Any) -> None:
+        self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1.0, **labels: Any) -> None:
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels: Any) -> None:
+        self.inc(-amount, **labels)
+
+    def value(self, **labels: Any) -> float:
+        if self.function is not None:
+            return self.function()
+        return self._values.get(self._key(labels), 0.0)
+
+    def samples(self):
+        if self.function is not None:
+            return [("", "", self.function())]
+        return [("", _format_labels(self.label_names, key), value) for key, value in self._values.items()]
+
+
+class Histogram(Metric):
+    """Cumulative-bucket histogram with a running sum and count per label set"""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> [per-bucket counts (+Inf last), sum, count]
+        self._series: Dict[LabelValues, list] = {}
+
+    def observe(self, value: float, **labels: Any) -> None:
+        key = self._key(labels)
+        series = self._series.get(key)
+        if series is None:
+            series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+        series[2] += 1
+
+    def count(self, **labels: Any) -> int:
+        series = self._series.get(self._key(labels))
+        return series[2] if series else 0
+
+    def remove(self, **labels: Any) -> bool:
+        """Drop a label set's series, e.g. for an entity that no longer exists"""
+        return self._series.pop(self._key(labels), None) is not None
+
+    def mean(self, **labels: Any) -> Optional[float]:
+        """Average observed value, or None when nothing was observed"""
+        series = self._series.get(self._key(labels))
+        return series[1] / series[2] if series and series[2] else None
+
+    def quantile(self, q: float, **labels: Any) -> Optional[float]:
+        """Upper bucket bound containing the q-quantile (a conservative estimate)"""
+        series = self._series.get(self._key(labels))
+        if not series or not series[2]:
+            return None
+        rank = q * series[2]
+        seen = 0
+        for bound, count in zip(self.buckets + (float("inf"),), series[0]):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+    def samples(self):
+        samples = []
+        for key, (counts, total, count) in self._series.items():
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                samples.append(("_bucket", _format_labels(self.label_names, key, f'le="{_format_value(bound)}"'), cumulative))
+            samples.append(("_sum", _format_labels(self.label_names, key), total))
+            samples.append(("_count", _format_labels(self.label_names, key), count))
+        return samples
+
+
+class MetricsRegistry:
+    """Collection of metrics rendered together in the Prometheus text format"""
+
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"Duplicate metric: {metric.name}")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help: str, labels: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, help, labels))
+
+    def gauge(self, name: str, help: str, labels: Sequence[str] = (),
+              function: Optional[Callable[[], float]] = None) -> Gauge:
+        return self.register(Gauge(name, help, labels, function))
+
+    def histogram(self, name: str, help: str, labels: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, help, labels, buckets))
+
+    def render(self) -> str:
+        return "\n".join(metric.render() for metric in self._metrics.values()) + "\n"
+
+
+class MetricsMiddleware:
+    """ASGI middleware timing every HTTP request by method, route template and status.
+
+    The route template (``/api/agents/{agent_id}``) is used instead of the
+    raw path to keep label cardinality bounded. Streaming responses are
+    timed until their last byte is sent.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        started = time.perf_counter()
+        http_requests_in_flight.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            http_requests_in_flight.dec()
+            route = scope.get("route")
+            http_request_duration.observe(
+                time.perf_counter() - started,
+                method=scope["method"],
+                route=getattr(route, "path", "unmatched"),
+                status=status_code,
+            )
+
+
+class EventLoopLagMonitor:
+    """Background task measuring how late the event loop wakes up from a sleep.
+
+    A loop blocked by CPU-bound work or synchronous I/O delays every request;
+    the overshoot of a fixed ``interval`` sleep is a direct measure of that.
+    """
+
+    def __init__(self, interval: float = 0.5):
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self) -> None:
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, time.perf_counter() - started - self.interval)
+            event_loop_lag.set(lag)
+            event_loop_lag_distribution.observe(lag)
+
+    async def close(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+
+# Global registry and the metrics recorded across the app
+metrics = MetricsRegistry()
+http_request_duration = metrics.histogram(
+    "http_request_duration_seconds", "HTTP request latency by route", ["method", "route", "status"]
+)
+http_requests_in_flight = metrics.gauge("http_requests_in_flight", "HTTP requests currently being handled")
+lyzr_request_duration = metrics.histogram(
+    "lyzr_request_duration_seconds", "Latency of each Lyzr API attempt by operation and outcome",
+    ["operation", "outcome"]
+)
+lyzr_rejections = metrics.counter(
+    "lyzr_requests_rejected_total", "Lyzr calls rejected before reaching the API", ["operation", "reason"]
+)
+# One series per agent: removed when the agent is deleted to keep the series count bounded
+agent_response_duration = metrics.histogram(
+    "agent_response_seconds", "Time to produce a chat reply per agent", ["agent_id"]
+)
+event_loop_lag = metrics.gauge("event_loop_lag_seconds", "Most recent event-loop wake-up delay")
+event_loop_lag_distribution = metrics.histogram(
+    "event_loop_lag_distribution_seconds", "Distribution of event-loop wake-up delays",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+)
+loop_monitor = EventLoopLagMonitor()
@@ -0,0 +1,265 @@
+import asyncio
+import itertools
+import logging
+import os
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import DateTime, bindparam, select
+from sqlalchemy.exc import DBAPIError, OperationalError
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.database import create_engine_from_env
+from app.models import Base, Agent, Ticket, ChatSession, IdCounter
+from services.store import IndexedStore, agents, tickets, chat_sessions
+
+logger = logging.getLogger(__name__)
+
+
+def _to_row(model, record: Dict[str, Any]) -> Dict[str, Any]:
+    """Convert a store record into column values for a model"""
+    row = {}
+    for column in model.__table__.columns:
+        value = record.get(column.name)
+        if isinstance(column.type, DateTime) and isinstance(value, str):
+            value = datetime.fromisoformat(value)
+        row[column.name] = value
+    return row
+
+
+def _to_record(model, row) -> Dict[str, Any]:
+    """Convert a database row back into a store record"""
+    record = {}
+    for column in model.__table__.columns:
+        value = row._mapping[column.name]
+        if isinstance(value, datetime):
+            value = value.isoformat()
+        record[column.name] = value
+    return record
+
+
+def _is_transient(error: Exception) -> bool:
+    """Whether a failed write may succeed later (the database is unreachable or busy)"""
+    if isinstance(error, (OperationalError, OSError, asyncio.TimeoutError)):
+        return True
+    return isinstance(error, DBAPIError) and error.connection_invalidated
+
+
+class SQLPersistence:
+    """Durable SQL copy of the agent, ticket and chat-session stores.
+
+    Requests keep reading and writing the in-memory stores. Every store write
+    is turned into a row operation and buffered; a background task flushes
+    the buffer in batches (one transaction, executemany per run of
+    same-kind operations), so chat responses never wait on the database.
+    On startup the stores are loaded back from the tables. Each flush also
+    saves every store's id counter to ``id_counters``, and loading restores
+    it, so ids of records deleted before a restart are not handed out again.
+
+    A failed flush is retried with the operations kept in order. After
+    ``max_retries`` failures in a row, the operations are written one per
+    transaction instead: an operation that still fails on its own (a row
+    the database rejects) is logged and dropped, so it cannot hold up every
+    later write. If the database is unreachable, the operations are kept.
+    """
+
+    def __init__(self, engine: Optional[AsyncEngine], stores: Dict[Any, IndexedStore],
+                 batch_size: int = 500, flush_interval: float = 0.05, auto_create: bool = False,
+                 max_retries: int = 5):
+        self.engine = engine
+        self.stores = stores
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.auto_create = auto_create
+        self.max_retries = max_retries
+        self._pending: List[Tuple[Any, str, Dict[str, Any]]] = []
+        # Id counters as last saved, by table name
+        self._counters: Dict[str, int] = {}
+        self._wake: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._loaded = False
+        self._stopping = False
+        # Flushes failed in a row
+        self._failures = 0
+        self.rows_written = 0
+        self.batches = 0
+        self.errors = 0
+        self.dropped = 0
+        self.last_flush_ms = 0.0
+
+    @property
+    def enabled(self) -> bool:
+        return self.engine is not None
+
+    async def start(self) -> None:
+        """Create tables if configured, load the stores and start the flush loop"""
+        if not self.enabled:
+            return
+        if not self._loaded:
+            if self.auto_create:
+                async with self.engine.begin() as conn:
+                    await conn.run_sync(Base.metadata.create_all)
+            await self.load()
+            # Subscribe only after loading so the loaded rows are not written back;
+            # writes replayed from other workers were persisted by those workers
+            for model, store in self.stores.items():
+                store.subscribe(self._listener(model), include_remote=False)
+            self._loaded = True
+        self._stopping = False
+        self._wake = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def load(self) -> None:
+        """Fill the in-memory stores from the database"""
+        async with self.engine.connect() as conn:
+            for model, store in self.stores.items():
+                table = model.__table__
+                result = await conn.execute(select(table).order_by(table.c.created_at, table.c.id))
+                count = store.load(_to_record(model, row) for row in result)
+                logger.info("Loaded %d rows from %s", count, table.name)
+            result = await conn.execute(select(IdCounter.__table__))
+            self._counters = {row.name: row.value for row in result}
+            for model, store in self.stores.items():
+                store.advance_counter(self._counters.get(model.__tablename__, 0))
+
+    def _listener(self, model):
+        def on_write(op: str, old: Optional[Dict[str, Any]], new: Optional[Dict[str, Any]]) -> None:
+            self._pending.append((model, op, _to_row(model, new) if new is not None else {"id": old["id"]}))
+            if len(self._pending) >= self.batch_size and self._wake is not None:
+                self._wake.set()
+        return on_write
+
+    async def _run(self) -> None:
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            await self.flush()
+
+    async def flush(self) -> None:
+        """Write all buffered operations and changed id counters in one transaction"""
+        if not self.enabled:
+            return
+        counters = self._changed_counters()
+        if not self._pending and not counters:
+            return
+        pending, self._pending = self._pending, []
+        started = time.perf_counter()
+        try:
+            async with self.engine.begin() as conn:
+                await self._write(conn, pending)
+                await self._write_counters(conn, counters)
+        except Exception:
+            self.errors += 1
+            self._failures += 1
+            if self._failures < self.max_retries:
+                # Keep the operations so the next flush retries them in order
+                self._pending = pending + self._pending
+                logger.exception("Failed to flush %d operations to the database", len(pending))
+                return
+            logger.exception("Failed to flush %d operations to the database %d times in a row; "
+                             "writing them one at a time", len(pending), self._failures)
+            await self._write_each(pending)
+            return
+        self._failures = 0
+        self._counters.update(counters)
+        self.rows_written += len(pending)
+        self.batches += 1
+        self.last_flush_ms = (time.perf_counter() - started) * 1000
+
+    async def _write(self, conn, operations: List[Tuple[Any, str, Dict[str, Any]]]) -> None:
+        for (model, op), group in itertools.groupby(operations, key=lambda item: (item[0], item[1])):
+            table = model.__table__
+            rows = [row for _, _, row in group]
+            if op == "insert":
+                await conn.execute(table.insert(), rows)
+            elif op == "update":
+                columns = [column.name for column in table.columns if column.name != "id"]
+                statement = (
+                    table.update()
+                    .where(table.c.id == bindparam("row_id"))
+                    .values({name: bindparam(f"new_{name}") for name in columns})
+                )
+                await conn.execute(statement, [
+                    {"row_id": row["id"], **{f"new_{name}": row[name] for name in columns}}
+                    for row in rows
+                ])
+            else:
+                await conn.execute(
+                    table.delete().where(table.c.id == bindparam("row_id")),
+                    [{"row_id": row["id"]} for row in rows]
+                )
+
+    def _changed_counters(self) -> Dict[str, int]:
+        return {
+            model.__tablename__: store.id_counter
+            for model, store in self.stores.items()
+            if store.id_counter > self._counters.get(model.__tablename__, 0)
+        }
+
+    async def _write_counters(self, conn, counters: Dict[str, int]) -> None:
+        table = IdCounter.__table__
+        for name, value in counters.items():
+            if name in self._counters:
+                await conn.execute(table.update().where(table.c.name == name).values(value=value))
+            else:
+                await conn.execute(table.insert().values(name=name, value=value))
+
+    async def _write_each(self, pending: List[Tuple[Any, str, Dict[str, Any]]]) -> None:
+        """Write operations one per transaction, dropping those the database rejects"""
+        for position, (model, op, row) in enumerate(pending):
+            try:
+                async with self.engine.begin() as conn:
+                    await self._write(conn, [(model, op, row)])
+            except Exception as e:
+                if _is_transient(e):
+                    # Not the rows' fault: keep this and the following operations
+                    self._pending = pending[position:] + self._pending
+                    return
+                self.dropped += 1
+                logger.error("Dropped %s of %s %s, rejected by the database: %s",
+                             op, model.__tablename__, row["id"], e)
+                continue
+            self.rows_written += 1
+        self._failures = 0
+
+    async def close(self) -> None:
+        """Stop the flush loop, write what is left and release the pool"""
+        if self._task is not None:
+            # Let the loop finish its current flush rather than cancelling it mid-transaction
+            self._stopping = True
+            self._wake.set()
+            await self._task
+            self._task = None
+        if self.enabled:
+            await self.flush()
+            await self.engine.dispose()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "pending": len(self._pending),
+            "rows_written": self.rows_written,
+            "batches": self.batches,
+            "errors": self.errors,
+            "dropped": self.dropped,
+            "last_flush_ms": round(self.last_flush_ms, 3),
+        }
+
+
+def _auto_create_default() -> str:
+    return "true" if os.getenv("DATABASE_URL", "").startswith("sqlite") else "false"
+
+
+# Global instance (disabled when DATABASE_URL is not set)
+persistence = SQLPersistence(
+    create_engine_from_env(),
+    {Agent: agents, Ticket: tickets, ChatSession: chat_sessions},
+    batch_size=int(os.getenv("DB_BATCH_SIZE", "500")),
+    flush_interval=float(os.getenv("DB_FLUSH_INTERVAL", "0.05")),
+    auto_create=os.getenv("DB_AUTO_CREATE", _auto_create_default()).lower() == "true",
+    max_retries=int(os.getenv("DB_MAX_RETRIES", "5")),
+)
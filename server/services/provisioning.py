@@ -0,0 +1,256 @@
+import asyncio
+import logging
+import os
+from collections import deque
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional
+
+from fastapi import HTTPException
+
+from services.agent_configs import agent_definition
+from services.lyzr_api import LyzrAPIService, lyzr_service
+from services.metrics import metrics
+from services.store import IndexedStore, agents, provisioning_jobs
+
+logger = logging.getLogger(__name__)
+
+# Takes a named lease for ``ttl`` seconds; True if this process got it
+Lease = Callable[[str, float], Awaitable[bool]]
+
+# Agent states; only READY agents take chats. FAILED is also a job state
+PROVISIONING, READY, FAILED = "provisioning", "ready", "failed"
+# Job states
+QUEUED, RUNNING, SUCCEEDED, CANCELLED = "queued", "running", "succeeded", "cancelled"
+JOB_STATES = (QUEUED, RUNNING, SUCCEEDED, FAILED, CANCELLED)
+
+
+class ProvisioningQueue:
+    """Background worker pool creating and updating agents in Lyzr.
+
+    ``submit`` records a job and returns at once; ``concurrency`` workers
+    send the agent's definition to Lyzr and write the outcome back to the
+    agent and the job record, so the store listeners (dashboard events,
+    config cache, persistence, other workers) see each step. A new agent
+    stays PROVISIONING until Lyzr returns its id, then turns READY, or
+    FAILED if the call failed after the client's own retries.
+
+    Jobs of the same agent run one at a time and read the definition from
+    the agent record when they run, so a change submitted while a job of
+    the agent is still queued rides along with it instead of adding a
+    call, and a change made while the agent is being created is sent once
+    it exists. Before ``start()`` (or after ``close()``) jobs run inline,
+    so scripts and tests that never run the app lifespan still provision
+    their agents.
+
+    Jobs are not persisted, so ``start()`` resubmits the agents a stopped
+    process left PROVISIONING (see ``recover``). When several workers share
+    state, ``lease`` is set to a shared lock so that only one of the workers
+    starting together resubmits each agent.
+    """
+
+    def __init__(self, agents: IndexedStore, jobs: IndexedStore, lyzr: LyzrAPIService,
+                 concurrency: int = 4, maxsize: int = 10000, retain: int = 10000, stale_after: float = 600):
+        self.agents = agents
+        self.jobs = jobs
+        self.lyzr = lyzr
+        self.concurrency = concurrency
+        self.maxsize = maxsize
+        self.retain = retain
+        self.stale_after = stale_after
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+        # agent id -> its job waiting to run, if any
+        self._queued: Dict[str, str] = {}
+        # agent id -> [lock, jobs holding or waiting for it]
+        self._locks: Dict[str, List[Any]] = {}
+        self._finished: Deque[str] = deque()
+        self.lease: Optional[Lease] = None
+        self.submitted = 0
+        self.coalesced = 0
+        self.recovered = 0
+
+    @property
+    def depth(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    async def start(self) -> None:
+        if not self._workers:
+            self._queue = asyncio.Queue(maxsize=self.maxsize)
+            self._workers = [asyncio.create_task(self._run()) for _ in range(self.concurrency)]
+            await self.recover()
+
+    async def recover(self) -> int:
+        """Resubmit agents left PROVISIONING by a process that stopped mid-job.
+
+        An agent is left alone while one of its jobs is queued or running
+        and was updated within ``stale_after`` seconds: with shared state
+        that job may belong to another worker that is still working on it.
+        Older unfinished jobs are marked failed and replaced. Each agent is
+        resubmitted only by the worker holding its recovery lease (for
+        ``stale_after`` seconds), since another worker's job may not have
+        reached this one yet. Returns the number of agents resubmitted.
+        """
+        cutoff = (datetime.now() - timedelta(seconds=self.stale_after)).isoformat()
+        recovered = 0
+        for agent in self.agents.values():
+            if agent.get("status") != PROVISIONING:
+                continue
+            active = False
+            for job in self.jobs.find(agent_id=agent["id"]):
+                if job["status"] not in (QUEUED, RUNNING):
+                    continue
+                if job["updated_at"] >= cutoff:
+                    active = True
+                else:
+                    self._set_status(job["id"], FAILED, error="Abandoned by a stopped worker")
+            if active:
+                continue
+            if self.lease is not None and not await self.lease(f"recover:{agent['id']}", self.stale_after):
+                continue
+            await self.submit(agent)
+            recovered += 1
+        if recovered:
+            logger.info("Resubmitted %d agents left provisioning by a previous run", recovered)
+        self.recovered += recovered
+        return recovered
+
+    async def submit(self, agent: Dict[str, Any]) -> Dict[str, Any]:
+        """Queue sending the agent's definition to Lyzr and return the job record.
+
+        Agents without a Lyzr id are created, the others updated.
+        """
+        queued = self.jobs.get(self._queued.get(agent["id"], ""))
+        if queued is not None:
+            # The queued job will send the latest definition
+            self.coalesced += 1
+            return queued
+        kind = "update" if agent.get("lyzr_agent_id") else "create"
+        now = datetime.now().isoformat()
+        job = self.jobs.insert({
+            "id": await self.jobs.allocate_id(),
+            "type": kind,
+            "agent_id": agent["id"],
+            "user_id": agent.get("user_id"),
+            "status": QUEUED,
+            "lyzr_agent_id": None,
+            "error": None,
+            "created_at": now,
+            "updated_at": now,
+        })
+        self.submitted += 1
+        jobs_submitted.inc(type=kind)
+        if not self._workers:
+            await self._execute(job["id"])
+            return self.jobs.get(job["id"])
+        self._queued[agent["id"]] = job["id"]
+        await self._queue.put(job["id"])
+        return job
+
+    async def _run(self) -> None:
+        while True:
+            job_id = await self._queue.get()
+            try:
+                await self._execute(job_id)
+            except Exception:
+                logger.exception("Provisioning job %s failed unexpectedly", job_id)
+            finally:
+                self._queue.task_done()
+
+    async def _execute(self, job_id: str) -> None:
+        job = self.jobs.get(job_id)
+        if job is None:
+            return
+        agent_id = job["agent_id"]
+        entry = self._locks.get(agent_id)
+        if entry is None:
+            entry = self._locks[agent_id] = [asyncio.Lock(), 0]
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                # Until now changes could still join this job
+                if self._queued.get(agent_id) == job_id:
+                    del self._queued[agent_id]
+                await self._provision(job_id, agent_id)
+        finally:
+            entry[1] -= 1
+            if not entry[1]:
+                del self._locks[agent_id]
+
+    async def _provision(self, job_id: str, agent_id: str) -> None:
+        agent = self.agents.get(agent_id)
+        if agent is None:
+            self._set_status(job_id, CANCELLED, error="Agent was deleted")
+            return
+        creating = not agent.get("lyzr_agent_id")
+        self._set_status(job_id, RUNNING, type="create" if creating else "update")
+        definition = agent_definition(agent)
+        try:
+            if creating:
+                lyzr_agent = await self.lyzr.create_agent(definition)
+            else:
+                lyzr_agent = await self.lyzr.update_agent(agent["lyzr_agent_id"], definition)
+        except Exception as e:
+            detail = e.detail if isinstance(e, HTTPException) else str(e)
+            if creating and self.agents.get(agent_id) is not None:
+                self.agents.update(agent_id, {"status": FAILED, "updated_at": datetime.now().isoformat()})
+            self._set_status(job_id, FAILED, error=str(detail))
+            return
+        lyzr_agent_id = lyzr_agent.get("id")
+        if self.agents.get(agent_id) is None:
+            # Deleted while Lyzr was creating it: do not leave the upstream agent behind
+            if creating and lyzr_agent_id:
+                await self.lyzr.delete_agent(lyzr_agent_id)
+            self._set_status(job_id, CANCELLED, error="Agent was deleted")
+            return
+        self.agents.update(agent_id, {
+            "lyzr_agent_id": lyzr_agent_id,
+            "status": READY,
+            "updated_at": datetime.now().isoformat(),
+        })
+        self._set_status(job_id, SUCCEEDED, lyzr_agent_id=lyzr_agent_id)
+
+    def _set_status(self, job_id: str, status: str, **changes: Any) -> None:
+        self.jobs.update(job_id, {"status": status, "updated_at": datetime.now().isoformat(), **changes})
+        if status == RUNNING:
+            return
+        jobs_finished.inc(status=status)
+        # Keep the outcome of the latest finished jobs only
+        self._finished.append(job_id)
+        while len(self._finished) > self.retain:
+            self.jobs.delete(self._finished.popleft())
+
+    async def close(self) -> None:
+        """Finish the queued jobs and stop the workers"""
+        if not self._workers:
+            return
+        await self._queue.join()
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        self._queue = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "workers": len(self._workers),
+            "depth": self.depth,
+            "submitted": self.submitted,
+            "coalesced": self.coalesced,
+            "recovered": self.recovered,
+            **{status: self.jobs.count(status=status) for status in JOB_STATES},
+        }
+
+
+jobs_submitted = metrics.counter("provisioning_jobs_total", "Agent provisioning jobs submitted by type", ["type"])
+jobs_finished = metrics.counter("provisioning_jobs_finished_total", "Agent provisioning jobs finished by outcome", ["status"])
+
+# Global instance shared by all endpoints
+provisioning = ProvisioningQueue(
+    agents, provisioning_jobs, lyzr_service,
+    concurrency=int(os.getenv("PROVISIONING_CONCURRENCY", "4")),
+    maxsize=int(os.getenv("PROVISIONING_QUEUE_SIZE", "10000")),
+    retain=int(os.getenv("PROVISIONING_JOBS_RETAINED", "10000")),
+    stale_after=float(os.getenv("PROVISIONING_STALE_AFTER", "600")),
+)
+metrics.gauge("provisioning_queue_depth", "Agent provisioning jobs waiting for a worker",
+              function=lambda: provisioning.depth)
@@ -0,0 +1,183 @@
+import asyncio
+import math
+import os
+import time
+from typing import Any, Callable, Dict, List, Sequence, Tuple
+
+from fastapi import HTTPException
+
+from services.metrics import metrics
+
+
+class RateLimitedError(HTTPException):
+    """429 with a Retry-After header, raised before any work is done for the request"""
+
+    def __init__(self, scope: str, retry_after: float):
+        super().__init__(
+            status_code=429,
+            detail=f"Rate limit exceeded for {scope}",
+            headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+        )
+        self.scope = scope
+        self.retry_after = retry_after
+
+
+class TokenBucketLimiter:
+    """Token bucket per key: ``rate`` tokens a second up to ``burst`` saved up.
+
+    Buckets live in a dict kept in least-recently-used order; beyond
+    ``max_keys`` the least recently used one is dropped, which only ever
+    forgives that key's debt. A rate of 0 disables the limiter.
+    """
+
+    def __init__(self, name: str, rate: float, burst: float, max_keys: int = 100_000,
+                 clock: Callable[[], float] = time.monotonic):
+        self.name = name
+        self.rate = rate
+        self.burst = max(burst, 1.0)
+        self.max_keys = max_keys
+        self._clock = clock
+        # key -> [tokens, time of last refill]
+        self._buckets: Dict[str, List[float]] = {}
+        self.allowed = 0
+        self.rejected = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.rate > 0
+
+    def wait_time(self, key: str, cost: float = 1.0) -> float:
+        """Seconds until ``cost`` tokens are available for the key (0 when they are now)"""
+        bucket = self._refill(key)
+        return 0.0 if bucket[0] >= cost else (cost - bucket[0]) / self.rate
+
+    def take(self, key: str, cost: float = 1.0) -> None:
+        """Spend tokens; call after ``wait_time`` returned 0"""
+        self._buckets[key][0] -= cost
+        self.allowed += 1
+
+    def _refill(self, key: str) -> List[float]:
+        now = self._clock()
+        bucket = self._buckets.pop(key, None)
+        if bucket is None:
+            bucket = [self.burst, now]
+            if len(self._buckets) >= self.max_keys:
+                del self._buckets[next(iter(self._buckets))]
+        else:
+            bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+        # Re-inserting moves the key to the most recently used end
+        self._buckets[key] = bucket
+        return bucket
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "rate": self.rate,
+            "burst": self.burst,
+            "keys": len(self._buckets),
+            "allowed": self.allowed,
+            "rejected": self.rejected,
+        }
+
+
+class AdmissionControl:
+    """Checks a request against several limiters and charges all of them or none.
+
+    ``admit`` raises RateLimitedError naming the first exhausted scope, with
+    the longest wait among them as Retry-After, so a rejected request never
+    consumes another scope's tokens. A request doing the work of several
+    (a bulk create) passes a cost and is charged that many tokens at once.
+    """
+
+    def __init__(self, limiters: Sequence[TokenBucketLimiter]):
+        self.limiters = {limiter.name: limiter for limiter in limiters}
+
+    def admit(self, keys: Sequence[Tuple[Any, ...]]) -> None:
+        """Charge each (limiter name, key) or (limiter name, key, cost) entry or raise 429.
+
+        A cost above the limiter's burst could never be admitted and is
+        rejected with 400 instead.
+        """
+        checks, waits = self._check(keys)
+        if waits:
+            self._reject(waits)
+        self._take(checks)
+
+    async def acquire(self, keys: Sequence[Tuple[Any, ...]], max_wait: float) -> None:
+        """Like ``admit``, but wait up to ``max_wait`` seconds for the tokens before raising 429.
+
+        For work that can be paced rather than refused, such as the items
+        of a batch; only a request that gives up counts as rejected.
+        """
+        remaining = max_wait
+        while True:
+            checks, waits = self._check(keys)
+            if not waits:
+                self._take(checks)
+                return
+            wait = max(wait for _, wait in waits)
+            if wait > remaining:
+                self._reject(waits)
+            await asyncio.sleep(wait)
+            remaining -= wait
+
+    def _check(self, keys: Sequence[Tuple[Any, ...]]) -> Tuple[List[Tuple[TokenBucketLimiter, str, float]],
+                                                            List[Tuple[TokenBucketLimiter, float]]]:
+        """(limiter, key, cost) to charge and (limiter, wait) of the exhausted scopes"""
+        checks = []
+        waits = []
+        for name, key, *rest in keys:
+            cost = rest[0] if rest else 1.0
+            limiter = self.limiters[name]
+            if key is None or not limiter.enabled:
+                continue
+            if cost > limiter.burst:
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"Request needs {cost:g} {name} tokens but at most {limiter.burst:g} are allowed at once",
+                )
+            wait = limiter.wait_time(key, cost)
+            if wait > 0:
+                waits.append((limiter, wait))
+            checks.append((limiter, key, cost))
+        return checks, waits
+
+    @staticmethod
+    def _reject(waits: List[Tuple[TokenBucketLimiter, float]]) -> None:
+        for limiter, _ in waits:
+            limiter.rejected += 1
+            rate_limited.inc(scope=limiter.name)
+        raise RateLimitedError(waits[0][0].name, max(wait for _, wait in waits))
+
+    @staticmethod
+    def _take(checks: List[Tuple[TokenBucketLimiter, str, float]]) -> None:
+        for limiter, key, cost in checks:
+            limiter.take(key, cost)
+
+    def stats(self) -> Dict[str, Any]:
+        return {name: limiter.stats() for name, limiter in self.limiters.items()}
+
+
+def _limiter(name: str, env: str, rate: str, burst: str) -> TokenBucketLimiter:
+    return TokenBucketLimiter(
+        name,
+        rate=float(os.getenv(f"RATE_LIMIT_{env}_RATE", rate)),
+        burst=float(os.getenv(f"RATE_LIMIT_{env}_BURST", burst)),
+    )
+
+
+rate_limited = metrics.counter("rate_limited_total", "Requests rejected with 429 by scope", ["scope"])
+
+# Global instance; limits are per worker process, so divide by the worker count for global caps
+admission = AdmissionControl([
+    _limiter("session", "SESSION", "1", "10"),
+    # Items of POST /api/chat/batch, per session, in place of "session"
+    _limiter("batch", "BATCH", "10", "100"),
+    _limiter("agent", "AGENT", "50", "100"),
+    _limiter("user", "USER", "100", "200"),
+    _limiter("agent_create", "AGENT_CREATE", "0.2", "10"),
+    # Agents created through POST /api/agents/bulk, per user, in place of "agent_create";
+    # the burst defaults to the bulk size limit so one full bulk is always admissible
+    _limiter("agent_bulk", "AGENT_BULK", "5", os.getenv("AGENT_BULK_MAX_ITEMS", "1000")),
+])
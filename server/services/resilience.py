@@ -0,0 +1,164 @@
+import asyncio
+import random
+import time
+from typing import Any, Callable, Dict, Iterable, Optional
+
+import httpx
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling upstream while a circuit breaker is open"""
+
+
+class BulkheadFullError(Exception):
+    """Raised when no concurrency slot frees up within the bulkhead's wait limit"""
+
+
+def is_upstream_failure(exc: BaseException) -> bool:
+    """Whether an error says something about upstream health (vs. a bad request)"""
+    if isinstance(exc, httpx.HTTPStatusError):
+        return exc.response.status_code >= 500 or exc.response.status_code == 429
+    return isinstance(exc, httpx.TransportError)
+
+
+class RetryPolicy:
+    """Exponential backoff with full jitter.
+
+    Errors raised before the request reached upstream (connect failures,
+    pool timeouts) are always retried. Other transport errors and
+    429/502/503/504 responses are retried only for idempotent calls.
+    """
+
+    def __init__(self, attempts: int = 3, base_delay: float = 0.1, max_delay: float = 2.0,
+                 retry_statuses: Iterable[int] = (429, 502, 503, 504)):
+        self.attempts = attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.retry_statuses = set(retry_statuses)
+
+    def should_retry(self, exc: BaseException, attempt: int, idempotent: bool) -> bool:
+        if attempt + 1 >= self.attempts:
+            return False
+        if isinstance(exc, (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)):
+            return True
+        if not idempotent:
+            return False
+        if isinstance(exc, httpx.HTTPStatusError):
+            return exc.response.status_code in self.retry_statuses
+        return isinstance(exc, httpx.TransportError)
+
+    def backoff(self, attempt: int) -> float:
+        """Delay before retry number ``attempt + 1``"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+
+class CircuitBreaker:
+    """Fail fast after repeated upstream failures.
+
+    After ``failure_threshold`` consecutive failures the circuit opens and
+    calls are rejected for ``reset_timeout`` seconds. Then a single probe is
+    let through (half-open): success closes the circuit, failure reopens it.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0,
+                 clock: Callable[[], float] = time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probe_started_at = 0.0
+        self._probing = False
+        self.rejected = 0
+        self.times_opened = 0
+
+    def allow(self) -> bool:
+        """Whether a call may go upstream now"""
+        now = self._clock()
+        if self.state == self.OPEN and now - self.opened_at >= self.reset_timeout:
+            self.state = self.HALF_OPEN
+            self._probing = False
+        if self.state == self.CLOSED:
+            return True
+        # A probe that never reported back (e.g. cancelled) is replaced after reset_timeout
+        if self.state == self.HALF_OPEN and (not self._probing or now - self.probe_started_at >= self.reset_timeout):
+            self._probing = True
+            self.probe_started_at = now
+            return True
+        self.rejected += 1
+        return False
+
+    def record_success(self) -> None:
+        self.state = self.CLOSED
+        self.failures = 0
+        self._probing = False
+
+    def record(self, exc: Optional[BaseException] = None) -> None:
+        """Record the outcome of a call; only upstream failures count against the circuit"""
+        if exc is not None and is_upstream_failure(exc):
+            self.record_failure()
+        else:
+            self.record_success()
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            if self.state != self.OPEN:
+                self.times_opened += 1
+            self.state = self.OPEN
+            self.opened_at = self._clock()
+            self._probing = False
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.failures,
+            "rejected": self.rejected,
+            "times_opened": self.times_opened,
+        }
+
+
+class Bulkhead:
+    """Concurrency cap for one class of upstream calls.
+
+    Used as ``async with bulkhead:``; waits at most ``max_wait`` seconds for
+    a free slot and raises BulkheadFullError otherwise, so a backlog of slow
+    calls of one kind cannot tie up every coroutine in the process.
+    """
+
+    def __init__(self, limit: int, max_wait: float = 2.0):
+        self.limit = limit
+        self.max_wait = max_wait
+        self._semaphore = asyncio.Semaphore(limit)
+        self.active = 0
+        self.waiting = 0
+        self.rejected = 0
+
+    async def __aenter__(self) -> "Bulkhead":
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), timeout=self.max_wait)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            raise BulkheadFullError(f"more than {self.limit} concurrent calls")
+        finally:
+            self.waiting -= 1
+        self.active += 1
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        self.active -= 1
+        self._semaphore.release()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "limit": self.limit,
+            "active": self.active,
+            "waiting": self.waiting,
+            "rejected": self.rejected,
+        }
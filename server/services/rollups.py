@@ -0,0 +1,294 @@
+import math
+import os
+from bisect import bisect_left, insort
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from services.store import IndexedStore, tickets, chat_sessions
+
+# Bucket width in seconds per resolution
+RESOLUTIONS = {"minute": 60, "hour": 3_600, "day": 86_400}
+# Key of the buckets summed over every agent
+ALL_AGENTS = "*"
+# Timestamps are naive ISO strings; buckets are aligned on this naive epoch
+EPOCH = datetime(1970, 1, 1)
+
+
+def _seconds(timestamp: Optional[str]) -> Optional[float]:
+    if not timestamp:
+        return None
+    return (datetime.fromisoformat(timestamp).replace(tzinfo=None) - EPOCH).total_seconds()
+
+
+def bucket_time(start: int) -> str:
+    """ISO timestamp of a bucket start"""
+    return (EPOCH + timedelta(seconds=start)).isoformat()
+
+
+class LatencySketch:
+    """Mergeable latency histogram with logarithmic bins (about 2% relative error).
+
+    Quantiles merged across any number of buckets keep the same relative
+    accuracy, which a stored average or percentile could not offer.
+    """
+
+    __slots__ = ("bins", "count", "total")
+
+    GAMMA = 1.04
+    _LOG_GAMMA = math.log(GAMMA)
+    # Values below a microsecond share the lowest bin
+    MIN_VALUE = 1e-6
+
+    def __init__(self):
+        self.bins: Dict[int, int] = {}
+        self.count = 0
+        self.total = 0.0
+
+    @classmethod
+    def bin_of(cls, value: float) -> int:
+        return math.ceil(math.log(max(value, cls.MIN_VALUE)) / cls._LOG_GAMMA)
+
+    def add(self, value: float, weight: int = 1, index: Optional[int] = None) -> None:
+        """Count a value; pass ``index=bin_of(value)`` when adding it to many sketches"""
+        if index is None:
+            index = self.bin_of(value)
+        count = self.bins.get(index, 0) + weight
+        if count:
+            self.bins[index] = count
+        else:
+            del self.bins[index]
+        self.count += weight
+        self.total += value * weight
+
+    def merge(self, other: "LatencySketch") -> None:
+        for index, count in other.bins.items():
+            self.bins[index] = self.bins.get(index, 0) + count
+        self.count += other.count
+        self.total += other.total
+
+    def mean(self) -> Optional[float]:
+        return self.total / self.count if self.count else None
+
+    def quantile(self, q: float) -> Optional[float]:
+        if self.count <= 0:
+            return None
+        rank = q * (self.count - 1)
+        seen = 0
+        for index in sorted(self.bins):
+            seen += self.bins[index]
+            if seen > rank:
+                # Midpoint of the bin (GAMMA^(i-1), GAMMA^i]
+                return 2 * self.GAMMA ** index / (self.GAMMA + 1)
+        return self.GAMMA ** max(self.bins)
+
+
+class Bucket:
+    """Counters of one agent (or all agents) over one time bucket"""
+
+    __slots__ = ("chats", "confidence_sum", "tickets_created", "tickets_resolved", "latency")
+
+    def __init__(self):
+        self.chats = 0
+        self.confidence_sum = 0.0
+        self.tickets_created = 0
+        self.tickets_resolved = 0
+        self.latency = LatencySketch()
+
+    def merge(self, other: "Bucket") -> None:
+        self.chats += other.chats
+        self.confidence_sum += other.confidence_sum
+        self.tickets_created += other.tickets_created
+        self.tickets_resolved += other.tickets_resolved
+        self.latency.merge(other.latency)
+
+    def summary(self) -> Dict[str, Any]:
+        latency_avg = self.latency.mean()
+        latency_p95 = self.latency.quantile(0.95)
+        return {
+            "chats": self.chats,
+            "average_confidence": round(self.confidence_sum / self.chats, 4) if self.chats else 0.0,
+            "tickets_created": self.tickets_created,
+            "tickets_resolved": self.tickets_resolved,
+            "response_time_avg": round(latency_avg, 4) if latency_avg is not None else None,
+            "response_time_p95": round(latency_p95, 4) if latency_p95 is not None else None,
+        }
+
+
+class Series:
+    """One agent's buckets at one resolution, with their starts kept sorted for pruning"""
+
+    __slots__ = ("buckets", "starts")
+
+    def __init__(self):
+        self.buckets: Dict[int, Bucket] = {}
+        self.starts: List[int] = []
+
+    def __len__(self) -> int:
+        return len(self.buckets)
+
+    def get(self, start: int) -> Optional[Bucket]:
+        return self.buckets.get(start)
+
+    def add(self, start: int) -> Bucket:
+        bucket = self.buckets[start] = Bucket()
+        # Almost always the newest start, so this is an append
+        insort(self.starts, start)
+        return bucket
+
+    def prune(self, cutoff: float) -> int:
+        """Drop the buckets starting before ``cutoff``; returns how many"""
+        count = bisect_left(self.starts, cutoff)
+        for start in self.starts[:count]:
+            del self.buckets[start]
+        del self.starts[:count]
+        return count
+
+
+class Rollups:
+    """Per-agent minute, hour and day buckets maintained from store writes.
+
+    Chat sessions add to the chat count, confidence sum and latency sketch
+    of the buckets of their ``created_at``; tickets count as created in the
+    bucket of ``created_at`` and as resolved in the bucket of the
+    ``updated_at`` that resolved them. Each write touches one bucket per
+    resolution for the agent and one for all agents, so a range query
+    costs one lookup per bucket in the range whatever the history size.
+    Minute and hour buckets older than their retention are dropped; day
+    buckets are kept.
+    """
+
+    def __init__(self, tickets: IndexedStore, chat_sessions: IndexedStore,
+                 retention: Optional[Dict[str, Optional[int]]] = None):
+        # Seconds of history kept per resolution (None keeps everything)
+        self.retention = retention or {"minute": 2 * 86_400, "hour": 90 * 86_400, "day": None}
+        # resolution -> agent id (or ALL_AGENTS) -> Series of buckets by start
+        self._buckets: Dict[str, Dict[str, Series]] = {resolution: {} for resolution in RESOLUTIONS}
+        self._latest = 0.0
+        self.pruned = 0
+        for record in chat_sessions.values():
+            self._on_chat_session("insert", None, record)
+        for record in tickets.values():
+            self._on_ticket("insert", None, record)
+        chat_sessions.subscribe(self._on_chat_session)
+        tickets.subscribe(self._on_ticket)
+
+    def _buckets_at(self, agent_id: Optional[str], timestamp: Optional[str], create: bool = True) -> List[Bucket]:
+        """The buckets of every resolution covering a time, for the agent and for all agents.
+
+        Missing buckets are created when ``create`` is set and the time is
+        within the resolution's retention; otherwise they are left out.
+        """
+        seconds = _seconds(timestamp)
+        if seconds is None:
+            return []
+        if create and seconds > self._latest:
+            self._latest = seconds
+        buckets = []
+        for resolution, width in RESOLUTIONS.items():
+            start = int(seconds // width) * width
+            cutoff = self._cutoff(resolution)
+            by_agent = self._buckets[resolution]
+            for key in (agent_id or "", ALL_AGENTS):
+                series = by_agent.get(key)
+                bucket = series.get(start) if series is not None else None
+                if bucket is None:
+                    if not create or (cutoff is not None and start < cutoff):
+                        continue
+                    if series is None:
+                        series = by_agent[key] = Series()
+                    bucket = series.add(start)
+                    if cutoff is not None:
+                        self.pruned += series.prune(cutoff)
+                buckets.append(bucket)
+        return buckets
+
+    def _cutoff(self, resolution: str) -> Optional[float]:
+        """Time before which a resolution's buckets are dropped (None if they are kept)"""
+        retention = self.retention.get(resolution)
+        return self._latest - retention if retention is not None else None
+
+    def oldest(self, resolution: str) -> Optional[datetime]:
+        """Earliest time still covered at a resolution, or None if nothing is pruned"""
+        retention = self.retention.get(resolution)
+        if retention is None:
+            return None
+        return max(datetime.now(), EPOCH + timedelta(seconds=self._latest)) - timedelta(seconds=retention)
+
+    def _on_chat_session(self, op: str, old: Optional[Dict[str, Any]], new: Optional[Dict[str, Any]]) -> None:
+        if old is not None:
+            self._add_chat(old, -1)
+        if new is not None:
+            self._add_chat(new, 1)
+
+    def _add_chat(self, chat: Dict[str, Any], sign: int) -> None:
+        confidence = chat.get("confidence_score") or 0.0
+        response_time = chat.get("response_time")
+        index = LatencySketch.bin_of(response_time) if response_time is not None else None
+        for bucket in self._buckets_at(chat.get("agent_id"), chat.get("created_at"), create=sign > 0):
+            bucket.chats += sign
+            bucket.confidence_sum += sign * confidence
+            if index is not None:
+                bucket.latency.add(response_time, sign, index)
+
+    def _on_ticket(self, op: str, old: Optional[Dict[str, Any]], new: Optional[Dict[str, Any]]) -> None:
+        if op != "update":
+            ticket, sign = (new, 1) if op == "insert" else (old, -1)
+            for bucket in self._buckets_at(ticket.get("agent_id"), ticket.get("created_at"), create=sign > 0):
+                bucket.tickets_created += sign
+        was_resolved = old is not None and old.get("status") == "resolved"
+        is_resolved = new is not None and new.get("status") == "resolved"
+        if was_resolved and (not is_resolved or op == "delete"):
+            for bucket in self._buckets_at(old.get("agent_id"), old.get("updated_at"), create=False):
+                bucket.tickets_resolved -= 1
+        if is_resolved and not was_resolved:
+            for bucket in self._buckets_at(new.get("agent_id"), new.get("updated_at")):
+                bucket.tickets_resolved += 1
+
+    def series(self, resolution: str, start: datetime, end: datetime,
+               agent_id: Optional[str] = None) -> Dict[str, Any]:
+        """Per-bucket summaries from ``start`` up to (excluding) ``end``, plus their total"""
+        width = RESOLUTIONS[resolution]
+        first = int(_seconds(start.isoformat()) // width) * width
+        last = _seconds(end.isoformat())
+        stored = self._buckets[resolution].get(agent_id or ALL_AGENTS) or Series()
+        points = []
+        total = Bucket()
+        empty = Bucket().summary()
+        at = first
+        while at < last:
+            bucket = stored.get(at)
+            if bucket is None:
+                points.append({"start": bucket_time(at), **empty})
+            else:
+                points.append({"start": bucket_time(at), **bucket.summary()})
+                total.merge(bucket)
+            at += width
+        return {
+            "resolution": resolution,
+            "agent_id": agent_id,
+            "start": bucket_time(first),
+            "end": end.isoformat(),
+            "points": points,
+            "total": total.summary(),
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        stats: Dict[str, Any] = {
+            f"{resolution}_buckets": sum(len(series) for series in by_agent.values())
+            for resolution, by_agent in self._buckets.items()
+        }
+        stats["pruned"] = self.pruned
+        return stats
+
+
+def _retention_env(name: str, default: str) -> Optional[int]:
+    hours = float(os.getenv(name, default))
+    return int(hours * 3600) if hours > 0 else None
+
+
+# Global instance shared by all endpoints
+rollups = Rollups(tickets, chat_sessions, retention={
+    "minute": _retention_env("ROLLUP_MINUTE_RETENTION_HOURS", "48"),
+    "hour": _retention_env("ROLLUP_HOUR_RETENTION_HOURS", "2160"),
+    "day": None,
+})
@@ -0,0 +1,239 @@
+import math
+import re
+from array import array
+from bisect import bisect_left
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from services.store import IndexedStore, id_number, support_requests, tickets
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+# BM25 term-frequency saturation and document-length normalisation
+K1 = 1.2
+B = 0.75
+# Intersection strategy by the number of candidates left: bisect up to BISECT_LIMIT of
+# them, go through a dense array above 1/DENSE_RATIO of the term's postings
+BISECT_LIMIT = 64
+DENSE_RATIO = 16
+
+
+def tokenize(text: str) -> List[str]:
+    """Lower-cased alphanumeric words (``INV-1042`` gives ``inv`` and ``1042``)"""
+    return _TOKEN.findall(text.lower())
+
+
+class TextIndex:
+    """Inverted index over text fields of one store, ranked with BM25.
+
+    Each term maps to two parallel arrays sorted by sequence number: the
+    documents containing it and how often (6 bytes a posting instead of a
+    dict entry, so a million documents fit in tens of MB). The index
+    subscribes to its store: an insert appends to the postings of its
+    terms, and an update or delete diffs the old text against the new one
+    and touches only the postings that changed.
+
+    A query matches documents containing every query term. Starting from
+    the rarest term, the candidates are intersected with each other term's
+    postings and the survivors scored in one vectorised pass, so the cost
+    grows with the postings of the query terms, not with the number of
+    documents.
+    """
+
+    def __init__(self, store: IndexedStore, fields: Iterable[str]):
+        self.store = store
+        self.fields = list(fields)
+        # term -> (sequence numbers, term frequencies)
+        self._postings: Dict[str, Tuple[array, array]] = {}
+        # Token count per sequence number (0 for missing or empty documents)
+        self._lengths = np.zeros(1024, dtype=np.float32)
+        self.documents = 0
+        self.total_length = 0
+        self.postings = 0
+        for record in store.values():
+            self._on_write("insert", None, record)
+        store.subscribe(self._on_write)
+
+    def _terms(self, record: Optional[Dict[str, Any]]) -> Dict[str, int]:
+        if record is None:
+            return {}
+        return Counter(tokenize(" ".join([record.get(field) or "" for field in self.fields])))
+
+    def _on_write(self, op: str, old: Optional[Dict[str, Any]], new: Optional[Dict[str, Any]]) -> None:
+        before, after = self._terms(old), self._terms(new)
+        if before == after:
+            return
+        seq = id_number((new or old)["id"])
+        if seq is None:
+            return
+        for term in before:
+            if term not in after:
+                self._remove(term, seq)
+        postings = self._postings
+        for term, count in after.items():
+            if before.get(term) == count:
+                continue
+            entry = postings.get(term)
+            # New documents have the highest sequence numbers: appending is the common case
+            if entry is not None and entry[0][-1] < seq:
+                entry[0].append(seq)
+                entry[1].append(count if count < 0xFFFF else 0xFFFF)
+                self.postings += 1
+            else:
+                self._add(term, seq, count)
+        length_before, length_after = sum(before.values()), sum(after.values())
+        self.documents += bool(length_after) - bool(length_before)
+        self.total_length += length_after - length_before
+        if seq >= len(self._lengths):
+            grown = np.zeros(max(seq + 1, len(self._lengths) * 2), dtype=np.float32)
+            grown[:len(self._lengths)] = self._lengths
+            self._lengths = grown
+        self._lengths[seq] = length_after
+
+    def _add(self, term: str, seq: int, count: int) -> None:
+        count = min(count, 0xFFFF)
+        postings = self._postings.get(term)
+        if postings is None:
+            self._postings[term] = (array("I", [seq]), array("H", [count]))
+            self.postings += 1
+            return
+        seqs, counts = postings
+        position = bisect_left(seqs, seq)
+        if position < len(seqs) and seqs[position] == seq:
+            counts[position] = count
+        else:
+            seqs.insert(position, seq)
+            counts.insert(position, count)
+            self.postings += 1
+
+    def _remove(self, term: str, seq: int) -> None:
+        postings = self._postings.get(term)
+        if postings is None:
+            return
+        seqs, counts = postings
+        position = bisect_left(seqs, seq)
+        if position < len(seqs) and seqs[position] == seq:
+            del seqs[position]
+            del counts[position]
+            self.postings -= 1
+            if not seqs:
+                del self._postings[term]
+
+    def search(self, terms: Iterable[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """(sequence numbers, BM25 scores) of the documents containing every term"""
+        postings = [self._postings.get(term) for term in set(terms)]
+        if not postings or any(entry is None for entry in postings):
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        postings.sort(key=lambda entry: len(entry[0]))
+        # Copies, so the postings can still grow while the results are alive
+        candidates = np.array(postings[0][0], dtype=np.int64)
+        # (frequency in each candidate, document frequency) per term
+        matched = [(np.array(postings[0][1], dtype=np.float32), len(candidates))]
+        for seqs, counts in postings[1:]:
+            term_counts = self._lookup(seqs, counts, candidates)
+            found = term_counts > 0
+            candidates = candidates[found]
+            matched = [(previous[found], frequency) for previous, frequency in matched]
+            matched.append((term_counts[found], len(seqs)))
+            if not len(candidates):
+                break
+        return candidates, self._score(candidates, matched)
+
+    def _lookup(self, seqs: array, counts: array, candidates: np.ndarray) -> np.ndarray:
+        """Frequency of a term in each candidate (0 where it does not occur)"""
+        if len(candidates) <= BISECT_LIMIT:
+            # A handful of candidates: look each one up without copying the postings
+            found = np.zeros(len(candidates), dtype=np.float32)
+            for i, seq in enumerate(candidates.tolist()):
+                position = bisect_left(seqs, seq)
+                if position < len(seqs) and seqs[position] == seq:
+                    found[i] = counts[position]
+            return found
+        term_seqs = np.array(seqs, dtype=np.int64)
+        if len(candidates) * DENSE_RATIO > len(term_seqs):
+            # Scatter the counts over all sequence numbers and read the candidates'
+            dense = np.zeros(len(self._lengths), dtype=np.float32)
+            dense[term_seqs] = counts
+            return dense[candidates]
+        positions = np.minimum(np.searchsorted(term_seqs, candidates), len(term_seqs) - 1)
+        return np.where(term_seqs[positions] == candidates, np.array(counts, dtype=np.float32)[positions], 0.0)
+
+    def _score(self, seqs: np.ndarray, matched: List[Tuple[np.ndarray, int]]) -> np.ndarray:
+        average = self.total_length / self.documents if self.documents else 1.0
+        norm = K1 * (1.0 - B + B * self._lengths[seqs] / np.float32(average))
+        scores = np.zeros(len(seqs), dtype=np.float32)
+        for counts, frequency in matched:
+            idf = math.log(1.0 + (self.documents - frequency + 0.5) / (frequency + 0.5))
+            scores += np.float32(idf * (K1 + 1.0)) * counts / (counts + norm)
+        return scores
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "documents": self.documents,
+            "terms": len(self._postings),
+            "postings": self.postings,
+            # Array payloads only; each term also costs ~200 bytes of dict entry and objects
+            "postings_bytes": self.postings * 6 + self._lengths.nbytes,
+        }
+
+
+def _top(seqs: np.ndarray, scores: np.ndarray, count: int) -> Tuple[np.ndarray, np.ndarray]:
+    """The ``count`` best-scored documents, ties broken towards the newer ones so
+    every page of a query is cut from the same ranking"""
+    threshold = np.partition(scores, len(scores) - count)[len(scores) - count]
+    above = np.flatnonzero(scores > threshold)
+    # seqs are ascending, so the newest of the tied documents are the last ones
+    tied = np.flatnonzero(scores == threshold)
+    keep = np.concatenate([above, tied[len(tied) - (count - len(above)):]])
+    return seqs[keep], scores[keep]
+
+
+class SearchIndex:
+    """Full-text search over several stores, merged into one ranking.
+
+    Each document type has its own TextIndex; a query keeps the best
+    ``offset + limit`` matches of each type and merges them by score (ties
+    go to the newer document).
+    """
+
+    def __init__(self, indexes: Dict[str, TextIndex]):
+        self.indexes = indexes
+        self.queries = 0
+
+    def search(self, query: str, types: Optional[List[str]] = None, limit: int = 20,
+               offset: int = 0) -> Tuple[int, List[Dict[str, Any]]]:
+        """Total number of matches and the ``limit`` best from ``offset`` on, as hits
+        of the form ``{"type", "id", "score", "document"}``"""
+        self.queries += 1
+        terms = tokenize(query)
+        wanted = offset + limit
+        total = 0
+        ranked: List[Tuple[float, int, str]] = []
+        for name in types or self.indexes:
+            seqs, scores = self.indexes[name].search(terms)
+            total += len(seqs)
+            if len(seqs) > wanted:
+                seqs, scores = _top(seqs, scores, wanted)
+            ranked.extend(zip(scores.tolist(), seqs.tolist(), [name] * len(seqs)))
+        ranked.sort(reverse=True)
+        hits = []
+        for score, seq, name in ranked[offset:wanted]:
+            store = self.indexes[name].store
+            record = store.get(store.id_format.format(seq))
+            if record is not None:
+                hits.append({"type": name, "id": record["id"], "score": round(score, 4), "document": record})
+        return total, hits
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "queries": self.queries,
+            **{name: index.stats() for name, index in self.indexes.items()},
+        }
+
+
+# Global instance shared by all endpoints
+search_index = SearchIndex({
+    "tickets": TextIndex(tickets, ["question", "manual_response"]),
+    "support_requests": TextIndex(support_requests, ["subject", "message"]),
+})
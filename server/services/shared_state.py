@@ -0,0 +1,440 @@
+import asyncio
+import json
+import logging
+import math
+import os
+import socket
+import time
+import uuid
+from typing import Any, Dict, List, Optional, Tuple
+
+import redis.asyncio as redis
+from redis.exceptions import ConnectionError as RedisConnectionError, ReadOnlyError, TimeoutError as RedisTimeoutError
+
+from services.store import IndexedStore, id_number, support_requests, agents, tickets, chat_sessions, provisioning_jobs
+
+logger = logging.getLogger(__name__)
+
+# Raise a counter to at least ARGV[1] (atomic, so concurrent workers agree)
+RAISE_COUNTER = """
+local current = tonumber(redis.call('GET', KEYS[1]) or '0')
+if current < tonumber(ARGV[1]) then redis.call('SET', KEYS[1], ARGV[1]) end
+return 1
+"""
+# Remove up to ARGV[2] records last written before ARGV[1] from a store hash (KEYS[1])
+# and its expiry index (KEYS[2]); returns how many
+EXPIRE_RECORDS = """
+local ids = redis.call('ZRANGEBYSCORE', KEYS[2], '-inf', ARGV[1], 'LIMIT', 0, ARGV[2])
+if #ids > 0 then
+  redis.call('HDEL', KEYS[1], unpack(ids))
+  redis.call('ZREM', KEYS[2], unpack(ids))
+end
+return #ids
+"""
+
+
+def _stream_position(entry_id: str) -> Tuple[int, int]:
+    milliseconds, _, sequence = entry_id.partition("-")
+    return int(milliseconds), int(sequence or 0)
+
+
+def _is_transient(error: Exception) -> bool:
+    """Whether a failed publish may succeed later (Redis is unreachable, loading or failing over)"""
+    return isinstance(error, (RedisConnectionError, RedisTimeoutError, ReadOnlyError, OSError, asyncio.TimeoutError))
+
+
+class RedisSharedState:
+    """Keeps the in-memory stores of several worker processes in sync through Redis.
+
+    Each worker keeps serving reads from its own IndexedStores. Writes made
+    in a worker are buffered and flushed in one MULTI block per batch: the
+    record is saved in a per-store hash (``{prefix}:{store}``) and appended
+    to a change stream (``{prefix}:changes``). A background task reads the
+    stream and replays other workers' writes into the local stores with
+    ``apply_remote``. Derived state, such as the overview counters, is
+    updated from the replayed writes, so every worker reports the same
+    numbers.
+
+    Ids come from shared Redis counters, so a record has the same sequence
+    number, and therefore the same pagination cursor, in every worker.
+    Stream order decides between concurrent writes to one record: a
+    worker ignores another worker's write to a record while one of its own
+    later writes to it is still on its way through the stream.
+
+    The stream is trimmed to about ``stream_maxlen`` entries. A worker that
+    falls further behind than that finds the oldest entry past its position
+    and reloads the stores from the hashes instead of missing the trimmed
+    writes. Records of the stores in ``ttl`` are dropped from their hash
+    once not written for that many seconds (workers keep their local copy;
+    workers started later do not load them).
+
+    A failed flush is retried with the writes kept in order. After
+    ``max_retries`` failures in a row, the writes are published one per
+    transaction instead, and one that Redis still rejects on its own is
+    logged and dropped rather than blocking every later write. While Redis
+    is unreachable the writes are kept.
+    """
+
+    def __init__(self, url: Optional[str], stores: Dict[str, IndexedStore], prefix: str = "lyzr",
+                 flush_interval: float = 0.005, batch_size: int = 500, stream_maxlen: int = 100_000,
+                 max_retries: int = 5, ttl: Optional[Dict[str, float]] = None, expire_interval: float = 60):
+        self.url = url
+        self.stores = stores
+        self.prefix = prefix
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.stream_maxlen = stream_maxlen
+        self.max_retries = max_retries
+        # Seconds a store's records are kept in Redis after their last write
+        self.ttl = {name: seconds for name, seconds in (ttl or {}).items() if seconds}
+        self.expire_interval = expire_interval
+        self.stream = f"{prefix}:changes"
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self.client: Optional[redis.Redis] = None
+        self._reader: Optional[redis.Redis] = None
+        # (store, op, record id, record JSON or "" for deletes)
+        self._pending: List[Tuple[str, str, str, str]] = []
+        # Own writes per (store, record id) not yet read back from the stream
+        self._own: Dict[Tuple[str, str], int] = {}
+        # agent id -> [seconds, count] not yet added to the shared totals
+        self._response_times: Dict[str, List[float]] = {}
+        self._last_id = "0-0"
+        self._wake: Optional[asyncio.Event] = None
+        self._flush_task: Optional[asyncio.Task] = None
+        self._consume_task: Optional[asyncio.Task] = None
+        self._started = False
+        self._stopping = False
+        # Flushes failed in a row
+        self._failures = 0
+        self._next_expiry = 0.0
+        self.published = 0
+        self.applied = 0
+        self.resyncs = 0
+        self.expired = 0
+        self.superseded = 0
+        self.batches = 0
+        self.errors = 0
+        self.dropped = 0
+        self.last_flush_ms = 0.0
+
+    @property
+    def enabled(self) -> bool:
+        return self.url is not None
+
+    async def start(self) -> None:
+        """Load the shared records, then start publishing and replaying writes"""
+        if not self.enabled:
+            return
+        if not self._started:
+            self.client = redis.from_url(self.url, decode_responses=True)
+            # Blocking stream reads get their own connection
+            self._reader = redis.from_url(self.url, decode_responses=True)
+            # Take the stream position before loading so no write falls in between;
+            # writes seen both ways are replayed idempotently
+            latest = await self.client.xrevrange(self.stream, count=1)
+            self._last_id = latest[0][0] if latest else "0-0"
+            await self.load()
+            for name, store in self.stores.items():
+                await self.client.eval(RAISE_COUNTER, 1, self._counter_key(name), store.id_counter)
+                store.subscribe(self._listener(name), include_remote=False)
+                store.id_allocator = self._allocator(name)
+            self._started = True
+        self._stopping = False
+        self._wake = asyncio.Event()
+        self._flush_task = asyncio.create_task(self._run_flush())
+        self._consume_task = asyncio.create_task(self._run_consume())
+
+    async def load(self) -> None:
+        """Merge the records saved in Redis into the local stores"""
+        for name, store in self.stores.items():
+            saved = await self.client.hgetall(self._records_key(name))
+            # Apply in sequence order so the store can append rather than insert in the middle
+            records = sorted(saved.items(), key=lambda item: id_number(item[0]) or 0)
+            for record_id, payload in records:
+                store.apply_remote("insert", record_id, json.loads(payload))
+            logger.info("Loaded %d %s from Redis", len(records), name)
+
+    async def resync(self) -> None:
+        """Reload the stores from the hashes after missing writes trimmed from the stream"""
+        latest = await self._reader.xrevrange(self.stream, count=1)
+        position = latest[0][0] if latest else self._last_id
+        for name, store in self.stores.items():
+            saved = await self._reader.hgetall(self._records_key(name))
+            for record_id, payload in sorted(saved.items(), key=lambda item: id_number(item[0]) or 0):
+                if (name, record_id) not in self._own:
+                    store.apply_remote("insert", record_id, json.loads(payload))
+            if name in self.ttl:
+                # Records expired from Redis were not deleted
+                continue
+            for record in store.values():
+                if record["id"] not in saved and (name, record["id"]) not in self._own:
+                    store.apply_remote("delete", record["id"], None)
+        self._last_id = position
+        self.resyncs += 1
+
+    def _records_key(self, name: str) -> str:
+        return f"{self.prefix}:{name}"
+
+    def _expiry_key(self, name: str) -> str:
+        return f"{self.prefix}:{name}:written"
+
+    def _counter_key(self, name: str) -> str:
+        return f"{self.prefix}:ids:{name}"
+
+    def _allocator(self, name: str):
+        key = self._counter_key(name)
+
+        async def allocate() -> int:
+            return await self.client.incr(key)
+        return allocate
+
+    def _listener(self, name: str):
+        def on_write(op: str, old: Optional[Dict[str, Any]], new: Optional[Dict[str, Any]]) -> None:
+            record_id = (new or old)["id"]
+            self._pending.append((name, op, record_id, json.dumps(new) if new is not None else ""))
+            key = (name, record_id)
+            self._own[key] = self._own.get(key, 0) + 1
+            if len(self._pending) >= self.batch_size and self._wake is not None:
+                self._wake.set()
+        return on_write
+
+    def record_response_time(self, agent_id: str, seconds: float) -> None:
+        """Add a chat reply time to the per-agent totals shared by all workers"""
+        if not self.enabled:
+            return
+        totals = self._response_times.setdefault(agent_id, [0.0, 0])
+        totals[0] += seconds
+        totals[1] += 1
+
+    async def lease(self, name: str, ttl: float) -> bool:
+        """Take a lease shared by all workers for ``ttl`` seconds; False if another worker holds it"""
+        return bool(await self.client.set(f"{self.prefix}:lease:{name}", self.worker_id, nx=True,
+                                          ex=max(1, math.ceil(ttl))))
+
+    async def response_time_avg(self, agent_id: str) -> Optional[float]:
+        """Average chat reply time of an agent across all workers"""
+        total, count = await self.client.hmget(
+            f"{self.prefix}:response_times", f"{agent_id}:sum", f"{agent_id}:count"
+        )
+        if not count or not int(count):
+            return None
+        return float(total) / int(count)
+
+    async def _run_flush(self) -> None:
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            await self.flush()
+            if self.ttl and time.monotonic() >= self._next_expiry:
+                self._next_expiry = time.monotonic() + self.expire_interval
+                await self.expire()
+
+    async def expire(self) -> int:
+        """Drop records not written within their store's ttl from Redis; returns how many"""
+        removed = 0
+        for name, ttl in self.ttl.items():
+            try:
+                while True:
+                    count = await self.client.eval(
+                        EXPIRE_RECORDS, 2, self._records_key(name), self._expiry_key(name),
+                        time.time() - ttl, self.batch_size,
+                    )
+                    removed += count
+                    if count < self.batch_size:
+                        break
+            except Exception:
+                self.errors += 1
+                logger.exception("Failed to expire %s from Redis", name)
+        self.expired += removed
+        return removed
+
+    async def flush(self) -> None:
+        """Publish buffered writes and response times in one transaction"""
+        if not self.enabled or (not self._pending and not self._response_times):
+            return
+        pending, self._pending = self._pending, []
+        response_times, self._response_times = self._response_times, {}
+        started = time.perf_counter()
+        try:
+            await self._publish(pending, response_times)
+        except Exception:
+            self.errors += 1
+            self._failures += 1
+            if self._failures < self.max_retries:
+                # Keep everything so the next flush retries it in order
+                self._requeue(pending, response_times)
+                logger.exception("Failed to publish %d writes to Redis", len(pending))
+                return
+            logger.exception("Failed to publish %d writes to Redis %d times in a row; "
+                             "publishing them one at a time", len(pending), self._failures)
+            await self._publish_each(pending, response_times)
+            return
+        self._failures = 0
+        self.published += len(pending)
+        self.batches += 1
+        self.last_flush_ms = (time.perf_counter() - started) * 1000
+
+    async def _publish(self, pending: List[Tuple[str, str, str, str]],
+                       response_times: Dict[str, List[float]]) -> None:
+        now = time.time()
+        async with self.client.pipeline(transaction=True) as pipe:
+            for name, op, record_id, payload in pending:
+                if op == "delete":
+                    pipe.hdel(self._records_key(name), record_id)
+                    if name in self.ttl:
+                        pipe.zrem(self._expiry_key(name), record_id)
+                else:
+                    pipe.hset(self._records_key(name), record_id, payload)
+                    if name in self.ttl:
+                        pipe.zadd(self._expiry_key(name), {record_id: now})
+                # Approximate trimming only drops whole stream nodes, instead of trimming on every write
+                pipe.xadd(
+                    self.stream,
+                    {"origin": self.worker_id, "store": name, "op": op, "id": record_id, "record": payload},
+                    maxlen=self.stream_maxlen, approximate=True,
+                )
+            for agent_id, (seconds, count) in response_times.items():
+                pipe.hincrbyfloat(f"{self.prefix}:response_times", f"{agent_id}:sum", seconds)
+                pipe.hincrby(f"{self.prefix}:response_times", f"{agent_id}:count", count)
+            await pipe.execute()
+
+    async def _publish_each(self, pending: List[Tuple[str, str, str, str]],
+                            response_times: Dict[str, List[float]]) -> None:
+        """Publish writes one per transaction, dropping those Redis rejects"""
+        for position, write in enumerate(pending):
+            try:
+                await self._publish([write], {})
+            except Exception as e:
+                if _is_transient(e):
+                    # Not the write's fault: keep this and the following ones
+                    self._requeue(pending[position:], response_times)
+                    return
+                name, op, record_id, _ = write
+                # It will never come back through the stream
+                self._forget_own((name, record_id))
+                self.dropped += 1
+                logger.error("Dropped %s of %s %s, rejected by Redis: %s", op, name, record_id, e)
+                continue
+            self.published += 1
+        try:
+            await self._publish([], response_times)
+        except Exception as e:
+            if _is_transient(e):
+                self._requeue([], response_times)
+                return
+            logger.error("Dropped the response times of %d agents, rejected by Redis: %s", len(response_times), e)
+        self._failures = 0
+
+    def _requeue(self, pending: List[Tuple[str, str, str, str]], response_times: Dict[str, List[float]]) -> None:
+        self._pending = pending + self._pending
+        for agent_id, (seconds, count) in response_times.items():
+            totals = self._response_times.setdefault(agent_id, [0.0, 0])
+            totals[0] += seconds
+            totals[1] += count
+
+    def _forget_own(self, key: Tuple[str, str]) -> None:
+        remaining = self._own.get(key, 0) - 1
+        if remaining > 0:
+            self._own[key] = remaining
+        else:
+            self._own.pop(key, None)
+
+    async def _behind_stream(self) -> bool:
+        """Whether writes after our position were trimmed from the stream before we read them"""
+        if self._last_id == "0-0":
+            # Not a stream entry: nothing was published when we started
+            return False
+        oldest = await self._reader.xrange(self.stream, count=1)
+        return bool(oldest) and _stream_position(oldest[0][0]) > _stream_position(self._last_id)
+
+    async def _run_consume(self) -> None:
+        while True:
+            try:
+                if await self._behind_stream():
+                    logger.warning("Fell behind the Redis change stream past %s; reloading from Redis", self._last_id)
+                    await self.resync()
+                response = await self._reader.xread({self.stream: self._last_id}, count=1000, block=1000)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                self.errors += 1
+                logger.exception("Failed to read the Redis change stream")
+                await asyncio.sleep(1)
+                continue
+            for _, entries in response:
+                for entry_id, fields in entries:
+                    self._last_id = entry_id
+                    self._apply(fields)
+
+    def _apply(self, fields: Dict[str, str]) -> None:
+        key = (fields["store"], fields["id"])
+        if fields["origin"] == self.worker_id:
+            self._forget_own(key)
+            return
+        if key in self._own:
+            # One of our later writes to this record is still in flight and will win
+            self.superseded += 1
+            return
+        store = self.stores.get(fields["store"])
+        if store is None:
+            return
+        record = json.loads(fields["record"]) if fields["record"] else None
+        store.apply_remote(fields["op"], fields["id"], record)
+        self.applied += 1
+
+    async def close(self) -> None:
+        """Publish what is left and stop the background tasks"""
+        if self._flush_task is not None:
+            self._stopping = True
+            self._wake.set()
+            await self._flush_task
+            self._flush_task = None
+        if self._consume_task is not None:
+            self._consume_task.cancel()
+            try:
+                await self._consume_task
+            except asyncio.CancelledError:
+                pass
+            self._consume_task = None
+        if self.enabled and self.client is not None:
+            await self.flush()
+            await self.client.aclose()
+            await self._reader.aclose()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "worker_id": self.worker_id,
+            "pending": len(self._pending),
+            "own_in_flight": len(self._own),
+            "published": self.published,
+            "applied": self.applied,
+            "superseded": self.superseded,
+            "batches": self.batches,
+            "errors": self.errors,
+            "dropped": self.dropped,
+            "resyncs": self.resyncs,
+            "expired": self.expired,
+            "last_flush_ms": round(self.last_flush_ms, 3),
+            "stream_position": self._last_id,
+        }
+
+
+# Global instance; only active with SHARED_STATE=redis (set by `python main.py --workers N`)
+shared_state = RedisSharedState(
+    os.getenv("REDIS_URL", "redis://localhost:6379") if os.getenv("SHARED_STATE", "memory") == "redis" else None,
+    {
+        "support_requests": support_requests,
+        "agents": agents,
+        "tickets": tickets,
+        "chat_sessions": chat_sessions,
+        "provisioning_jobs": provisioning_jobs,
+    },
+    prefix=os.getenv("SHARED_STATE_PREFIX", "lyzr"),
+    flush_interval=float(os.getenv("SHARED_STATE_FLUSH_INTERVAL", "0.005")),
+    max_retries=int(os.getenv("SHARED_STATE_MAX_RETRIES", "5")),
+    ttl={"chat_sessions": float(os.getenv("SHARED_STATE_CHAT_SESSION_TTL_HOURS", "168")) * 3600},
+)
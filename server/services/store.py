@@ -0,0 +1,313 @@
+import logging
+import re
+from bisect import bisect_left, bisect_right, insort
+from typing import Dict, Any, List, Optional, Iterable, Iterator, Callable, Tuple, Awaitable
+
+# Called as listener(op, old, new) with op in {"insert", "update", "delete"}
+StoreListener = Callable[[str, Optional[Dict[str, Any]], Optional[Dict[str, Any]]], None]
+# Returns the next number for a new id from a counter shared between processes
+IdAllocator = Callable[[], Awaitable[int]]
+_ID_NUMBER = re.compile(r"(\d+)$")
+
+logger = logging.getLogger(__name__)
+
+
+def id_number(record_id: str) -> Optional[int]:
+    """The number at the end of an id such as ``ticket_0042``"""
+    match = _ID_NUMBER.search(record_id)
+    return int(match.group(1)) if match else None
+
+
+class IndexedStore:
+    """In-memory record store with a primary-key dict and secondary indexes.
+
+    Records are plain dicts keyed by their ``id``. Each record's sequence
+    number is the number in its id; ids are allocated in increasing order
+    just before ``created_at`` is stamped, so sequence order is creation
+    order, and it is the same in every worker sharing an id counter. Every
+    field listed in ``indexes`` gets a hash index from value to a sorted
+    list of sequence numbers, so lookups by id, filters on indexed fields
+    and cursor pages cost O(1) or O(log n) + O(matches) instead of a scan
+    over every record. Listeners registered with ``subscribe`` are told
+    about every write, which lets derived state be maintained incrementally;
+    a listener that raises is logged and counted in ``listener_errors``.
+    """
+
+    def __init__(self, id_format: str, indexes: Iterable[str] = ()):
+        self.id_format = id_format
+        self._records: Dict[str, Dict[str, Any]] = {}
+        self._seq: Dict[str, int] = {}
+        self._ids: Dict[int, str] = {}
+        self._order: List[int] = []
+        self._indexes: Dict[str, Dict[Any, List[int]]] = {field: {} for field in indexes}
+        self._counter = 0
+        self._listeners: List[Tuple[StoreListener, bool, bool]] = []
+        self.listener_errors = 0
+        self.id_allocator: Optional[IdAllocator] = None
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        return iter(list(self._records.values()))
+
+    def __contains__(self, record_id: str) -> bool:
+        return record_id in self._records
+
+    def subscribe(self, listener: StoreListener, include_remote: bool = True,
+                  include_local: bool = True) -> None:
+        """Register a callback for inserts, updates and deletes.
+
+        With ``include_remote=False`` the listener only hears about writes
+        made in this process, not ones replayed from other workers through
+        ``apply_remote`` (for side effects the originating worker already did).
+        With ``include_local=False`` it only hears about those replayed
+        writes (for state this process updates itself when it makes a write).
+        """
+        self._listeners.append((listener, include_remote, include_local))
+
+    @property
+    def id_counter(self) -> int:
+        """Number of the highest id allocated or loaded so far"""
+        return self._counter
+
+    def next_id(self) -> str:
+        """Allocate a new record id (never reused, even after deletes)"""
+        self._counter += 1
+        return self.id_format.format(self._counter)
+
+    async def allocate_id(self) -> str:
+        """Allocate a new record id, from the shared counter when one is configured"""
+        if self.id_allocator is None:
+            return self.next_id()
+        number = await self.id_allocator()
+        self._counter = max(self._counter, number)
+        return self.id_format.format(number)
+
+    def advance_counter(self, number: int) -> None:
+        """Never allocate ids numbered ``number`` or lower (e.g. ids of records deleted before a restart)"""
+        self._counter = max(self._counter, number)
+
+    def load(self, records: Iterable[Dict[str, Any]]) -> int:
+        """Insert previously saved records and move the id counter past them"""
+        count = 0
+        for record in records:
+            self.insert(record)
+            count += 1
+        # Sequence numbers are the numbers in the ids, so the highest one is the counter
+        if self._order:
+            self._counter = max(self._counter, self._order[-1])
+        return count
+
+    def get(self, record_id: str) -> Optional[Dict[str, Any]]:
+        """Get a record by primary key"""
+        return self._records.get(record_id)
+
+    def values(self) -> List[Dict[str, Any]]:
+        """All records in insertion order"""
+        return list(self._records.values())
+
+    def sequence(self, record_id: str) -> int:
+        """Sequence number of a record (the number in its id), used as a pagination cursor"""
+        return self._seq[record_id]
+
+    def insert(self, record: Dict[str, Any]) -> Dict[str, Any]:
+        """Add a new record and index it"""
+        record_id = record["id"]
+        if record_id in self._records:
+            raise KeyError(f"Duplicate id: {record_id}")
+        self._insert(record)
+        self._notify("insert", None, record)
+        return record
+
+    def _insert(self, record: Dict[str, Any]) -> None:
+        record_id = record["id"]
+        seq = id_number(record_id)
+        if seq is None:
+            seq = self._order[-1] + 1 if self._order else 1
+        if seq in self._ids:
+            raise KeyError(f"Duplicate sequence number {seq} for id: {record_id}")
+        self._records[record_id] = record
+        self._seq[record_id] = seq
+        self._ids[seq] = record_id
+        _add_sorted(self._order, seq)
+        for field, index in self._indexes.items():
+            _add_sorted(index.setdefault(record.get(field), []), seq)
+
+    def update(self, record_id: str, changes: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Apply changes to a record in place, keeping indexes in sync"""
+        record = self._records.get(record_id)
+        if record is None:
+            return None
+        old = dict(record) if self._listeners else None
+        self._update(record, changes)
+        self._notify("update", old, record)
+        return record
+
+    def _update(self, record: Dict[str, Any], changes: Dict[str, Any]) -> None:
+        seq = self._seq[record["id"]]
+        for field, index in self._indexes.items():
+            if field in changes and changes[field] != record.get(field):
+                self._unindex(index, record.get(field), seq)
+                insort(index.setdefault(changes[field], []), seq)
+        record.update(changes)
+
+    def delete(self, record_id: str) -> Optional[Dict[str, Any]]:
+        """Remove a record and drop it from every index"""
+        record = self._records.get(record_id)
+        if record is None:
+            return None
+        self._delete(record)
+        self._notify("delete", record, None)
+        return record
+
+    def _delete(self, record: Dict[str, Any]) -> None:
+        del self._records[record["id"]]
+        seq = self._seq.pop(record["id"])
+        del self._ids[seq]
+        _remove_sorted(self._order, seq)
+        for field, index in self._indexes.items():
+            self._unindex(index, record.get(field), seq)
+
+    def apply_remote(self, op: str, record_id: str, record: Optional[Dict[str, Any]]) -> None:
+        """Apply a write made by another worker (idempotent upsert or delete).
+
+        Only listeners subscribed with ``include_remote=True`` are notified.
+        """
+        current = self._records.get(record_id)
+        if op == "delete" or record is None:
+            if current is not None:
+                self._delete(current)
+                self._notify("delete", current, None, remote=True)
+            return
+        if current is None:
+            record = dict(record)
+            self._insert(record)
+            self._notify("insert", None, record, remote=True)
+        elif current != record:
+            old = dict(current)
+            self._update(current, record)
+            self._notify("update", old, current, remote=True)
+
+    def find(self, **filters: Any) -> List[Dict[str, Any]]:
+        """Records matching all non-None filters, in sequence (creation) order"""
+        return list(self.scan(**filters))
+
+    def scan(self, after: Optional[int] = None, descending: bool = False, **filters: Any) -> Iterator[Dict[str, Any]]:
+        """Iterate records matching all non-None filters in sequence order.
+
+        The smallest index bucket among the indexed filters drives the scan
+        and the remaining filters are checked on each candidate. ``after``
+        is an exclusive sequence-number cursor in the direction of travel.
+        """
+        filters = {field: value for field, value in filters.items() if value is not None}
+        candidates = self._order
+        driver = None
+        for field, value in filters.items():
+            index = self._indexes.get(field)
+            if index is not None:
+                bucket = index.get(value)
+                if not bucket:
+                    return
+                if len(bucket) < len(candidates):
+                    candidates, driver = bucket, field
+        residual = [(field, value) for field, value in filters.items() if field != driver]
+
+        if descending:
+            start = len(candidates) - 1 if after is None else bisect_left(candidates, after) - 1
+            positions = range(start, -1, -1)
+        else:
+            start = 0 if after is None else bisect_right(candidates, after)
+            positions = range(start, len(candidates))
+
+        records, ids = self._records, self._ids
+        for position in positions:
+            record = records[ids[candidates[position]]]
+            for field, value in residual:
+                if record.get(field) != value:
+                    break
+            else:
+                yield record
+
+    def page(self, limit: int, after: Optional[int] = None, descending: bool = False,
+             **filters: Any) -> Tuple[List[Dict[str, Any]], Optional[int]]:
+        """One page of matching records plus the cursor of the next page (None at the end)"""
+        records = []
+        for record in self.scan(after=after, descending=descending, **filters):
+            if len(records) == limit:
+                return records, self._seq[records[-1]["id"]]
+            records.append(record)
+        return records, None
+
+    def cursor_before(self, field: str, value: Any) -> Optional[int]:
+        """Cursor (for ``after``) just before the first record whose ``field`` is at least ``value``.
+
+        Binary search over sequence order, so only exact for fields that grow
+        with it. For a field that can run behind earlier records by up to
+        ``d``, such as ``created_at``, searching for ``value - d`` gives a
+        cursor no record at least ``value`` lies before. None means start
+        from the beginning.
+        """
+        records, ids, order = self._records, self._ids, self._order
+        low, high = 0, len(order)
+        while low < high:
+            middle = (low + high) // 2
+            if (records[ids[order[middle]]].get(field) or "") < value:
+                low = middle + 1
+            else:
+                high = middle
+        return order[low - 1] if low else None
+
+    def count(self, **filters: Any) -> int:
+        """Number of records matching the filters"""
+        filters = {field: value for field, value in filters.items() if value is not None}
+        if not filters:
+            return len(self._records)
+        if len(filters) == 1:
+            field, value = next(iter(filters.items()))
+            if field in self._indexes:
+                return len(self._indexes[field].get(value, ()))
+        return sum(1 for _ in self.scan(**filters))
+
+    def _notify(self, op: str, old: Optional[Dict[str, Any]], new: Optional[Dict[str, Any]],
+                remote: bool = False) -> None:
+        # The write is already applied: one failing listener must not keep it
+        # from the others, nor fail the write for a caller that would retry it
+        for listener, include_remote, include_local in self._listeners:
+            if include_remote if remote else include_local:
+                try:
+                    listener(op, old, new)
+                except Exception:
+                    self.listener_errors += 1
+                    logger.exception("Store listener %r failed on %s", listener, op)
+
+    @staticmethod
+    def _unindex(index: Dict[Any, List[int]], value: Any, seq: int) -> None:
+        bucket = index.get(value)
+        if bucket is not None:
+            _remove_sorted(bucket, seq)
+            if not bucket:
+                del index[value]
+
+
+def _add_sorted(values: List[int], value: int) -> None:
+    # Records almost always arrive in sequence order; append is the fast path
+    if not values or values[-1] < value:
+        values.append(value)
+    else:
+        insort(values, value)
+
+
+def _remove_sorted(values: List[int], value: int) -> None:
+    position = bisect_left(values, value)
+    if position < len(values) and values[position] == value:
+        del values[position]
+
+
+# Global instances shared by all endpoints
+support_requests = IndexedStore("SR-{:04d}", indexes=["status"])
+agents = IndexedStore("agent_{:04d}", indexes=["user_id"])
+tickets = IndexedStore("ticket_{:04d}", indexes=["agent_id", "status", "user_session"])
+chat_sessions = IndexedStore("chat_{:04d}", indexes=["agent_id", "user_session"])
+# Agent provisioning jobs (shared between workers but not persisted)
+provisioning_jobs = IndexedStore("job_{:04d}", indexes=["agent_id", "status"])
@@ -0,0 +1,143 @@
+import asyncio
+import logging
+import os
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from services.store import IndexedStore
+
+logger = logging.getLogger(__name__)
+
+
+class WriteBehindQueue:
+    """Bounded queue of deferred writes applied in batches by a background worker.
+
+    Producers ``await put(item)`` and return immediately unless the queue is
+    full, in which case they wait for room (backpressure). The worker
+    drains up to ``batch_size`` items at a time and hands them to
+    ``apply_batch``. ``close()`` drains whatever is left. Before ``start()``
+    (or after ``close()``) items are applied inline, so scripts and tests
+    that never run the app lifespan still see their writes.
+
+    If a batch fails, its items are applied again one at a time so a bad
+    item only loses itself; ``errors`` counts the items that failed.
+    ``apply_batch`` must therefore skip items it has already applied.
+    """
+
+    def __init__(self, apply_batch: Callable[[List[Any]], None], maxsize: int = 10000, batch_size: int = 200):
+        self.apply_batch = apply_batch
+        self.maxsize = maxsize
+        self.batch_size = batch_size
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self.enqueued = 0
+        self.applied = 0
+        self.batches = 0
+        self.blocked_puts = 0
+        self.errors = 0
+        self.max_depth = 0
+        self.last_flush_ms = 0.0
+        self.total_flush_ms = 0.0
+
+    @property
+    def depth(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    async def start(self) -> None:
+        if self._task is None:
+            self._queue = asyncio.Queue(maxsize=self.maxsize)
+            self._task = asyncio.create_task(self._run())
+
+    async def put(self, item: Any) -> None:
+        """Queue one write, waiting for room when the queue is full"""
+        self.enqueued += 1
+        if self._task is None:
+            self._apply([item])
+            return
+        if self._queue.full():
+            self.blocked_puts += 1
+        await self._queue.put(item)
+        self.max_depth = max(self.max_depth, self._queue.qsize())
+
+    async def put_many(self, items: List[Any]) -> None:
+        for item in items:
+            await self.put(item)
+
+    async def _run(self) -> None:
+        while True:
+            batch = [await self._queue.get()]
+            while len(batch) < self.batch_size and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            self._apply(batch)
+            for _ in batch:
+                self._queue.task_done()
+
+    def _apply(self, batch: List[Any]) -> None:
+        started = time.perf_counter()
+        try:
+            self.apply_batch(batch)
+            applied = len(batch)
+        except Exception:
+            logger.warning("Failed to apply %d queued writes as a batch; applying them one at a time",
+                           len(batch), exc_info=True)
+            applied = None
+        if applied is None:
+            applied = self._apply_each(batch)
+        self.last_flush_ms = (time.perf_counter() - started) * 1000
+        self.total_flush_ms += self.last_flush_ms
+        self.applied += applied
+        self.batches += 1
+
+    def _apply_each(self, batch: List[Any]) -> int:
+        applied = 0
+        for item in batch:
+            try:
+                self.apply_batch([item])
+            except Exception:
+                self.errors += 1
+                logger.exception("Failed to apply a queued write")
+                continue
+            applied += 1
+        return applied
+
+    async def close(self) -> None:
+        """Apply everything still queued and stop the worker"""
+        if self._task is None:
+            return
+        await self._queue.join()
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        self._queue = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "depth": self.depth,
+            "max_depth": self.max_depth,
+            "maxsize": self.maxsize,
+            "enqueued": self.enqueued,
+            "applied": self.applied,
+            "batches": self.batches,
+            "blocked_puts": self.blocked_puts,
+            "errors": self.errors,
+            "last_flush_ms": round(self.last_flush_ms, 3),
+            "avg_flush_ms": round(self.total_flush_ms / self.batches, 3) if self.batches else 0.0,
+        }
+
+
+def insert_records(batch: List[Tuple[IndexedStore, Dict[str, Any]]]) -> None:
+    """Apply queued (store, record) inserts, skipping records already inserted"""
+    for store, record in batch:
+        if store.get(record["id"]) is not record:
+            store.insert(record)
+
+
+# Global instance for chat-session logs and the tickets they open
+store_writes = WriteBehindQueue(
+    insert_records,
+    maxsize=int(os.getenv("WRITE_BEHIND_MAXSIZE", "10000")),
+    batch_size=int(os.getenv("WRITE_BEHIND_BATCH_SIZE", "200")),
+)
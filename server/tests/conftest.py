@@ -0,0 +1,30 @@
+import time
+import uuid
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+
+
+@pytest.fixture
+def client():
+    with TestClient(main.app) as client:
+        yield client
+
+
+@pytest.fixture
+def ready_agent(client):
+    """Create an agent for a fresh user and wait until it is provisioned"""
+    def create(**fields):
+        data = {"name": "Helper", "description": "Answers questions", "tone": "friendly",
+                "personality": "patient", "knowledge_base": [],
+                "user_id": f"user_{uuid.uuid4().hex[:8]}", **fields}
+        agent = client.post("/api/agents", json=data).json()
+        deadline = time.monotonic() + 5
+        while agent["status"] != "ready":
+            assert time.monotonic() < deadline, f"agent stuck in {agent['status']}"
+            time.sleep(0.01)
+            agent = client.get(f"/api/agents/{agent['id']}").json()
+        return agent
+    return create
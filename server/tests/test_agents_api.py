@@ -0,0 +1,40 @@
+import uuid
+
+from fastapi.testclient import TestClient
+
+import main
+from services.rate_limit import admission
+
+
+def agent(user_id, name="Helper"):
+    return {"name": name, "description": "Answers questions", "tone": "friendly",
+            "personality": "patient", "knowledge_base": [], "user_id": user_id}
+
+
+def test_bulk_create_admits_more_agents_than_the_single_create_burst():
+    user_id = f"user_{uuid.uuid4().hex[:8]}"
+    count = int(admission.limiters["agent_create"].burst) * 5
+    with TestClient(main.app) as client:
+        response = client.post("/api/agents/bulk", json={
+            "agents": [agent(user_id, f"Agent {i}") for i in range(count)]
+        })
+        assert response.status_code == 202
+        body = response.json()
+        assert len(body["agents"]) == len(body["jobs"]) == count
+        assert [item["name"] for item in body["agents"]] == [f"Agent {i}" for i in range(count)]
+        # Single creates keep their own budget
+        assert client.post("/api/agents", json=agent(user_id)).status_code == 202
+
+
+def test_bulk_create_is_rejected_whole_when_the_user_is_out_of_tokens():
+    user_id = f"user_{uuid.uuid4().hex[:8]}"
+    burst = int(admission.limiters["agent_bulk"].burst)
+    with TestClient(main.app) as client:
+        before = len(main.agents)
+        first = client.post("/api/agents/bulk", json={"agents": [agent(user_id)] * min(burst, main.AGENT_BULK_MAX_ITEMS)})
+        assert first.status_code == 202
+        created = len(main.agents)
+        second = client.post("/api/agents/bulk", json={"agents": [agent(user_id)] * 50})
+        assert second.status_code == 429
+        assert int(second.headers["Retry-After"]) >= 1
+        assert len(main.agents) == created > before
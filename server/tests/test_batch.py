@@ -0,0 +1,69 @@
+import asyncio
+import json
+import uuid
+
+import main
+from services.rate_limit import admission
+
+
+def batch_lines(client, messages, **options):
+    response = client.post("/api/chat/batch", json={"messages": messages, **options})
+    assert response.status_code == 200
+    return [json.loads(line) for line in response.text.splitlines()]
+
+
+def messages_for(agent_id, count, session=None):
+    session = session or f"session_{uuid.uuid4().hex[:8]}"
+    return [{"agent_id": agent_id, "message": f"Question {i}?", "user_session": session} for i in range(count)]
+
+
+def test_replies_are_streamed_in_request_order_with_bounded_concurrency(client, ready_agent, monkeypatch):
+    agent = ready_agent()
+    running = peak = 0
+
+    async def slow(agent_id, message, context=None):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        # Later messages finish first
+        await asyncio.sleep(0.02 / (int(message.split()[1][:-1]) + 1))
+        running -= 1
+        return {"response": f"Answer to {message}", "confidence_score": 0.9}
+
+    monkeypatch.setattr(main.lyzr_service, "chat_with_agent", slow)
+    lines = batch_lines(client, messages_for(agent["id"], 10), concurrency=3)
+    assert [line["index"] for line in lines] == list(range(10))
+    assert [line["response"] for line in lines] == [f"Answer to Question {i}?" for i in range(10)]
+    assert peak == 3
+
+
+def test_failed_messages_get_an_error_line_and_low_confidence_opens_tickets(client, ready_agent, monkeypatch):
+    agent = ready_agent()
+
+    async def unsure(agent_id, message, context=None):
+        return {"response": "Not sure", "confidence_score": 0.3}
+
+    monkeypatch.setattr(main.lyzr_service, "chat_with_agent", unsure)
+    messages = messages_for(agent["id"], 2)
+    messages.insert(1, {"agent_id": "agent_missing", "message": "Hi", "user_session": "session_1"})
+    lines = batch_lines(client, messages)
+    assert lines[1] == {"index": 1, "error": {"status_code": 404, "detail": "Agent not found"}}
+    assert [line["ticket_created"] for line in (lines[0], lines[2])] == [True, True]
+    assert [ticket["question"] for ticket in main.tickets.find(agent_id=agent["id"])] == ["Question 0?", "Question 1?"]
+
+
+def test_messages_wait_for_batch_tokens_then_fail_with_retry_after(client, ready_agent, monkeypatch):
+    agent = ready_agent()
+    limiter = admission.limiters["batch"]
+    monkeypatch.setattr(limiter, "burst", 2.0)
+    monkeypatch.setattr(limiter, "rate", 50.0)
+    # Paced: the third and fourth message wait for tokens
+    lines = batch_lines(client, messages_for(agent["id"], 4), concurrency=4)
+    assert all("response" in line for line in lines)
+
+    monkeypatch.setattr(limiter, "rate", 0.01)
+    monkeypatch.setattr(main, "CHAT_BATCH_MAX_WAIT", 1.0)
+    lines = batch_lines(client, messages_for(agent["id"], 4), concurrency=1)
+    assert ["response" in line for line in lines] == [True, True, False, False]
+    assert lines[2]["error"]["status_code"] == 429
+    assert lines[2]["error"]["retry_after"] > 1
@@ -0,0 +1,67 @@
+from services.cache import TTLCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_entries_expire_after_ttl():
+    clock = FakeClock()
+    cache = TTLCache(maxsize=10, ttl=5, clock=clock)
+    cache.set("a", 1)
+    clock.now = 4.9
+    assert cache.get("a") == 1
+    clock.now = 5.0
+    assert cache.get("a") is None
+    assert cache.expirations == 1
+    assert len(cache) == 0
+
+
+def test_setting_again_restarts_the_ttl():
+    clock = FakeClock()
+    cache = TTLCache(maxsize=10, ttl=5, clock=clock)
+    cache.set("a", 1)
+    clock.now = 4
+    cache.set("a", 2)
+    clock.now = 8
+    assert cache.get("a") == 2
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1 and cache.get("c") == 3
+    assert cache.evictions == 1
+
+
+def test_invalidate_tag_drops_only_that_tag():
+    cache = TTLCache(maxsize=10, ttl=60)
+    cache.set(("agent_1", "hi"), "x", tag="agent_1")
+    cache.set(("agent_1", "bye"), "y", tag="agent_1")
+    cache.set(("agent_2", "hi"), "z", tag="agent_2")
+    assert cache.invalidate_tag("agent_1") == 2
+    assert cache.get(("agent_1", "hi")) is None
+    assert cache.get(("agent_2", "hi")) == "z"
+    assert cache.invalidate_tag("agent_1") == 0
+
+
+def test_retagged_entry_is_not_dropped_with_its_old_tag():
+    cache = TTLCache(maxsize=10, ttl=60)
+    cache.set("key", 1, tag="old")
+    cache.set("key", 2, tag="new")
+    cache.invalidate_tag("old")
+    assert cache.get("key") == 2
+
+
+def test_zero_size_disables_the_cache():
+    cache = TTLCache(maxsize=0, ttl=60)
+    cache.set("a", 1)
+    assert cache.get("a") is None
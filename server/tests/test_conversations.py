@@ -0,0 +1,100 @@
+import asyncio
+import uuid
+from datetime import datetime
+
+import pytest
+
+import main
+from services.conversations import ConversationStore
+from services.lyzr_api import LyzrAPIService, LyzrUnavailableError, chat_cache_key
+from services.store import IndexedStore
+
+
+def chat_session(record_id, message, response="Sure.", session="s1"):
+    return {"id": record_id, "agent_id": "agent_1", "user_session": session, "message": message,
+            "response": response, "created_at": datetime.now().isoformat()}
+
+
+def test_turns_beyond_the_ring_or_token_budget_are_dropped_oldest_first():
+    store = ConversationStore(max_turns=3, max_tokens=1000)
+    for i in range(5):
+        store.append("agent_1", "s1", f"question {i}", f"answer {i}")
+    history = store.context("agent_1", "s1")["history"]
+    assert [turn["content"] for turn in history[::2]] == ["question 2", "question 3", "question 4"]
+
+    store = ConversationStore(max_turns=10, max_tokens=30)
+    store.append("agent_1", "s1", "a" * 40, "b" * 40)
+    store.append("agent_1", "s1", "c" * 40, "d" * 40)
+    assert [turn["content"] for turn in store.context("agent_1", "s1")["history"]] == ["c" * 40, "d" * 40]
+
+
+def test_follow_records_only_remote_chat_sessions_and_skips_rejected_ones():
+    sessions = IndexedStore("chat_{:06d}")
+    store = ConversationStore()
+    store.follow(sessions, skip=lambda record: record["response"] == "unavailable")
+
+    sessions.insert(chat_session("chat_000001", "local"))
+    assert store.context("agent_1", "s1") is None
+
+    sessions.apply_remote("insert", "chat_000002", chat_session("chat_000002", "remote"))
+    sessions.apply_remote("insert", "chat_000003", chat_session("chat_000003", "down", "unavailable"))
+    assert store.context("agent_1", "s1")["history"] == [
+        {"role": "user", "content": "remote"}, {"role": "assistant", "content": "Sure."},
+    ]
+
+
+@pytest.mark.asyncio
+async def test_chats_with_context_are_cached_per_history():
+    service = LyzrAPIService()
+    calls = []
+
+    async def upstream(agent_id, message, context=None):
+        calls.append(context)
+        await asyncio.sleep(0.01)
+        return {"response": f"answer {len(calls)}", "confidence_score": 0.9}
+
+    service._chat_with_agent = upstream
+    first = {"history": [{"role": "user", "content": "hi"}, {"role": "assistant", "content": "hello"}]}
+    second = {"history": [{"role": "user", "content": "bye"}, {"role": "assistant", "content": "ciao"}]}
+
+    results = await asyncio.gather(*(service.chat_with_agent("agent_1", "Where is my order?", first)
+                                     for _ in range(3)))
+    assert [result["response"] for result in results] == ["answer 1"] * 3
+    assert (await service.chat_with_agent("agent_1", "where is my order", dict(first)))["response"] == "answer 1"
+    assert (await service.chat_with_agent("agent_1", "Where is my order?", second))["response"] == "answer 2"
+    assert calls == [first, second]
+    assert chat_cache_key("agent_1", "hi", first) != chat_cache_key("agent_1", "hi")
+
+
+def test_answered_turn_is_context_for_the_next_message(client, ready_agent, monkeypatch):
+    agent = ready_agent()
+    session = f"session_{uuid.uuid4().hex[:8]}"
+    contexts = []
+    chat = main.lyzr_service.chat_with_agent
+
+    async def spy(agent_id, message, context=None):
+        contexts.append(context)
+        return await chat(agent_id, message, context)
+
+    monkeypatch.setattr(main.lyzr_service, "chat_with_agent", spy)
+    for message in ("What are your hours?", "And on Sunday?"):
+        response = client.post("/api/chat", json={"agent_id": agent["id"], "message": message,
+                                                   "user_session": session})
+        assert response.status_code == 200
+    assert contexts[0] is None
+    assert contexts[1]["history"][0] == {"role": "user", "content": "What are your hours?"}
+    assert len(contexts[1]["history"]) == 2
+
+
+def test_fallback_reply_is_not_recorded_as_a_turn(client, ready_agent, monkeypatch):
+    agent = ready_agent()
+    session = f"session_{uuid.uuid4().hex[:8]}"
+
+    async def unavailable(agent_id, message, context=None):
+        raise LyzrUnavailableError(status_code=503, detail="Lyzr is unavailable")
+
+    monkeypatch.setattr(main.lyzr_service, "chat_with_agent", unavailable)
+    response = client.post("/api/chat", json={"agent_id": agent["id"], "message": "Hello?",
+                                               "user_session": session})
+    assert response.json()["response"] == main.FALLBACK_RESPONSE["response"]
+    assert main.conversations.context(agent["id"], session) is None
@@ -0,0 +1,109 @@
+import json
+import uuid
+
+import pytest
+from starlette.websockets import WebSocketDisconnect
+
+from services.agent_configs import AgentConfigCache
+from services.analytics import OverviewStats
+from services.events import EventHub, RESYNC
+from services.store import IndexedStore
+
+
+def make_hub(queue_size=100):
+    agents = IndexedStore("agent_{:04d}", indexes=["user_id"])
+    tickets = IndexedStore("ticket_{:04d}", indexes=["agent_id"])
+    chats = IndexedStore("chat_{:04d}")
+    hub = EventHub(tickets, agents, OverviewStats(agents, tickets, chats), AgentConfigCache(agents),
+                   queue_size=queue_size)
+    return hub, agents, tickets
+
+
+def add_agent(agents, user_id):
+    agent = {"id": agents.next_id(), "name": "Helper", "user_id": user_id, "lyzr_agent_id": "lyzr_1",
+             "is_active": True, "status": "ready"}
+    agents.insert(agent)
+    return agent
+
+
+def add_ticket(tickets, agent_id, status="open"):
+    ticket = {"id": tickets.next_id(), "agent_id": agent_id, "status": status}
+    tickets.insert(ticket)
+    return ticket
+
+
+def drain(subscription):
+    messages = []
+    while not subscription.queue.empty():
+        messages.append(json.loads(subscription.queue.get_nowait()))
+    return messages
+
+
+def test_record_events_reach_only_matching_subscribers():
+    hub, agents, tickets = make_hub()
+    mine, other = add_agent(agents, "user_1"), add_agent(agents, "user_2")
+    everything = hub.subscribe(["tickets", "agents"])
+    by_agent = hub.subscribe(["tickets"], agent_ids=[mine["id"]])
+    by_user = hub.subscribe(["tickets", "agents"], user_id="user_1")
+
+    ticket = add_ticket(tickets, mine["id"])
+    add_ticket(tickets, other["id"])
+    tickets.update(ticket["id"], {"status": "resolved"})
+    agents.update(mine["id"], {"name": "Renamed"})
+
+    assert [message["type"] for message in drain(everything)] == [
+        "ticket.insert", "ticket.insert", "ticket.update", "agent.update",
+    ]
+    assert [(message["type"], message["ticket"]["id"]) for message in drain(by_agent)] == [
+        ("ticket.insert", ticket["id"]), ("ticket.update", ticket["id"]),
+    ]
+    assert [message["type"] for message in drain(by_user)] == ["ticket.insert", "ticket.update", "agent.update"]
+
+    hub.unsubscribe(by_agent)
+    add_ticket(tickets, mine["id"])
+    assert drain(by_agent) == []
+    assert hub.stats()["subscribers"] == 2
+
+
+def test_overview_starts_full_then_sends_only_changed_fields():
+    hub, agents, tickets = make_hub()
+    agent = add_agent(agents, "user_1")
+    subscription = hub.subscribe(["overview"])
+    first = drain(subscription)
+    assert first[0]["type"] == "overview" and first[0]["overview"]["total_agents"] == 1
+
+    hub.push_overview()
+    assert drain(subscription) == []
+    add_ticket(tickets, agent["id"])
+    hub.push_overview()
+    assert drain(subscription) == [{"type": "overview.delta", "changes": {"total_tickets": 1, "open_tickets": 1}}]
+
+
+def test_subscriber_that_falls_behind_gets_one_resync():
+    hub, agents, tickets = make_hub(queue_size=3)
+    agent = add_agent(agents, "user_1")
+    subscription = hub.subscribe(["tickets"])
+    for _ in range(5):
+        add_ticket(tickets, agent["id"])
+    assert subscription.queue.get_nowait() == RESYNC
+    assert [message["type"] for message in drain(subscription)] == ["ticket.insert"]
+    assert hub.stats()["dropped"] == 3
+
+
+def test_websocket_pushes_ticket_events_for_the_selected_agent(client, ready_agent):
+    agent = ready_agent()
+    with client.websocket_connect(f"/api/events/ws?topics=tickets&agent_id={agent['id']}") as websocket:
+        response = client.post("/api/tickets", json={"agent_id": agent["id"], "question": "Refund?",
+                                                     "user_session": f"session_{uuid.uuid4().hex[:8]}",
+                                                     "confidence_score": 0.2})
+        assert response.status_code == 200
+        message = websocket.receive_json()
+        assert message["type"] == "ticket.insert"
+        assert message["ticket"]["question"] == "Refund?"
+
+
+def test_websocket_rejects_unknown_topics(client):
+    with pytest.raises(WebSocketDisconnect) as closed:
+        with client.websocket_connect("/api/events/ws?topics=tickets,secrets") as websocket:
+            websocket.receive_json()
+    assert closed.value.code == 1008
@@ -0,0 +1,65 @@
+import json
+
+import pytest
+
+from services.export import export_records
+from services.store import IndexedStore
+
+
+def make_store():
+    store = IndexedStore("ticket_{:04d}", indexes=["status"])
+    for second in range(50):
+        store.insert({
+            "id": store.next_id(),
+            "status": "open" if second % 2 else "resolved",
+            "created_at": f"2026-01-01T00:00:{second:02d}",
+        })
+    return store
+
+
+async def exported(store, **options):
+    lines = []
+    async for chunk in export_records(store, ["id", "created_at"], chunk_size=7, **options):
+        lines.extend(json.loads(line)["id"] for line in chunk.splitlines())
+    return lines
+
+
+@pytest.mark.asyncio
+async def test_date_range_is_start_inclusive_and_end_exclusive():
+    store = make_store()
+    ids = await exported(store, start="2026-01-01T00:00:10", end="2026-01-01T00:00:20")
+    assert ids == [f"ticket_{number:04d}" for number in range(11, 21)]
+
+
+@pytest.mark.asyncio
+async def test_date_range_combines_with_filters():
+    store = make_store()
+    ids = await exported(store, start="2026-01-01T00:00:10", end="2026-01-01T00:00:20", status="open")
+    assert ids == [f"ticket_{number:04d}" for number in range(12, 21, 2)]
+
+
+@pytest.mark.asyncio
+async def test_open_ended_ranges():
+    store = make_store()
+    assert len(await exported(store)) == 50
+    assert await exported(store, start="2026-01-01T00:00:48") == ["ticket_0049", "ticket_0050"]
+    assert await exported(store, end="2026-01-01T00:00:02") == ["ticket_0001", "ticket_0002"]
+    assert await exported(store, start="2027-01-01") == []
+
+
+@pytest.mark.asyncio
+async def test_range_holds_when_timestamps_run_out_of_sequence_order():
+    store = IndexedStore("ticket_{:04d}")
+    # Clock set back an hour after the third record
+    for created_at in ["2026-01-01T01:50:00", "2026-01-01T01:55:00", "2026-01-01T01:59:00",
+                       "2026-01-01T01:00:00", "2026-01-01T01:05:00", "2026-01-01T02:10:00"]:
+        store.insert({"id": store.next_id(), "created_at": created_at})
+    assert await exported(store, start="2026-01-01T01:00:00", end="2026-01-01T01:10:00") == [
+        "ticket_0004", "ticket_0005",
+    ]
+    assert await exported(store, start="2026-01-01T01:52:00", end="2026-01-01T02:00:00") == [
+        "ticket_0002", "ticket_0003",
+    ]
+    assert await exported(store, start="2026-01-01T01:58:00") == ["ticket_0003", "ticket_0006"]
+    # Without allowing for the skew the seek lands past ticket_0003
+    assert await exported(store, start="2026-01-01T01:58:00", clock_skew=0) == ["ticket_0006"]
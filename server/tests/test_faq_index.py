@@ -0,0 +1,90 @@
+import pytest
+
+from services.faq_index import AgentFAQ, FAQIndex, knowledge_entry, vectorize
+from services.store import IndexedStore
+
+
+def test_entries_are_stored_sparsely():
+    faq = AgentFAQ()
+    assert faq.nbytes == 0
+    assert faq.best(*vectorize("anything")) == (None, 0.0)
+    for i in range(3):
+        faq.put(f"kb:{i}", f"How do I reset password number {i}?", f"answer {i}")
+    # A few dozen hashed features per entry at 12 bytes each, not a dense 16 KB column
+    assert 0 < faq.nbytes < 3 * 2048
+    answer, similarity = faq.best(*vectorize("how do i reset password number 2"))
+    assert answer == "answer 2" and similarity > 0.99
+
+
+def test_removed_entries_never_match_and_are_compacted():
+    faq = AgentFAQ()
+    faq.put("ticket:a", "Shipping takes three days", "a")
+    faq.put("ticket:b", "Refunds take a week", "b")
+    faq.put("ticket:c", "Cancel any time from settings", "c")
+    faq.remove("ticket:a")
+    assert faq.best(*vectorize("shipping takes three days"))[0] != "a"
+    size = faq.nbytes
+    faq.remove("ticket:b")
+    # More dead pairs than live ones: the arrays shrink to the live entry
+    assert faq.nbytes < size
+    assert len(faq) == 1
+    assert faq.best(*vectorize("cancel any time from settings"))[0] == "c"
+    faq.put("ticket:a", "Shipping takes three days", "a again")
+    assert faq.best(*vectorize("shipping takes three days"))[0] == "a again"
+
+
+def test_replacing_an_entry_keeps_one_copy():
+    faq = AgentFAQ()
+    faq.put("ticket:a", "Where is my order?", "old answer")
+    faq.put("ticket:a", "Where is my order?", "new answer")
+    assert len(faq) == 1
+    assert faq.best(*vectorize("where is my order"))[0] == "new answer"
+
+
+def test_least_recently_indexed_entries_are_evicted_beyond_the_cap():
+    faq = AgentFAQ(max_entries=3)
+    for i in range(5):
+        faq.put(f"ticket:{i}", f"Question about invoice {i} and billing", f"answer {i}")
+    assert len(faq) == 3 and faq.evicted == 2
+    assert faq.best(*vectorize("question about invoice 0 and billing"))[0] != "answer 0"
+    assert faq.best(*vectorize("question about invoice 4 and billing"))[0] == "answer 4"
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("Q: How do I reset my password? A: Use the reset link.", ("How do I reset my password?", "Use the reset link.")),
+    ("Do you ship abroad? Yes, to 40 countries.", ("Do you ship abroad?", "Yes, to 40 countries.")),
+    ("faq.md", None),
+    ("https://cdn.example.com/kb/manual.pdf?version=2", None),
+    ("Returns are accepted within 30 days", None),
+    ("Is it free? 42", None),
+])
+def test_only_question_and_answer_text_is_a_knowledge_entry(text, expected):
+    assert knowledge_entry(text) == expected
+
+
+def test_knowledge_base_questions_are_answered_with_their_answer():
+    agents = IndexedStore("agent_{:04d}")
+    index = FAQIndex(agents, IndexedStore("ticket_{:04d}"), min_similarity=0.8)
+    agents.insert({"id": "agent_0001", "knowledge_base": [
+        "faq.md", "Q: How do I reset my password? A: Use the reset link on the login page.",
+    ]})
+    assert index.stats()["entries"] == 1
+    reply = index.match("agent_0001", "how do I reset my password")
+    assert reply["response"] == "Use the reset link on the login page."
+    assert index.match("agent_0001", "faq.md") is None
+
+
+def test_resolved_tickets_answer_repeat_questions():
+    agents = IndexedStore("agent_{:04d}")
+    tickets = IndexedStore("ticket_{:04d}", indexes=["agent_id"])
+    index = FAQIndex(agents, tickets, min_similarity=0.8)
+    agents.insert({"id": "agent_0001", "knowledge_base": []})
+    assert index.stats()["agents"] == 0
+    tickets.insert({"id": "ticket_0001", "agent_id": "agent_0001", "question": "How do I change my email address?",
+                    "status": "open", "manual_response": None})
+    assert index.match("agent_0001", "How do I change my email address?") is None
+    tickets.update("ticket_0001", {"status": "resolved", "manual_response": "Use Settings > Account."})
+    reply = index.match("agent_0001", "how do i change my email address")
+    assert reply["response"] == "Use Settings > Account." and reply["source"] == "faq"
+    agents.delete("agent_0001")
+    assert index.match("agent_0001", "how do i change my email address") is None
@@ -0,0 +1,98 @@
+import os
+
+import pytest
+
+from services.journal import StoreJournal
+from services.store import IndexedStore
+
+
+def new_store():
+    return IndexedStore("ticket_{:04d}", indexes=["status"])
+
+
+def fill(store, count):
+    for i in range(count):
+        store.insert({"id": store.next_id(), "status": "open", "question": f"Question {i}"})
+
+
+def reload(directory):
+    store = new_store()
+    journal = StoreJournal(str(directory), {"tickets": store})
+    journal.load()
+    return store, journal
+
+
+@pytest.mark.asyncio
+async def test_crash_is_recovered_from_snapshot_plus_log(tmp_path):
+    store = new_store()
+    journal = StoreJournal(str(tmp_path), {"tickets": store}, fsync=False)
+    await journal.start()
+    fill(store, 5)
+    await journal.snapshot()
+    store.update("ticket_0002", {"status": "resolved"})
+    store.delete("ticket_0005")
+    fill(store, 1)
+    await journal.flush()
+
+    # No close(): the snapshot plus the log written since must give the same state
+    restored, reloaded = reload(tmp_path)
+    assert restored.values() == store.values()
+    assert restored.find(status="resolved")[0]["id"] == "ticket_0002"
+    assert restored.id_counter == 6
+    assert reloaded.replayed_writes == 3
+    await journal.close()
+
+
+@pytest.mark.asyncio
+async def test_clean_shutdown_leaves_only_a_snapshot(tmp_path):
+    store = new_store()
+    journal = StoreJournal(str(tmp_path), {"tickets": store}, fsync=False)
+    await journal.start()
+    fill(store, 3)
+    store.delete("ticket_0003")
+    await journal.close()
+
+    assert sorted(os.listdir(tmp_path)) == ["snapshot-00000002.jsonl"]
+    restored, reloaded = reload(tmp_path)
+    assert restored.values() == store.values()
+    # Deleted ids are not handed out again after a restart
+    assert restored.id_counter == 3
+    assert reloaded.replayed_writes == 0
+
+
+@pytest.mark.asyncio
+async def test_torn_last_line_is_skipped(tmp_path):
+    store = new_store()
+    journal = StoreJournal(str(tmp_path), {"tickets": store}, fsync=False)
+    await journal.start()
+    fill(store, 2)
+    await journal.flush()
+    with open(journal._file.name, "ab") as segment:
+        segment.write(b'["tickets", "put", {"id": "ticket_00')
+
+    restored, _ = reload(tmp_path)
+    assert restored.values() == store.values()
+    await journal.close()
+
+
+@pytest.mark.asyncio
+async def test_failed_append_is_retried_in_order(tmp_path, monkeypatch):
+    store = new_store()
+    journal = StoreJournal(str(tmp_path), {"tickets": store}, fsync=True)
+    await journal.start()
+    fill(store, 2)
+
+    def failing_fsync(fd):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(os, "fsync", failing_fsync)
+    await journal.flush()
+    assert journal.stats()["pending"] == 2 and journal.errors == 1
+    monkeypatch.undo()
+
+    store.update("ticket_0001", {"status": "resolved"})
+    await journal.flush()
+    assert journal.stats()["pending"] == 0
+    restored, _ = reload(tmp_path)
+    assert restored.values() == store.values()
+    await journal.close()
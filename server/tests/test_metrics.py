@@ -0,0 +1,30 @@
+from services.metrics import Counter, Histogram
+
+
+def test_histogram_buckets_sum_and_count():
+    histogram = Histogram("latency_seconds", "Latency", ["route"], buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 0.5, 2.0):
+        histogram.observe(value, route="/a")
+    assert histogram.count(route="/a") == 4
+    assert histogram.mean(route="/a") == 0.7625
+    assert histogram.quantile(0.5, route="/a") == 1.0
+    rendered = histogram.render()
+    assert 'latency_seconds_bucket{route="/a",le="0.1"} 1' in rendered
+    assert 'latency_seconds_bucket{route="/a",le="+Inf"} 4' in rendered
+
+
+def test_histogram_series_can_be_removed():
+    histogram = Histogram("agent_response_seconds", "Reply time", ["agent_id"])
+    histogram.observe(0.2, agent_id="agent_0001")
+    histogram.observe(0.3, agent_id="agent_0002")
+    assert histogram.remove(agent_id="agent_0001")
+    assert not histogram.remove(agent_id="agent_0001")
+    assert histogram.mean(agent_id="agent_0001") is None
+    assert "agent_0001" not in histogram.render()
+    assert "agent_0002" in histogram.render()
+
+
+def test_label_values_are_escaped():
+    counter = Counter("requests_total", "Requests", ["path"])
+    counter.inc(path='say "hi"\n')
+    assert 'requests_total{path="say \\"hi\\"\\n"} 1' in counter.render()
@@ -0,0 +1,89 @@
+import uuid
+from datetime import datetime
+
+import pytest
+
+import main
+from services.pagination import NEXT_CURSOR_HEADER, parse_fields, project
+
+
+@pytest.fixture
+def agent_tickets():
+    """Seven tickets of a fresh agent, every third one resolved"""
+    agent_id = f"agent_{uuid.uuid4().hex[:8]}"
+    ids = []
+    for i in range(7):
+        now = datetime.now().isoformat()
+        ticket = {"id": main.tickets.next_id(), "agent_id": agent_id, "question": f"Question {i}",
+                  "user_session": "session_1", "status": "resolved" if i % 3 == 0 else "open",
+                  "confidence_score": 0.4, "manual_response": None, "created_at": now, "updated_at": now}
+        main.tickets.insert(ticket)
+        ids.append(ticket["id"])
+    return agent_id, ids
+
+
+def pages(client, **params):
+    """Follow X-Next-Cursor through every page; returns the pages' ids"""
+    result, cursor = [], None
+    while True:
+        response = client.get("/api/tickets", params={**params, **({"cursor": cursor} if cursor else {})})
+        assert response.status_code == 200
+        result.append([ticket["id"] for ticket in response.json()])
+        cursor = response.headers.get(NEXT_CURSOR_HEADER)
+        if cursor is None:
+            return result
+
+
+def test_pages_follow_the_cursor_in_either_order(client, agent_tickets):
+    agent_id, ids = agent_tickets
+    assert pages(client, agent_id=agent_id, limit=3) == [ids[0:3], ids[3:6], ids[6:]]
+    assert pages(client, agent_id=agent_id, limit=3, sort="-created_at") == [
+        ids[6:3:-1], ids[3:0:-1], ids[0:1],
+    ]
+    assert pages(client, agent_id=agent_id, status="open", limit=2) == [
+        [ids[1], ids[2]], [ids[4], ids[5]],
+    ]
+
+
+def test_without_limit_every_match_is_returned_without_a_cursor(client, agent_tickets):
+    agent_id, ids = agent_tickets
+    response = client.get("/api/tickets", params={"agent_id": agent_id})
+    assert [ticket["id"] for ticket in response.json()] == ids
+    assert NEXT_CURSOR_HEADER not in response.headers
+
+
+def test_new_tickets_do_not_shift_later_pages(client, agent_tickets):
+    agent_id, ids = agent_tickets
+    first = client.get("/api/tickets", params={"agent_id": agent_id, "limit": 4})
+    cursor = first.headers[NEXT_CURSOR_HEADER]
+    now = datetime.now().isoformat()
+    main.tickets.insert({"id": main.tickets.next_id(), "agent_id": agent_id, "question": "Late",
+                         "user_session": "session_1", "status": "open", "confidence_score": 0.4,
+                         "manual_response": None, "created_at": now, "updated_at": now})
+    second = client.get("/api/tickets", params={"agent_id": agent_id, "limit": 4, "cursor": cursor})
+    assert [ticket["id"] for ticket in second.json()][:3] == ids[4:]
+
+
+def test_fields_projects_each_record(client, agent_tickets):
+    agent_id, ids = agent_tickets
+    response = client.get("/api/tickets", params={"agent_id": agent_id, "limit": 2, "fields": "id,status"})
+    assert response.json() == [{"id": ids[0], "status": "resolved"}, {"id": ids[1], "status": "open"}]
+
+
+@pytest.mark.parametrize("params, detail", [
+    ({"fields": "id,secret"}, "Unknown fields: secret"),
+    ({"cursor": "not a cursor!"}, "Invalid cursor"),
+    ({"sort": "status"}, "sort must be one of: created_at, -created_at"),
+])
+def test_bad_parameters_are_rejected(client, params, detail):
+    response = client.get("/api/tickets", params=params)
+    assert response.status_code == 400
+    assert response.json()["detail"] == detail
+
+
+def test_parse_fields_and_project():
+    assert parse_fields(None, ["id"]) is None
+    assert parse_fields(" id , status ,", ["id", "status"]) == ["id", "status"]
+    record = {"id": "ticket_1", "status": "open", "question": "?"}
+    assert project(record, None) is record
+    assert project(record, ["status", "missing"]) == {"status": "open", "missing": None}
@@ -0,0 +1,114 @@
+import pytest
+
+from app.database import create_engine_from_env
+from app.models import Agent, ChatSession, Ticket
+from services.persistence import SQLPersistence
+from services.store import IndexedStore
+
+
+def make_stores():
+    return {
+        Agent: IndexedStore("agent_{:04d}", indexes=["user_id"]),
+        Ticket: IndexedStore("ticket_{:04d}", indexes=["agent_id", "status", "user_session"]),
+        ChatSession: IndexedStore("chat_{:04d}", indexes=["agent_id", "user_session"]),
+    }
+
+
+def ticket(store, question, created_at="2026-01-01T10:00:00"):
+    return {
+        "id": store.next_id(), "agent_id": "agent_0001", "question": question, "user_session": "session_1",
+        "status": "open", "confidence_score": 0.4, "manual_response": None,
+        "created_at": created_at, "updated_at": created_at,
+    }
+
+
+def make_persistence(url, stores, **options):
+    return SQLPersistence(create_engine_from_env(url), stores, auto_create=True, flush_interval=3600, **options)
+
+
+@pytest.mark.asyncio
+async def test_writes_round_trip_through_sqlite(tmp_path):
+    url = f"sqlite:///{tmp_path}/support.db"
+    stores = make_stores()
+    persistence = make_persistence(url, stores)
+    await persistence.start()
+    agents, tickets, chats = stores[Agent], stores[Ticket], stores[ChatSession]
+    agents.insert({
+        "id": agents.next_id(), "name": "Helper", "description": "Answers questions", "tone": "friendly",
+        "personality": "patient", "knowledge_base": ["faq.md"], "lyzr_agent_id": None, "user_id": "user_1",
+        "is_active": True, "status": "ready",
+        "created_at": "2026-01-01T09:00:00", "updated_at": "2026-01-01T09:00:00",
+    })
+    for i in range(3):
+        tickets.insert(ticket(tickets, f"Question {i}", f"2026-01-01T10:00:0{i}"))
+    chats.insert({
+        "id": chats.next_id(), "agent_id": "agent_0001", "user_session": "session_1", "message": "Hi",
+        "response": "Hello", "confidence_score": 0.9, "response_time": 0.25, "created_at": "2026-01-01T10:00:00",
+    })
+    tickets.update("ticket_0002", {"status": "resolved", "manual_response": "Done"})
+    tickets.delete("ticket_0003")
+    await persistence.close()
+    assert persistence.stats()["pending"] == 0
+
+    restored = make_stores()
+    reloaded = make_persistence(url, restored)
+    await reloaded.start()
+    for model, store in stores.items():
+        assert restored[model].values() == store.values()
+    assert restored[Ticket].find(status="resolved")[0]["manual_response"] == "Done"
+    await reloaded.close()
+
+
+@pytest.mark.asyncio
+async def test_rejected_row_is_dropped_after_max_retries(tmp_path):
+    stores = make_stores()
+    persistence = make_persistence(f"sqlite:///{tmp_path}/support.db", stores, max_retries=2)
+    await persistence.start()
+    tickets = stores[Ticket]
+    tickets.insert(ticket(tickets, "First"))
+    tickets.insert(ticket(tickets, None))  # violates NOT NULL
+    tickets.insert(ticket(tickets, "Third"))
+
+    await persistence.flush()
+    assert persistence.stats()["pending"] == 3
+    await persistence.flush()
+    stats = persistence.stats()
+    assert (stats["pending"], stats["dropped"], stats["rows_written"]) == (0, 1, 2)
+
+    # Later writes are no longer held up
+    tickets.insert(ticket(tickets, "Fourth"))
+    await persistence.close()
+    restored = make_stores()
+    reloaded = make_persistence(f"sqlite:///{tmp_path}/support.db", restored)
+    await reloaded.load()
+    assert [record["question"] for record in restored[Ticket].values()] == ["First", "Third", "Fourth"]
+    await reloaded.engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_ids_of_deleted_records_are_not_reused_after_a_restart(tmp_path):
+    url = f"sqlite:///{tmp_path}/support.db"
+    stores = make_stores()
+    persistence = make_persistence(url, stores)
+    await persistence.start()
+    tickets = stores[Ticket]
+    for i in range(3):
+        tickets.insert(ticket(tickets, f"Question {i}"))
+    await persistence.flush()
+    tickets.delete("ticket_0003")
+    tickets.delete("ticket_0002")
+    await persistence.close()
+
+    restored = make_stores()
+    reloaded = make_persistence(url, restored)
+    await reloaded.start()
+    assert [record["id"] for record in restored[Ticket].values()] == ["ticket_0001"]
+    assert restored[Ticket].next_id() == "ticket_0004"
+    # An id allocated for a write that never came is not reused either
+    restored[Ticket].next_id()
+    await reloaded.close()
+    again = make_stores()
+    third = make_persistence(url, again)
+    await third.start()
+    assert again[Ticket].next_id() == "ticket_0006"
+    await third.close()
@@ -0,0 +1,122 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+from services.provisioning import FAILED, PROVISIONING, QUEUED, READY, ProvisioningQueue
+from services.store import IndexedStore
+
+
+class FakeLyzr:
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.created = []
+        self.updated = []
+
+    async def create_agent(self, definition):
+        await asyncio.sleep(0)
+        if self.fail:
+            raise RuntimeError("Lyzr is down")
+        self.created.append(definition["name"])
+        return {"id": f"lyzr_{len(self.created)}"}
+
+    async def update_agent(self, agent_id, definition):
+        self.updated.append(agent_id)
+        return {"id": agent_id}
+
+    async def delete_agent(self, agent_id):
+        return {"id": agent_id, "status": "deleted"}
+
+
+def make_stores():
+    return IndexedStore("agent_{:04d}", indexes=["user_id"]), IndexedStore("job_{:04d}", indexes=["agent_id", "status"])
+
+
+def add_agent(agents, name="Helper", status=PROVISIONING, lyzr_agent_id=None):
+    now = datetime.now().isoformat()
+    return agents.insert({
+        "id": agents.next_id(), "name": name, "description": "d", "tone": "t", "personality": "p",
+        "knowledge_base": [], "lyzr_agent_id": lyzr_agent_id, "user_id": "user_1", "is_active": True,
+        "status": status, "created_at": now, "updated_at": now,
+    })
+
+
+def add_job(jobs, agent_id, status=QUEUED, age=0):
+    stamp = (datetime.now() - timedelta(seconds=age)).isoformat()
+    return jobs.insert({
+        "id": jobs.next_id(), "type": "create", "agent_id": agent_id, "user_id": "user_1", "status": status,
+        "lyzr_agent_id": None, "error": None, "created_at": stamp, "updated_at": stamp,
+    })
+
+
+@pytest.mark.asyncio
+async def test_jobs_create_agents_and_coalesce_queued_changes():
+    agents, jobs = make_stores()
+    lyzr = FakeLyzr()
+    queue = ProvisioningQueue(agents, jobs, lyzr, concurrency=2)
+    await queue.start()
+    agent = add_agent(agents)
+    first = await queue.submit(agent)
+    second = await queue.submit(agent)
+    assert second["id"] == first["id"] and queue.coalesced == 1
+    await queue.close()
+    assert agents.get(agent["id"])["status"] == READY
+    assert agents.get(agent["id"])["lyzr_agent_id"] == "lyzr_1"
+    assert jobs.get(first["id"])["status"] == "succeeded"
+    assert lyzr.created == ["Helper"]
+
+
+@pytest.mark.asyncio
+async def test_failed_create_marks_the_agent_failed():
+    agents, jobs = make_stores()
+    queue = ProvisioningQueue(agents, jobs, FakeLyzr(fail=True))
+    job = await queue.submit(add_agent(agents))
+    assert job["status"] == FAILED and "Lyzr is down" in job["error"]
+    assert agents.get(job["agent_id"])["status"] == FAILED
+
+
+@pytest.mark.asyncio
+async def test_recover_resubmits_abandoned_agents_only():
+    agents, jobs = make_stores()
+    lyzr = FakeLyzr()
+    orphan = add_agent(agents, "Orphan")
+    stale = add_agent(agents, "Stale")
+    stale_job = add_job(jobs, stale["id"], age=3600)
+    busy = add_agent(agents, "Busy")
+    add_job(jobs, busy["id"], age=1)
+    add_agent(agents, "Ready", status=READY, lyzr_agent_id="lyzr_ready")
+
+    queue = ProvisioningQueue(agents, jobs, lyzr, stale_after=600)
+    await queue.start()
+    await queue.close()
+    assert queue.recovered == 2
+    assert sorted(lyzr.created) == ["Orphan", "Stale"]
+    assert jobs.get(stale_job["id"])["status"] == FAILED
+    assert agents.get(orphan["id"])["status"] == READY
+    assert agents.get(busy["id"])["status"] == PROVISIONING
+
+
+@pytest.mark.asyncio
+async def test_workers_starting_together_recover_each_agent_once():
+    # Two workers sharing state whose job records have not reached each other yet
+    agents, _ = make_stores()
+    for i in range(5):
+        add_agent(agents, f"Agent {i}")
+    leases = set()
+
+    async def lease(name, ttl):
+        if name in leases:
+            return False
+        leases.add(name)
+        return True
+
+    lyzr = FakeLyzr()
+    workers = []
+    for _ in range(2):
+        queue = ProvisioningQueue(agents, IndexedStore("job_{:04d}", indexes=["agent_id", "status"]), lyzr)
+        queue.lease = lease
+        workers.append(queue)
+    await asyncio.gather(*(queue.start() for queue in workers))
+    await asyncio.gather(*(queue.close() for queue in workers))
+    assert sorted(lyzr.created) == [f"Agent {i}" for i in range(5)]
+    assert sum(queue.recovered for queue in workers) == 5
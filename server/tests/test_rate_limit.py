@@ -0,0 +1,95 @@
+import uuid
+
+import pytest
+from fastapi import HTTPException
+
+from services.rate_limit import AdmissionControl, RateLimitedError, TokenBucketLimiter, admission
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_bucket_allows_a_burst_then_refills_at_the_rate():
+    clock = FakeClock()
+    limiter = TokenBucketLimiter("session", rate=2, burst=3, clock=clock)
+    for _ in range(3):
+        assert limiter.wait_time("a") == 0
+        limiter.take("a")
+    assert limiter.wait_time("a") == 0.5
+    clock.now = 0.5
+    assert limiter.wait_time("a") == 0
+    # Idle time never saves up more than the burst
+    clock.now = 100
+    assert limiter.wait_time("a", 3) == 0 and limiter.wait_time("a", 3.5) == 0.25
+
+
+def test_least_recently_used_keys_are_forgotten_beyond_max_keys():
+    limiter = TokenBucketLimiter("session", rate=1, burst=1, max_keys=2, clock=FakeClock())
+    for key in ("a", "b"):
+        limiter.wait_time(key)
+        limiter.take(key)
+    limiter.wait_time("a")
+    limiter.wait_time("c")
+    assert limiter.stats()["keys"] == 2
+    # "b" was dropped with its debt; "a" still owes
+    assert limiter.wait_time("a") == 1 and limiter.wait_time("b") == 0
+
+
+def test_admission_charges_every_scope_or_none():
+    clock = FakeClock()
+    session = TokenBucketLimiter("session", rate=1, burst=5, clock=clock)
+    agent = TokenBucketLimiter("agent", rate=1, burst=1, clock=clock)
+    control = AdmissionControl([session, agent])
+    control.admit([("session", "s1"), ("agent", "a1")])
+    with pytest.raises(RateLimitedError) as error:
+        control.admit([("session", "s1"), ("agent", "a1")])
+    assert error.value.status_code == 429
+    assert error.value.scope == "agent"
+    assert error.value.headers["Retry-After"] == "1"
+    # The rejected request did not spend a session token
+    assert session.wait_time("s1", 4) == 0
+    assert (agent.allowed, agent.rejected) == (1, 1)
+
+
+def test_cost_above_the_burst_is_a_bad_request():
+    control = AdmissionControl([TokenBucketLimiter("agent_create", rate=1, burst=10, clock=FakeClock())])
+    with pytest.raises(HTTPException) as error:
+        control.admit([("agent_create", "user_1", 11)])
+    assert error.value.status_code == 400
+
+
+def test_disabled_limiters_and_missing_keys_are_skipped():
+    control = AdmissionControl([TokenBucketLimiter("user", rate=0, burst=1, clock=FakeClock())])
+    for _ in range(5):
+        control.admit([("user", "user_1")])
+    control.admit([("user", None)])
+
+
+@pytest.mark.asyncio
+async def test_acquire_waits_for_tokens_up_to_max_wait():
+    limiter = TokenBucketLimiter("batch", rate=100, burst=1)
+    control = AdmissionControl([limiter])
+    await control.acquire([("batch", "s1")], max_wait=1)
+    await control.acquire([("batch", "s1")], max_wait=1)
+    assert limiter.allowed == 2 and limiter.rejected == 0
+
+    limiter.rate = 0.1
+    with pytest.raises(RateLimitedError) as error:
+        await control.acquire([("batch", "s1")], max_wait=1)
+    assert error.value.retry_after > 1
+
+
+def test_chat_over_the_session_limit_gets_429_before_calling_lyzr(client, ready_agent):
+    agent = ready_agent()
+    message = {"agent_id": agent["id"], "message": "Hi", "user_session": f"session_{uuid.uuid4().hex[:8]}"}
+    statuses = [client.post("/api/chat", json=message).status_code
+                for _ in range(int(admission.limiters["session"].burst) + 1)]
+    assert statuses[:-1] == [200] * (len(statuses) - 1)
+    assert statuses[-1] == 429
+    response = client.post("/api/chat", json=message)
+    assert int(response.headers["Retry-After"]) >= 1
@@ -0,0 +1,117 @@
+import httpx
+import pytest
+from fastapi import HTTPException
+
+from benchmarks.fake_lyzr import make_app
+from services.lyzr_api import LyzrAPIService, LyzrUnavailableError
+from services.resilience import CircuitBreaker, RetryPolicy
+
+AGENT = {"name": "Helper", "description": "Answers questions", "tone": "friendly",
+         "personality": "patient", "knowledge_base": []}
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_service(clock=None, attempts=3, failure_threshold=5, **config):
+    """A LyzrAPIService talking to an in-process fake Lyzr API without delays"""
+    service = LyzrAPIService()
+    service.api_key = "test"
+    service.base_url = "http://fake-lyzr"
+    service.client = httpx.AsyncClient(transport=httpx.ASGITransport(app=make_app(
+        latency_ms=0, jitter_ms=0, **config
+    )))
+    service.retry_policy = RetryPolicy(attempts=attempts, base_delay=0)
+    service.breakers = {
+        operation: CircuitBreaker(failure_threshold=failure_threshold, reset_timeout=30, clock=clock or FakeClock())
+        for operation in service.breakers
+    }
+    return service
+
+
+async def upstream_calls(service):
+    response = await service.client.get(f"{service.base_url}/_stats")
+    return response.json()
+
+
+@pytest.mark.asyncio
+async def test_idempotent_call_is_retried_until_attempts_run_out():
+    service = make_service(error_rate=1.0, error_status=503)
+    with pytest.raises(LyzrUnavailableError) as error:
+        await service.update_agent("agent_1", AGENT)
+    assert error.value.status_code == 503
+    assert (await upstream_calls(service))["update_agent"] == 3
+
+
+@pytest.mark.asyncio
+async def test_retry_recovers_from_a_transient_failure():
+    service = make_service()
+    calls = 0
+    original = service.client.request
+
+    async def flaky(*args, **kwargs):
+        nonlocal calls
+        calls += 1
+        if calls == 1:
+            raise httpx.ConnectError("connection refused")
+        return await original(*args, **kwargs)
+
+    service.client.request = flaky
+    result = await service.update_agent("agent_1", AGENT)
+    assert result["status"] == "updated"
+    assert calls == 2
+
+
+@pytest.mark.asyncio
+async def test_non_idempotent_call_is_not_retried_after_reaching_upstream():
+    service = make_service(error_rate=1.0, error_status=503)
+    with pytest.raises(LyzrUnavailableError):
+        await service.create_agent(AGENT)
+    assert (await upstream_calls(service))["create_agent"] == 1
+
+
+@pytest.mark.asyncio
+async def test_breaker_opens_fails_fast_and_closes_after_a_successful_probe():
+    clock = FakeClock()
+    service = make_service(clock=clock, attempts=1, failure_threshold=2, error_rate=1.0, error_status=503)
+    for _ in range(2):
+        with pytest.raises(LyzrUnavailableError):
+            await service.update_agent("agent_1", AGENT)
+    breaker = service.breakers["agents"]
+    assert breaker.state == CircuitBreaker.OPEN
+
+    # Open: rejected without reaching upstream
+    with pytest.raises(LyzrUnavailableError) as error:
+        await service.update_agent("agent_1", AGENT)
+    assert "circuit open" in error.value.detail
+    assert (await upstream_calls(service))["update_agent"] == 2
+
+    # After the reset timeout one probe goes through; its success closes the circuit
+    await service.client.put(f"{service.base_url}/_config", json={"error_rate": 0.0})
+    clock.now = 30
+    assert (await service.update_agent("agent_1", AGENT))["status"] == "updated"
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.times_opened == 1
+
+
+@pytest.mark.asyncio
+async def test_client_errors_do_not_trip_the_breaker():
+    service = make_service(attempts=1, failure_threshold=2, error_rate=1.0, error_status=400)
+    for _ in range(3):
+        with pytest.raises(HTTPException) as error:
+            await service.update_agent("agent_1", AGENT)
+        assert not isinstance(error.value, LyzrUnavailableError)
+        assert error.value.status_code == 400
+    assert service.breakers["agents"].state == CircuitBreaker.CLOSED
+
+
+def test_pool_stats_survive_a_transport_without_httpcore_internals():
+    service = make_service()
+    stats = service.pool_stats()
+    assert (stats["connections"], stats["active"], stats["idle"], stats["waiting"]) == (None, None, None, None)
+    assert stats["max_connections"] == service.limits.max_connections
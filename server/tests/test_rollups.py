@@ -0,0 +1,104 @@
+from datetime import datetime, timedelta
+
+from services.rollups import Rollups, LatencySketch
+from services.store import IndexedStore
+
+
+def make_rollups(**retention_hours):
+    tickets = IndexedStore("ticket_{:04d}", indexes=["agent_id"])
+    chats = IndexedStore("chat_{:04d}", indexes=["agent_id"])
+    retention = {"minute": 2 * 3600, "hour": 48 * 3600, "day": None}
+    retention.update({resolution: hours * 3600 for resolution, hours in retention_hours.items()})
+    return tickets, chats, Rollups(tickets, chats, retention=retention)
+
+
+def chat(store, created_at, agent_id="agent_1", confidence=0.8, response_time=0.5):
+    record = {"id": store.next_id(), "agent_id": agent_id, "confidence_score": confidence,
+              "response_time": response_time, "created_at": created_at}
+    store.insert(record)
+    return record
+
+
+def test_chats_are_summed_per_bucket_agent_and_resolution():
+    _, chats, rollups = make_rollups()
+    chat(chats, "2026-01-01T10:00:10", confidence=0.6)
+    chat(chats, "2026-01-01T10:00:50", confidence=1.0)
+    chat(chats, "2026-01-01T10:01:00", agent_id="agent_2")
+
+    minutes = rollups.series("minute", datetime(2026, 1, 1, 10), datetime(2026, 1, 1, 10, 2), "agent_1")
+    assert [point["chats"] for point in minutes["points"]] == [2, 0]
+    assert minutes["points"][0]["average_confidence"] == 0.8
+    hours = rollups.series("hour", datetime(2026, 1, 1, 10), datetime(2026, 1, 1, 11))
+    assert hours["total"]["chats"] == 3
+    assert abs(hours["total"]["response_time_p95"] - 0.5) < 0.02
+
+
+def test_ticket_resolution_counts_in_the_bucket_it_happened():
+    tickets, _, rollups = make_rollups()
+    ticket = {"id": tickets.next_id(), "agent_id": "agent_1", "status": "open",
+              "created_at": "2026-01-01T10:00:00", "updated_at": "2026-01-01T10:00:00"}
+    tickets.insert(ticket)
+    tickets.update(ticket["id"], {"status": "resolved", "updated_at": "2026-01-01T12:30:00"})
+    hours = rollups.series("hour", datetime(2026, 1, 1, 10), datetime(2026, 1, 1, 13), "agent_1")
+    assert [point["tickets_created"] for point in hours["points"]] == [1, 0, 0]
+    assert [point["tickets_resolved"] for point in hours["points"]] == [0, 0, 1]
+
+    tickets.update(ticket["id"], {"status": "open", "updated_at": "2026-01-01T12:45:00"})
+    hours = rollups.series("hour", datetime(2026, 1, 1, 10), datetime(2026, 1, 1, 13), "agent_1")
+    assert hours["total"]["tickets_resolved"] == 0
+
+
+def test_writes_to_old_records_do_not_revive_pruned_buckets():
+    tickets, chats, rollups = make_rollups(minute=1)
+    old = chat(chats, "2026-01-01T08:00:00")
+    ticket = {"id": tickets.next_id(), "agent_id": "agent_1", "status": "resolved",
+              "created_at": "2026-01-01T08:00:00", "updated_at": "2026-01-01T08:05:00"}
+    tickets.insert(ticket)
+    chat(chats, "2026-01-01T10:00:00")
+    minute_buckets = rollups.stats()["minute_buckets"]
+
+    chats.update(old["id"], {"confidence_score": 0.1})
+    chats.delete(old["id"])
+    tickets.delete(ticket["id"])
+    assert rollups.stats()["minute_buckets"] == minute_buckets
+    minutes = rollups.series("minute", datetime(2026, 1, 1, 8), datetime(2026, 1, 1, 8, 10))
+    assert all(point["chats"] == point["tickets_resolved"] == 0 for point in minutes["points"])
+    # Hour buckets are still kept and lose the deleted records
+    hours = rollups.series("hour", datetime(2026, 1, 1, 8), datetime(2026, 1, 1, 9))
+    assert hours["total"]["chats"] == hours["total"]["tickets_created"] == hours["total"]["tickets_resolved"] == 0
+
+
+def test_pruning_drops_every_expired_bucket_whatever_order_they_were_created_in():
+    _, chats, rollups = make_rollups(minute=1)
+    chat(chats, "2026-01-01T10:30:00")
+    # Late arrival inside the retention, created after a newer bucket
+    chat(chats, "2026-01-01T09:45:00")
+    chat(chats, "2026-01-01T10:00:00")
+    assert rollups.stats()["minute_buckets"] == 6
+    chat(chats, "2026-01-01T11:20:00")
+    # 09:45 and 10:00 are more than an hour older than 11:20, 10:30 is not
+    assert rollups.stats()["minute_buckets"] == 4
+    assert rollups.pruned == 4
+
+
+def test_oldest_follows_the_retention():
+    _, _, rollups = make_rollups(minute=2)
+    oldest = rollups.oldest("minute")
+    assert abs((datetime.now() - timedelta(hours=2) - oldest).total_seconds()) < 5
+    assert rollups.oldest("day") is None
+
+
+def test_sketch_quantiles_stay_within_the_relative_error():
+    sketch = LatencySketch()
+    for value in range(1, 1001):
+        sketch.add(value / 1000)
+    assert abs(sketch.quantile(0.5) - 0.5) / 0.5 < 0.03
+    assert abs(sketch.quantile(0.95) - 0.95) / 0.95 < 0.03
+
+
+def test_timeseries_rejects_ranges_beyond_the_retention(client):
+    start = (datetime.now() - timedelta(days=7)).isoformat()
+    response = client.get("/api/analytics/timeseries", params={"resolution": "minute", "start": start})
+    assert response.status_code == 400
+    assert "kept for 48 hours" in response.json()["detail"]
+    assert client.get("/api/analytics/timeseries", params={"resolution": "day", "start": start}).status_code == 200
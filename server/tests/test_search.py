@@ -0,0 +1,90 @@
+from services.search import SearchIndex, TextIndex, tokenize
+from services.store import IndexedStore
+
+
+def make_index():
+    store = IndexedStore("ticket_{:04d}", indexes=["status"])
+    index = TextIndex(store, ["question", "manual_response"])
+    return store, index, SearchIndex({"tickets": index})
+
+
+def add(store, question, manual_response=None):
+    record = {"id": store.next_id(), "question": question, "manual_response": manual_response}
+    store.insert(record)
+    return record["id"]
+
+
+def hit_ids(search, query):
+    _, hits = search.search(query)
+    return sorted(hit["id"] for hit in hits)
+
+
+def test_tokenize():
+    assert tokenize("Refund for INV-1042, please!") == ["refund", "for", "inv", "1042", "please"]
+
+
+def test_insert_makes_documents_searchable():
+    store, index, search = make_index()
+    first = add(store, "Where is my refund?")
+    second = add(store, "Refund charged twice", "We issued a refund")
+    add(store, "Password reset")
+    assert hit_ids(search, "refund") == [first, second]
+    # Every query term must match
+    assert hit_ids(search, "refund twice") == [second]
+    assert hit_ids(search, "shipping") == []
+    assert index.stats()["documents"] == 3
+
+
+def test_update_replaces_only_the_changed_terms():
+    store, index, search = make_index()
+    ticket = add(store, "Order arrived late")
+    postings = index.stats()["postings"]
+    store.update(ticket, {"manual_response": "Sorry, courier delay"})
+    assert hit_ids(search, "courier") == [ticket]
+    assert hit_ids(search, "order late") == [ticket]
+    assert index.stats()["postings"] == postings + 3
+
+    store.update(ticket, {"manual_response": None, "question": "Order arrived damaged"})
+    assert hit_ids(search, "courier") == []
+    assert hit_ids(search, "late") == []
+    assert hit_ids(search, "damaged") == [ticket]
+    assert index.stats()["postings"] == postings
+
+
+def test_updating_unindexed_fields_leaves_the_index_alone():
+    store, index, search = make_index()
+    ticket = add(store, "Cancel my subscription")
+    before = index.stats()
+    store.update(ticket, {"status": "resolved"})
+    assert index.stats() == before
+
+
+def test_delete_removes_postings_and_empty_terms():
+    store, index, search = make_index()
+    keep = add(store, "Cancel my subscription")
+    gone = add(store, "Cancel my order")
+    store.delete(gone)
+    assert hit_ids(search, "cancel") == [keep]
+    assert hit_ids(search, "order") == []
+    stats = index.stats()
+    assert stats["documents"] == 1
+    assert stats["terms"] == 3
+
+
+def test_results_are_ranked_and_paged_consistently():
+    store, _, search = make_index()
+    for i in range(30):
+        add(store, "refund " * (1 + i % 3) + f"ticket {i}")
+    total, first = search.search("refund", limit=10)
+    _, second = search.search("refund", limit=10, offset=10)
+    assert total == 30
+    scores = [hit["score"] for hit in first + second]
+    assert scores == sorted(scores, reverse=True)
+    assert not {hit["id"] for hit in first} & {hit["id"] for hit in second}
+
+
+def test_index_built_over_existing_records():
+    store = IndexedStore("ticket_{:04d}")
+    add(store, "Existing refund question")
+    search = SearchIndex({"tickets": TextIndex(store, ["question"])})
+    assert hit_ids(search, "refund") == ["ticket_0001"]
@@ -0,0 +1,67 @@
+import json
+import uuid
+from datetime import datetime
+
+import main
+from services.serialization import ENTRY_OVERHEAD, ResponseCache, dumps
+from services.store import IndexedStore
+
+
+def make_cache(max_bytes=1 << 20):
+    store = IndexedStore("ticket_{:04d}")
+    for i in range(3):
+        store.insert({"id": store.next_id(), "question": f"Question {i}"})
+    return store, ResponseCache(store, max_bytes=max_bytes)
+
+
+def test_cached_body_is_reused_until_the_store_is_written():
+    store, cache = make_cache()
+    assert cache.get("all") is None
+    first = cache.put("all", store.values(), {"X-Next-Cursor": "abc"})
+    hit = cache.get("all")
+    assert hit.body == first.body == dumps(store.values())
+    assert hit.headers["X-Next-Cursor"] == "abc"
+
+    store.update("ticket_0001", {"question": "Changed"})
+    assert cache.get("all") is None
+    assert cache.stats() == {"entries": 0, "bytes": 0, "hits": 1, "misses": 2, "hit_rate": 0.3333,
+                             "invalidations": 1}
+
+
+def test_least_recently_used_bodies_are_evicted_beyond_max_bytes():
+    body = dumps([{"id": "ticket_0001"}])
+    store, cache = make_cache(max_bytes=2 * (len(body) + ENTRY_OVERHEAD))
+    for key in ("a", "b"):
+        cache.put(key, [{"id": "ticket_0001"}], {})
+    cache.get("a")
+    cache.put("c", [{"id": "ticket_0001"}], {})
+    assert cache.get("b") is None
+    assert cache.get("a") is not None and cache.get("c") is not None
+    assert cache.nbytes == cache.max_bytes
+
+    # A body larger than the whole cache is served but not kept
+    response = cache.put("huge", [{"id": "x" * cache.max_bytes}], {})
+    assert json.loads(response.body)[0]["id"].startswith("x")
+    assert cache.get("huge") is None
+
+
+def test_dumps_matches_the_standard_encoder():
+    content = [{"id": "ticket_0001", "score": 0.5, "tags": ["a", "é"], "answer": None}]
+    assert json.loads(dumps(content)) == content
+
+
+def test_ticket_list_is_served_from_the_cache_and_refreshed_after_a_write(client):
+    agent_id = f"agent_{uuid.uuid4().hex[:8]}"
+    now = datetime.now().isoformat()
+    ticket = {"id": main.tickets.next_id(), "agent_id": agent_id, "question": "Refund?", "user_session": "s1",
+              "status": "open", "confidence_score": 0.3, "manual_response": None,
+              "created_at": now, "updated_at": now}
+    main.tickets.insert(ticket)
+    hits = main.ticket_pages.hits
+    first = client.get("/api/tickets", params={"agent_id": agent_id})
+    second = client.get("/api/tickets", params={"agent_id": agent_id})
+    assert second.content == first.content
+    assert main.ticket_pages.hits == hits + 1
+
+    client.put(f"/api/tickets/{ticket['id']}", params={"status": "resolved"})
+    assert client.get("/api/tickets", params={"agent_id": agent_id}).json()[0]["status"] == "resolved"
@@ -0,0 +1,74 @@
+import json
+
+import pytest
+
+from services.shared_state import RedisSharedState
+from services.store import IndexedStore
+
+
+class FakeReader:
+    """The stream and hash reads resync uses, over fixed contents"""
+
+    def __init__(self, entries, hashes):
+        self.entries = entries
+        self.hashes = hashes
+
+    async def xrange(self, stream, count=None):
+        return self.entries[:count]
+
+    async def xrevrange(self, stream, count=None):
+        return self.entries[::-1][:count]
+
+    async def hgetall(self, key):
+        return self.hashes.get(key, {})
+
+
+def make_state(tickets, entries, saved):
+    state = RedisSharedState("redis://unused", {"tickets": tickets}, prefix="test")
+    state._reader = FakeReader(entries, {"test:tickets": {record["id"]: json.dumps(record) for record in saved}})
+    return state
+
+
+@pytest.mark.asyncio
+async def test_falling_behind_the_trimmed_stream_reloads_from_the_hashes():
+    tickets = IndexedStore("ticket_{:04d}")
+    for number in (1, 2, 3):
+        tickets.insert({"id": tickets.next_id(), "status": "open"})
+    entries = [("1700000000500-0", {}), ("1700000000600-3", {})]
+    saved = [{"id": "ticket_0001", "status": "resolved"}, {"id": "ticket_0003", "status": "open"},
+             {"id": "ticket_0004", "status": "open"}]
+    state = make_state(tickets, entries, saved)
+
+    state._last_id = "1700000000600-0"
+    assert not await state._behind_stream()
+    state._last_id = "1700000000400-7"
+    assert await state._behind_stream()
+
+    await state.resync()
+    assert tickets.values() == saved
+    assert state._last_id == "1700000000600-3"
+    assert state.stats()["resyncs"] == 1
+
+
+@pytest.mark.asyncio
+async def test_resync_keeps_writes_still_in_flight_and_records_expired_from_redis():
+    tickets = IndexedStore("ticket_{:04d}")
+    for number in (1, 2):
+        tickets.insert({"id": tickets.next_id(), "status": "open"})
+    state = make_state(tickets, [], [{"id": "ticket_0001", "status": "resolved"}])
+    state._own[("tickets", "ticket_0001")] = 1
+    state._own[("tickets", "ticket_0002")] = 1
+    await state.resync()
+    assert tickets.values() == [{"id": "ticket_0001", "status": "open"}, {"id": "ticket_0002", "status": "open"}]
+
+    state._own.clear()
+    state.ttl = {"tickets": 3600}
+    await state.resync()
+    assert tickets.values() == [{"id": "ticket_0001", "status": "resolved"}, {"id": "ticket_0002", "status": "open"}]
+
+
+@pytest.mark.asyncio
+async def test_worker_started_on_an_empty_stream_is_not_behind():
+    state = make_state(IndexedStore("ticket_{:04d}"), [("1700000000500-0", {})], [])
+    assert state._last_id == "0-0"
+    assert not await state._behind_stream()
@@ -0,0 +1,100 @@
+import pytest
+from fastapi import HTTPException
+
+from services.pagination import decode_cursor, encode_cursor
+from services.store import IndexedStore, id_number
+
+
+def make_store(count=10):
+    store = IndexedStore("ticket_{:04d}", indexes=["agent_id", "status"])
+    for i in range(count):
+        store.insert({
+            "id": store.next_id(),
+            "agent_id": f"agent_{i % 3}",
+            "status": "open" if i % 2 else "resolved",
+        })
+    return store
+
+
+def ids(records):
+    return [record["id"] for record in records]
+
+
+def test_id_number():
+    assert id_number("ticket_0042") == 42
+    assert id_number("SR-12345") == 12345
+    assert id_number("no-number") is None
+
+
+def test_find_uses_indexes_and_residual_filters():
+    store = make_store()
+    assert ids(store.find(agent_id="agent_0")) == ["ticket_0001", "ticket_0004", "ticket_0007", "ticket_0010"]
+    assert ids(store.find(agent_id="agent_0", status="open")) == ["ticket_0004", "ticket_0010"]
+    assert store.find(agent_id="agent_9") == []
+    # None filters are ignored
+    assert len(store.find(agent_id=None)) == 10
+    assert store.count(agent_id="agent_1") == 3
+    assert store.count(agent_id="agent_0", status="resolved") == 2
+
+
+def test_update_and_delete_keep_indexes_in_sync():
+    store = make_store()
+    store.update("ticket_0001", {"agent_id": "agent_2"})
+    assert "ticket_0001" not in ids(store.find(agent_id="agent_0"))
+    assert ids(store.find(agent_id="agent_2"))[0] == "ticket_0001"
+
+    store.delete("ticket_0003")
+    assert "ticket_0003" not in store
+    assert "ticket_0003" not in ids(store.find(agent_id="agent_2"))
+    assert len(store) == 9
+
+
+def test_ids_are_never_reused():
+    store = make_store(3)
+    store.delete("ticket_0003")
+    assert store.next_id() == "ticket_0004"
+    with pytest.raises(KeyError):
+        store.insert({"id": "ticket_0001"})
+
+
+def test_cursor_pages_cover_every_record_once():
+    store = make_store(25)
+    seen, cursor = [], None
+    while True:
+        page, cursor = store.page(10, after=cursor)
+        seen.extend(ids(page))
+        if cursor is None:
+            break
+    assert seen == ids(store.values())
+
+    seen, cursor = [], None
+    while True:
+        page, cursor = store.page(4, after=cursor, descending=True, status="open")
+        seen.extend(ids(page))
+        if cursor is None:
+            break
+    assert seen == ids(reversed(store.find(status="open")))
+
+
+def test_cursor_survives_deleting_the_last_record_of_a_page():
+    store = make_store(10)
+    page, cursor = store.page(5)
+    store.delete(page[-1]["id"])
+    rest, _ = store.page(5, after=cursor)
+    assert ids(rest) == ["ticket_0006", "ticket_0007", "ticket_0008", "ticket_0009", "ticket_0010"]
+
+
+def test_cursor_encoding_round_trip():
+    assert decode_cursor(encode_cursor(12345)) == 12345
+    with pytest.raises(HTTPException):
+        decode_cursor("not a cursor!")
+
+
+def test_cursor_before_finds_the_first_record_at_or_after_a_value():
+    store = IndexedStore("ticket_{:04d}")
+    for second in range(10):
+        store.insert({"id": store.next_id(), "created_at": f"2026-01-01T00:00:{second:02d}"})
+    assert store.cursor_before("created_at", "2026-01-01T00:00:00") is None
+    after = store.cursor_before("created_at", "2026-01-01T00:00:04.5")
+    assert store.page(1, after=after)[0][0]["id"] == "ticket_0006"
+    assert store.page(1, after=store.cursor_before("created_at", "2027"))[0] == []
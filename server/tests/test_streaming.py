@@ -0,0 +1,86 @@
+import json
+import uuid
+
+import httpx
+import pytest
+
+import main
+from services.lyzr_api import LyzrUnavailableError
+from tests.test_resilience import make_service, upstream_calls
+
+
+def sse_events(body):
+    """(event, data) pairs of a server-sent event stream"""
+    events = []
+    for block in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+async def streamed(service, message, context=None):
+    return [event async for event in service.stream_chat_with_agent("agent_1", message, context)]
+
+
+@pytest.mark.asyncio
+async def test_upstream_chunks_are_relayed_then_cached():
+    service = make_service(stream_chunk_delay_ms=0, low_confidence_rate=0)
+    events = await streamed(service, "Where is my order?")
+    *chunks, done = events
+    assert len(chunks) == 7
+    assert "".join(chunk["delta"] for chunk in chunks).strip() == "Fake answer to: Where is my order?"
+    assert done == {"done": True, "response": "Fake answer to: Where is my order?", "confidence_score": 0.9}
+
+    # The same question is answered from the cache in one chunk
+    again = await streamed(service, "where is my order")
+    assert again == [{"delta": done["response"]}, done]
+    assert (await upstream_calls(service))["chat"] == 1
+
+
+@pytest.mark.asyncio
+async def test_upstream_that_does_not_stream_is_relayed_in_one_chunk():
+    service = make_service()
+
+    async def handler(request):
+        return httpx.Response(200, json={"response": "All at once", "confidence_score": 0.8})
+
+    service.client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    assert await streamed(service, "Hi") == [
+        {"delta": "All at once"}, {"done": True, "response": "All at once", "confidence_score": 0.8},
+    ]
+
+
+@pytest.mark.asyncio
+async def test_upstream_failure_before_any_chunk_raises_unavailable():
+    service = make_service(error_rate=1.0, error_status=503)
+    with pytest.raises(LyzrUnavailableError):
+        await streamed(service, "Hi")
+
+
+def test_chat_stream_endpoint_sends_chunks_then_the_logged_response(client, ready_agent):
+    agent = ready_agent()
+    response = client.post("/api/chat/stream", json={"agent_id": agent["id"], "message": "Opening hours?",
+                                                      "user_session": f"session_{uuid.uuid4().hex[:8]}"})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    *chunks, (name, done) = sse_events(response.text)
+    assert {event for event, _ in chunks} == {"chunk"} and len(chunks) > 1
+    assert name == "done"
+    assert "".join(data["delta"] for _, data in chunks) == done["response"]
+    assert done["ticket_created"] is False
+
+
+def test_chat_stream_falls_back_when_lyzr_fails_mid_stream(client, ready_agent, monkeypatch):
+    agent = ready_agent()
+
+    async def broken(agent_id, message, context=None):
+        yield {"delta": "Partial "}
+        raise LyzrUnavailableError(status_code=503, detail="Lyzr is unavailable")
+
+    monkeypatch.setattr(main.lyzr_service, "stream_chat_with_agent", broken)
+    response = client.post("/api/chat/stream", json={"agent_id": agent["id"], "message": "Hello?",
+                                                      "user_session": f"session_{uuid.uuid4().hex[:8]}"})
+    events = sse_events(response.text)
+    assert events[0] == ("chunk", {"delta": "Partial "})
+    assert events[-1] == ("done", {"response": main.FALLBACK_RESPONSE["response"], "confidence_score": 0.0,
+                                   "ticket_created": True})
@@ -0,0 +1,46 @@
+import asyncio
+
+import pytest
+
+from services.store import IndexedStore
+from services.write_behind import WriteBehindQueue, insert_records
+
+
+@pytest.mark.asyncio
+async def test_failing_listener_does_not_hide_writes_from_later_listeners():
+    store = IndexedStore("chat_{:04d}")
+    seen = []
+
+    def failing(op, old, new):
+        if new["id"] == "chat_0001":
+            raise RuntimeError("listener bug")
+
+    store.subscribe(failing)
+    store.subscribe(lambda op, old, new: seen.append(new["id"]))
+    queue = WriteBehindQueue(insert_records, batch_size=10)
+    await queue.start()
+    await queue.put_many([(store, {"id": store.next_id()}) for _ in range(3)])
+    await queue.close()
+
+    assert seen == ["chat_0001", "chat_0002", "chat_0003"]
+    assert len(store) == 3
+    assert store.listener_errors == 1
+    assert queue.errors == 0 and queue.applied == 3
+
+
+@pytest.mark.asyncio
+async def test_failed_batch_is_applied_one_item_at_a_time():
+    applied = []
+
+    def apply(batch):
+        if any(item == "bad" for item in batch):
+            raise ValueError("bad item")
+        applied.extend(item for item in batch if item not in applied)
+
+    queue = WriteBehindQueue(apply, batch_size=10)
+    await queue.start()
+    await queue.put_many(["a", "bad", "b"])
+    await asyncio.sleep(0)
+    await queue.close()
+    assert applied == ["a", "b"]
+    assert queue.errors == 1
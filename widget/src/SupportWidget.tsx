@@ -11,6 +11,7 @@ interface Message {
   sender: 'user' | 'bot';
   timestamp: Date;
   isLoading?: boolean;
+  isStreaming?: boolean;
 }
 
 const SupportWidget: React.FC<SupportWidgetProps> = ({ config }) => {
@@ -50,7 +51,7 @@ const SupportWidget: React.FC<SupportWidgetProps> = ({ config }) => {
       const urlParams = new URLSearchParams(window.location.search);
       const agentId = config.agentId || urlParams.get('agent-id') || 'default';
 
-      const response = await fetch(`${config.apiUrl}/api/chat`, {
+      const response = await fetch(`${config.apiUrl}/api/chat/stream`, {
         method: 'POST',
         headers: {
           'Content-Type': 'application/json',
@@ -62,17 +63,66 @@ const SupportWidget: React.FC<SupportWidgetProps> = ({ config }) => {
         }),
       });
 
-      if (!response.ok) {
+      if (!response.ok || !response.body) {
         throw new Error('Failed to send message');
       }
 
-      const data = await response.json();
+      // Replace the loading message with the bot reply and grow it as chunks arrive
+      let replyText = '';
+      const showReply = (text: string) => {
+        setMessages(prev => {
+          const withoutLoading = prev.filter(msg => !msg.isLoading);
+          const last = withoutLoading[withoutLoading.length - 1];
+          if (last && last.sender === 'bot' && last.isStreaming) {
+            return [...withoutLoading.slice(0, -1), { ...last, text }];
+          }
+          return [...withoutLoading, {
+            text,
+            sender: 'bot',
+            timestamp: new Date(),
+            isStreaming: true
+          }];
+        });
+      };
+
+      let data: { response: string; ticket_created: boolean } | null = null;
+      const reader = response.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = '';
+      while (!data) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+
+        // Server-sent events are separated by a blank line
+        const events = buffer.split('\n\n');
+        buffer = events.pop() || '';
+        for (const rawEvent of events) {
+          const eventName = rawEvent.match(/^event: (.*)$/m)?.[1];
+          const payload = rawEvent.match(/^data: (.*)$/m)?.[1];
+          if (!eventName || !payload) continue;
+          const parsed = JSON.parse(payload);
+          if (eventName === 'chunk') {
+            replyText += parsed.delta;
+            showReply(replyText);
+          } else if (eventName === 'done') {
+            data = parsed;
+          } else if (eventName === 'error') {
+            throw new Error(parsed.detail || 'Failed to send message');
+          }
+        }
+      }
 
-      // Remove loading message and add bot response
+      if (!data) {
+        throw new Error('Chat stream ended unexpectedly');
+      }
+
+      // Settle the streamed message on the final response
+      const finalText = data.response;
       setMessages(prev => {
-        const withoutLoading = prev.filter(msg => !msg.isLoading);
-        return [...withoutLoading, {
-          text: data.response,
+        const withoutPartial = prev.filter(msg => !msg.isLoading && !msg.isStreaming);
+        return [...withoutPartial, {
+          text: finalText,
           sender: 'bot',
           timestamp: new Date()
         }];
@@ -92,9 +142,9 @@ const SupportWidget: React.FC<SupportWidgetProps> = ({ config }) => {
     } catch (error) {
       console.error('Error sending message:', error);
       
-      // Remove loading message and add error response
+      // Remove loading/partial messages and add error response
       setMessages(prev => {
-        const withoutLoading = prev.filter(msg => !msg.isLoading);
+        const withoutLoading = prev.filter(msg => !msg.isLoading && !msg.isStreaming);
         return [...withoutLoading, {
           text: 'Sorry, I\'m having trouble connecting right now. Please try again later.',
           sender: 'bot',